@@ -37,11 +37,35 @@ def create_app():
     # Initialize CORS
     CORS(app, origins=Config.CORS_ORIGINS)
 
+    # Fast JSON serialization and response compression
+    from .utils.compression import init_compression
+    from .utils.json_provider import init_json_provider
+
+    init_json_provider(app)
+    init_compression(app)
+
+    # Attribute LLM token usage to the request's endpoint and user
+    from .utils.quota import check_quota_config
+    from .utils.usage_meter import init_usage_metering
+
+    init_usage_metering(app)
+    check_quota_config()
+
     # Register routes
     from .routes import register_routes
 
     register_routes(app)
 
+    # Generate insights for popular destinations without blocking startup
+    if Config.INSIGHTS_WARMUP_ON_STARTUP and Config.INSIGHTS_WARMUP_DESTINATIONS:
+        import threading
+
+        from .services import ai_service
+
+        threading.Thread(
+            target=ai_service.warm_up_insights, name="insights-warmup", daemon=True
+        ).start()
+
     logger.info("AI Travel Planner Backend initialized successfully")
 
     return app
@@ -8,7 +8,9 @@ from typing import Optional
 from flask import jsonify, request
 from loguru import logger
 
+from .config import Config
 from .supabase_client import supabase
+from .utils.usage_meter import set_usage_user
 
 
 def get_user_from_token(token: str) -> Optional[dict]:
@@ -82,6 +84,7 @@ def require_auth(f):
             return jsonify({"success": False, "error": "Invalid or expired token"}), 401
 
         logger.info(f"User authenticated successfully: {user.get('email')}")
+        set_usage_user(user["id"])
 
         # Pass user info to the route handler
         try:
@@ -112,6 +115,13 @@ def optional_auth(f):
     def decorated_function(*args, **kwargs):
         # Get token from Authorization header
         auth_header = request.headers.get("Authorization")
+        if (
+            not auth_header
+            and request.environ.get("HTTP_UPGRADE", "").lower() == "websocket"
+        ):
+            # Browsers cannot set headers on a WebSocket handshake
+            token = request.args.get("access_token")
+            auth_header = f"Bearer {token}" if token else None
 
         user = None
         if auth_header:
@@ -121,7 +131,31 @@ def optional_auth(f):
             except (IndexError, Exception) as e:
                 logger.warning(f"Optional auth failed: {e}")
 
+        if user:
+            set_usage_user(user["id"])
+
         # Pass user info (or None) to the route handler
         return f(current_user=user, *args, **kwargs)
 
     return decorated_function
+
+
+def require_admin(f):
+    """
+    Decorator for routes restricted to administrators (Config.ADMIN_EMAILS)
+
+    Usage:
+        @app.route('/admin')
+        @require_admin
+        def admin_route(current_user):
+            return jsonify({"admin": current_user["email"]})
+    """
+
+    @wraps(f)
+    def decorated_function(*args, current_user, **kwargs):
+        if (current_user.get("email") or "").lower() not in Config.ADMIN_EMAILS:
+            logger.warning(f"Non-admin access to {request.path}")
+            return jsonify({"success": False, "error": "Admin access required"}), 403
+        return f(current_user=current_user, *args, **kwargs)
+
+    return require_auth(decorated_function)
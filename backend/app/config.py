@@ -10,6 +10,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _llm_profile(
+    task: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: float,
+    max_retries: int,
+) -> dict:
+    """Build an LLM task profile, overridable via LLM_<TASK>_* variables"""
+    prefix = f"LLM_{task.upper()}_"
+    return {
+        "model": os.getenv(prefix + "MODEL", model),
+        "temperature": float(os.getenv(prefix + "TEMPERATURE", temperature)),
+        "max_tokens": int(os.getenv(prefix + "MAX_TOKENS", max_tokens)),
+        "timeout": float(os.getenv(prefix + "TIMEOUT", timeout)),
+        "max_retries": int(os.getenv(prefix + "MAX_RETRIES", max_retries)),
+    }
+
+
 class Config:
     """Application configuration class"""
 
@@ -38,6 +57,247 @@ class Config:
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+    # LLM gateway: one pooled transport, per-task model profiles
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.deepseek.com")
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+    LLM_PROFILES = {
+        "itinerary": _llm_profile("itinerary", "deepseek-chat", 0.7, 4000, 120, 2),
+        "insights": _llm_profile("insights", "deepseek-chat", 0.7, 2000, 60, 2),
+        # Short structured parses: small completions and a tight timeout
+        "voice_parse": _llm_profile("voice_parse", "deepseek-chat", 0.3, 500, 15, 1),
+        "budget_analysis": _llm_profile(
+            "budget_analysis", "deepseek-chat", 0.3, 2000, 60, 2
+        ),
+    }
+
+    # LLM usage metering: hourly rollups per user, endpoint, task and model
+    USAGE_METERING_ENABLED = os.getenv("USAGE_METERING_ENABLED", "1") == "1"
+    USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", "/tmp/ai_travel_planner/usage.sqlite3")
+    USAGE_RETENTION_DAYS = int(os.getenv("USAGE_RETENTION_DAYS", 90))
+    # CNY per million (prompt, completion) tokens
+    LLM_PRICES = {
+        "deepseek-chat": (
+            float(os.getenv("DEEPSEEK_CHAT_PROMPT_PRICE", 2)),
+            float(os.getenv("DEEPSEEK_CHAT_COMPLETION_PRICE", 3)),
+        ),
+        "deepseek-reasoner": (
+            float(os.getenv("DEEPSEEK_REASONER_PROMPT_PRICE", 2)),
+            float(os.getenv("DEEPSEEK_REASONER_COMPLETION_PRICE", 3)),
+        ),
+    }
+    # Per-caller limits on LLM-backed endpoints (0 disables a limit);
+    # anonymous requests are limited per client IP
+    LLM_QUOTA_ENABLED = os.getenv("LLM_QUOTA_ENABLED", "1") == "1"
+    QUOTA_DB_PATH = os.getenv("QUOTA_DB_PATH", "/tmp/ai_travel_planner/quota.sqlite3")
+    LLM_USER_REQUESTS_PER_MINUTE = int(os.getenv("LLM_USER_REQUESTS_PER_MINUTE", 10))
+    LLM_IP_REQUESTS_PER_MINUTE = int(os.getenv("LLM_IP_REQUESTS_PER_MINUTE", 5))
+    LLM_USER_DAILY_TOKENS = int(os.getenv("LLM_USER_DAILY_TOKENS", 500_000))
+    LLM_IP_DAILY_TOKENS = int(os.getenv("LLM_IP_DAILY_TOKENS", 100_000))
+    # Reverse proxies in front of the app that append to X-Forwarded-For
+    # (0 uses the socket address; entries added by clients are never trusted)
+    QUOTA_TRUSTED_PROXIES = int(os.getenv("QUOTA_TRUSTED_PROXIES", 0))
+
+    # Users allowed to view admin endpoints such as usage reports
+    ADMIN_EMAILS = [
+        email.strip().lower()
+        for email in os.getenv("ADMIN_EMAILS", "").split(",")
+        if email.strip()
+    ]
+
+    # Client-side upstream rate limiting (token bucket per upstream and key)
+    AMAP_QPS = float(os.getenv("AMAP_QPS", 3))
+    AMAP_BURST = float(os.getenv("AMAP_BURST", 3))
+    AMAP_TIMEOUT = float(os.getenv("AMAP_TIMEOUT", 10))
+    AMAP_QPS_RETRIES = int(os.getenv("AMAP_QPS_RETRIES", 2))
+    AMAP_QPS_BACKOFF = float(os.getenv("AMAP_QPS_BACKOFF", 1.0))
+    DEEPSEEK_QPS = float(os.getenv("DEEPSEEK_QPS", 5))
+    DEEPSEEK_BURST = float(os.getenv("DEEPSEEK_BURST", 5))
+    DEEPSEEK_THROTTLE_BACKOFF = float(os.getenv("DEEPSEEK_THROTTLE_BACKOFF", 5))
+    # Seconds a call waits for a token before failing, by priority class
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 2))
+    RATE_LIMIT_BACKGROUND_MAX_WAIT = float(
+        os.getenv("RATE_LIMIT_BACKGROUND_MAX_WAIT", 10)
+    )
+
+    # Circuit breakers: fail fast after consecutive failed or slow calls
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+    AMAP_SLOW_CALL_SECONDS = float(os.getenv("AMAP_SLOW_CALL_SECONDS", 5))
+    ASR_TIMEOUT = float(os.getenv("ASR_TIMEOUT", 15))
+    ASR_SLOW_CALL_SECONDS = float(os.getenv("ASR_SLOW_CALL_SECONDS", 10))
+    # Hedged Amap reads: duplicate a call still pending after the recent p95
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.2))
+    HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", 16))
+
+    # Single-flight coalescing of identical concurrent upstream calls
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+    SINGLE_FLIGHT_DISABLED_SITES = [
+        site.strip()
+        for site in os.getenv("SINGLE_FLIGHT_DISABLED_SITES", "").split(",")
+        if site.strip()
+    ]
+    SINGLE_FLIGHT_LLM_WAIT_TIMEOUT = float(
+        os.getenv("SINGLE_FLIGHT_LLM_WAIT_TIMEOUT", 180)
+    )
+    SINGLE_FLIGHT_MAP_WAIT_TIMEOUT = float(
+        os.getenv("SINGLE_FLIGHT_MAP_WAIT_TIMEOUT", 15)
+    )
+
+    # Itinerary generation: trips with at least this many days are generated
+    # as a skeleton plus parallel per-day calls
+    ITINERARY_CHUNK_MIN_DAYS = int(os.getenv("ITINERARY_CHUNK_MIN_DAYS", 3))
+    ITINERARY_DAY_CONCURRENCY = int(os.getenv("ITINERARY_DAY_CONCURRENCY", 6))
+
+    # Weather forecast cache: entries live until Amap's next refresh
+    # (forecasts are republished around these CST hours)
+    WEATHER_FORECAST_REFRESH_HOURS = [
+        int(hour)
+        for hour in os.getenv("WEATHER_FORECAST_REFRESH_HOURS", "8,11,18").split(",")
+        if hour.strip()
+    ]
+    WEATHER_FORECAST_PUBLISH_DELAY = int(
+        os.getenv("WEATHER_FORECAST_PUBLISH_DELAY", 600)
+    )
+    WEATHER_FORECAST_MIN_TTL = int(os.getenv("WEATHER_FORECAST_MIN_TTL", 600))
+    WEATHER_FORECAST_MAX_TTL = int(os.getenv("WEATHER_FORECAST_MAX_TTL", 6 * 3600))
+    WEATHER_FORECAST_CACHE_SIZE = int(os.getenv("WEATHER_FORECAST_CACHE_SIZE", 1024))
+
+    # Offline city / adcode index
+    CITY_INDEX_PATH = os.getenv(
+        "CITY_INDEX_PATH",
+        os.path.join(os.path.dirname(__file__), "data", "cities.tsv"),
+    )
+    # Coordinates farther than this from every centroid are left unresolved
+    # (and reverse geocoded); neighbouring city centres can be ~20 km apart
+    CITY_INDEX_MAX_DISTANCE_KM = float(os.getenv("CITY_INDEX_MAX_DISTANCE_KM", 10))
+
+    # Route cache: legs are keyed on endpoints snapped to geohash cells
+    # (precision 7 is ~150 m) and expire by mode
+    ROUTE_CACHE_GEOHASH_PRECISION = int(os.getenv("ROUTE_CACHE_GEOHASH_PRECISION", 7))
+    ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", 10000))
+    ROUTE_CACHE_TTLS = {
+        "transit": int(os.getenv("ROUTE_CACHE_TTL_TRANSIT", 15 * 60)),
+        "driving": int(os.getenv("ROUTE_CACHE_TTL_DRIVING", 30 * 60)),
+        "bicycling": int(os.getenv("ROUTE_CACHE_TTL_BICYCLING", 24 * 3600)),
+        "walking": int(os.getenv("ROUTE_CACHE_TTL_WALKING", 24 * 3600)),
+    }
+
+    # Local POI index: Amap search results are kept in SQLite and nearby
+    # searches inside fresh coverage are answered locally
+    POI_INDEX_ENABLED = os.getenv("POI_INDEX_ENABLED", "1") == "1"
+    POI_INDEX_PATH = os.getenv(
+        "POI_INDEX_PATH", "/tmp/ai_travel_planner/poi_index.sqlite3"
+    )
+    POI_INDEX_MAX_AGE = int(os.getenv("POI_INDEX_MAX_AGE", 7 * 24 * 3600))
+    POI_INDEX_PRUNE_INTERVAL = int(os.getenv("POI_INDEX_PRUNE_INTERVAL", 3600))
+
+    # Persistent cache (SQLite) for slow-changing LLM results
+    PERSISTENT_CACHE_PATH = os.getenv(
+        "PERSISTENT_CACHE_PATH", "/tmp/ai_travel_planner/cache.sqlite3"
+    )
+    INSIGHTS_CACHE_TTL = int(os.getenv("INSIGHTS_CACHE_TTL", 30 * 24 * 3600))
+    # Destinations whose insights are pre-generated by warm_insights_cache.py
+    # (or in the background at startup if enabled; every worker process
+    # would repeat it, so prefer the script for multi-worker deployments)
+    INSIGHTS_WARMUP_ON_STARTUP = os.getenv("INSIGHTS_WARMUP_ON_STARTUP", "0") == "1"
+    INSIGHTS_WARMUP_DESTINATIONS = [
+        destination.strip()
+        for destination in os.getenv(
+            "INSIGHTS_WARMUP_DESTINATIONS",
+            "北京,上海,广州,深圳,杭州,成都,西安,重庆,南京,苏州",
+        ).split(",")
+        if destination.strip()
+    ]
+
+    # Voice activity detection: trim silence and skip ASR for empty audio
+    VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+    VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", 30))
+    # Frames this many dB above the noise floor count as speech
+    VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", 10))
+    VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", 200))
+    VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", 250))
+
+    # Recognition results cached by upload content hash, language and engine
+    # so retried uploads skip decoding and ASR (0 disables)
+    ASR_CACHE_TTL = int(os.getenv("ASR_CACHE_TTL", 3600))
+
+    # One-shot voice expenses below this parse confidence are returned as a
+    # draft for confirmation instead of being recorded
+    VOICE_EXPENSE_MIN_CONFIDENCE = float(os.getenv("VOICE_EXPENSE_MIN_CONFIDENCE", 0.7))
+    # How long a retried voice-expense upload maps to the expense it created
+    VOICE_EXPENSE_DEDUP_TTL = int(os.getenv("VOICE_EXPENSE_DEDUP_TTL", 86400))
+
+    # Streaming transcription over WebSocket (/api/voice/stream)
+    # Engine: "google", or "stub" for local testing without network access
+    STREAMING_ASR_ENGINE = os.getenv("STREAMING_ASR_ENGINE", "google")
+    STREAMING_ASR_STUB_TEXT = os.getenv(
+        "STREAMING_ASR_STUB_TEXT", "今天午饭花了三十五元"
+    )
+    STREAMING_ASR_WORKERS = int(os.getenv("STREAMING_ASR_WORKERS", 8))
+    # Interim results at most this often while speaking (0 disables them)
+    STREAMING_INTERIM_INTERVAL_MS = int(
+        os.getenv("STREAMING_INTERIM_INTERVAL_MS", 1000)
+    )
+    # Silence that starts speculative final recognition, and that ends speech
+    STREAMING_PAUSE_MS = int(os.getenv("STREAMING_PAUSE_MS", 300))
+    STREAMING_END_SILENCE_MS = int(os.getenv("STREAMING_END_SILENCE_MS", 700))
+    STREAMING_MAX_UTTERANCE_SECONDS = int(
+        os.getenv("STREAMING_MAX_UTTERANCE_SECONDS", 30)
+    )
+    STREAMING_IDLE_TIMEOUT = float(os.getenv("STREAMING_IDLE_TIMEOUT", 30))
+    # Per-session caps (audio bytes received, wall-clock seconds)
+    STREAMING_MAX_SESSION_BYTES = int(
+        os.getenv("STREAMING_MAX_SESSION_BYTES", 32 * 1024 * 1024)
+    )
+    STREAMING_MAX_SESSION_SECONDS = int(os.getenv("STREAMING_MAX_SESSION_SECONDS", 300))
+    # Per-caller limits: open sessions, and new sessions per minute
+    STREAMING_MAX_CONCURRENT_SESSIONS = int(
+        os.getenv("STREAMING_MAX_CONCURRENT_SESSIONS", 2)
+    )
+    STREAMING_USER_SESSIONS_PER_MINUTE = int(
+        os.getenv("STREAMING_USER_SESSIONS_PER_MINUTE", 10)
+    )
+    STREAMING_IP_SESSIONS_PER_MINUTE = int(
+        os.getenv("STREAMING_IP_SESSIONS_PER_MINUTE", 4)
+    )
+
+    # Itinerary POI enrichment: nearest POIs kept per item and search radius
+    POI_ENRICH_TOP_K = int(os.getenv("POI_ENRICH_TOP_K", 3))
+    POI_ENRICH_RADIUS = int(os.getenv("POI_ENRICH_RADIUS", 1000))
+
+    # Max concurrent Amap calls when fanning out over a day's stops and legs
+    MAP_FANOUT_CONCURRENCY = int(os.getenv("MAP_FANOUT_CONCURRENCY", 4))
+    # Separate pool for background fan-outs (itinerary POI enrichment)
+    MAP_BACKGROUND_CONCURRENCY = int(os.getenv("MAP_BACKGROUND_CONCURRENCY", 2))
+    # Stops accepted by one day-route request (each leg is an Amap call)
+    MAX_DAY_ROUTE_STOPS = int(os.getenv("MAX_DAY_ROUTE_STOPS", 20))
+
+    # HTTP caching: Cache-Control for conditional (ETag) read endpoints
+    CACHE_CONTROL_ITINERARY = os.getenv("CACHE_CONTROL_ITINERARY", "private, no-cache")
+    CACHE_CONTROL_ITINERARY_LIST = os.getenv(
+        "CACHE_CONTROL_ITINERARY_LIST", "private, no-cache"
+    )
+    CACHE_CONTROL_EXPENSE_LIST = os.getenv(
+        "CACHE_CONTROL_EXPENSE_LIST", "private, no-cache"
+    )
+
+    # Response compression (gzip, or brotli when installed)
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+    # List responses with at least this many items are streamed
+    STREAM_LIST_MIN_ITEMS = int(os.getenv("STREAM_LIST_MIN_ITEMS", 50))
+
+    @classmethod
+    def single_flight_enabled(cls, site: str) -> bool:
+        """Check whether single-flight coalescing is enabled for a call site"""
+        return (
+            cls.SINGLE_FLIGHT_ENABLED and site not in cls.SINGLE_FLIGHT_DISABLED_SITES
+        )
+
     @classmethod
     def validate(cls):
         """Validate required configuration"""
@@ -0,0 +1,3 @@
+"""
+Bundled reference data for the AI Travel Planner backend
+"""
@@ -0,0 +1,121 @@
+"""
+Rebuild the bundled city index from the Amap district API
+
+Usage (from backend/, with AMAP_API_KEY set):
+    python -m app.data.build_city_index [output.tsv]
+
+Writes every province, city and district with its adcode, citycode and
+center. Aliases already present in the current index are carried over.
+"""
+
+import os
+import sys
+from typing import Any, Dict, List
+
+import requests
+from dotenv import load_dotenv
+
+DISTRICT_URL = "https://restapi.amap.com/v3/config/district"
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "cities.tsv")
+HEADER = "# adcode\tname\tlevel\tcitycode\tlng\tlat\taliases\n"
+
+# Amap lists municipalities as provinces with a citycode, and inserts a
+# synthetic city level (北京城区, 重庆郊县) between them and their districts
+SYNTHETIC_CITY_SUFFIXES = ("城区", "郊县")
+
+
+def load_aliases(path: str) -> Dict[str, str]:
+    """Read the alias column of an existing index"""
+    aliases = {}
+    if not os.path.exists(path):
+        return aliases
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) > 6 and fields[6]:
+                aliases[fields[0]] = fields[6]
+    return aliases
+
+
+def fetch_districts(api_key: str) -> List[Dict[str, Any]]:
+    """Fetch the province -> city -> district tree"""
+    response = requests.get(
+        DISTRICT_URL,
+        params={
+            "key": api_key,
+            "keywords": "中国",
+            "subdistrict": 3,
+            "extensions": "base",
+        },
+        timeout=60,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if data.get("status") != "1" or not data.get("districts"):
+        raise RuntimeError(f"District query failed: {data.get('info')}")
+    return data["districts"][0].get("districts", [])
+
+
+def flatten(districts: List[Dict[str, Any]], aliases: Dict[str, str]) -> List[str]:
+    """Flatten the district tree into TSV rows"""
+    rows = []
+
+    def visit(node: Dict[str, Any]) -> None:
+        name = node.get("name", "")
+        level = node.get("level", "")
+        citycode = node.get("citycode") or ""
+        if isinstance(citycode, list):
+            citycode = ""
+
+        if level == "province" and citycode:
+            level = "city"
+        skip = level == "city" and name.endswith(SYNTHETIC_CITY_SUFFIXES)
+
+        if level in ("province", "city", "district") and not skip:
+            lng, _, lat = (node.get("center") or "").partition(",")
+            if lng and lat:
+                adcode = node.get("adcode", "")
+                rows.append(
+                    "\t".join(
+                        [
+                            adcode,
+                            name,
+                            level,
+                            citycode,
+                            lng,
+                            lat,
+                            aliases.get(adcode, ""),
+                        ]
+                    )
+                )
+
+        for child in node.get("districts") or []:
+            visit(child)
+
+    for province in districts:
+        visit(province)
+    return rows
+
+
+def main():
+    """Fetch the district tree and write the index"""
+    load_dotenv()
+    api_key = os.getenv("AMAP_API_KEY")
+    if not api_key:
+        print("AMAP_API_KEY is not set")
+        sys.exit(1)
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    rows = flatten(fetch_districts(api_key), load_aliases(path))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        f.write("\n".join(rows) + "\n")
+
+    print(f"Wrote {len(rows)} divisions to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,41 @@ from flask import Blueprint, jsonify, request
 from loguru import logger
 from werkzeug.exceptions import BadRequest
 
-from .auth import require_auth
+from .auth import optional_auth, require_admin, require_auth
+from .config import Config
 from .services import ai_service, map_service, voice_service
 from .services.ai_expense_analyzer import ai_expense_analyzer
 from .services.expense_service import expense_service
+from .services.streaming_asr import streaming_transcriber
+from .services.voice_expense import voice_expense_pipeline
 from .supabase_client import supabase
+from .utils.circuit_breaker import circuit_breaker_stats
+from .utils.compression import json_list_response
+from .utils.http_cache import (
+    compute_etag,
+    conditional_json,
+    matching_etag,
+    rows_etag,
+)
+from .utils.json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch
+from .utils.persistent_cache import persistent_cache_stats
+from .utils.poi_index import poi_index
+from .utils.quota import llm_quota
+from .utils.rate_limiter import rate_limiter_stats
+from .utils.single_flight import single_flight_stats
+from .utils.ttl_cache import ttl_cache_stats
+from .utils.usage_meter import usage_meter
+
+try:
+    from flask_sock import Sock
+except ImportError:  # pragma: no cover - optional dependency
+    Sock = None
+
+# Number of most recent expenses itemized in the AI budget analysis prompt
+RECENT_EXPENSES_FOR_ANALYSIS = 20
+
+# Request bodies accepted by the itinerary PATCH endpoint
+JSON_PATCH_MIMETYPES = ("application/json-patch+json", "application/json")
 
 
 # Health check
@@ -23,6 +53,74 @@ def health_check():
     )
 
 
+def get_metrics():
+    """Upstream protection metrics endpoint"""
+    return jsonify(
+        {
+            "success": True,
+            "data": {
+                "single_flight": single_flight_stats(),
+                "caches": ttl_cache_stats(),
+                "persistent_caches": persistent_cache_stats(),
+                "rate_limiters": rate_limiter_stats(),
+                "circuit_breakers": circuit_breaker_stats(),
+                "latency": {"amap": map_service.latency.stats()},
+                "poi_index": poi_index.stats(),
+                "streaming_asr": streaming_transcriber.stats(),
+            },
+        }
+    )
+
+
+def get_llm_usage(current_user):
+    """LLM token usage and cost report (admins only)"""
+    try:
+        try:
+            days = int(request.args.get("days", 7))
+        except ValueError:
+            raise BadRequest("days must be an integer")
+        if not 1 <= days <= Config.USAGE_RETENTION_DAYS:
+            raise BadRequest(
+                f"days must be between 1 and {Config.USAGE_RETENTION_DAYS}"
+            )
+        user_id = request.args.get("user_id")
+
+        since = datetime.now().timestamp() - days * 86400
+        by_task = usage_meter.summary("task", since, user_id)
+        totals = {
+            field: sum(group[field] for group in by_task)
+            for field in (
+                "calls",
+                "errors",
+                "prompt_tokens",
+                "completion_tokens",
+                "total_tokens",
+            )
+        }
+        totals["cost"] = round(sum(group["cost"] for group in by_task), 4)
+
+        return jsonify(
+            {
+                "success": True,
+                "data": {
+                    "days": days,
+                    "currency": "CNY",
+                    "totals": totals,
+                    "by_user": usage_meter.summary("user_id", since, user_id),
+                    "by_endpoint": usage_meter.summary("endpoint", since, user_id),
+                    "by_task": by_task,
+                    "by_model": usage_meter.summary("model", since, user_id),
+                },
+            }
+        )
+
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"LLM usage report error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 # Authentication routes
 def register():
     """Register a new user"""
@@ -158,12 +256,13 @@ def recognize_voice():
         language = request.form.get("language", "zh-CN")
 
         # Save uploaded file
-        temp_path = voice_service.save_uploaded_file(audio_file)
-        if not temp_path:
+        saved = voice_service.save_uploaded_file(audio_file)
+        if not saved:
             raise BadRequest("Failed to save audio file")
+        temp_path, content_hash = saved
 
-        # Recognize speech
-        result = voice_service.recognize_from_file(temp_path, language)
+        # Recognize speech (retried uploads are served from the cache)
+        result = voice_service.recognize_from_file(temp_path, language, content_hash)
 
         # Cleanup temp file
         voice_service.cleanup_temp_file(temp_path)
@@ -177,8 +276,13 @@ def recognize_voice():
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def stream_voice(ws, current_user=None):
+    """Streaming voice recognition endpoint (WebSocket)"""
+    streaming_transcriber.serve(ws, current_user)
+
+
 # Itinerary routes
-def generate_itinerary():
+def generate_itinerary(current_user=None):
     """Generate travel itinerary using AI"""
     try:
         data = request.get_json()
@@ -205,6 +309,14 @@ def generate_itinerary():
             preferences=data.get("preferences", ""),
         )
 
+        # Optional server-side nearby restaurant / hotel lookup per item
+        if result["success"] and data.get("enrich_pois"):
+            enrichment = map_service.enrich_itinerary(
+                result["data"], city=data["destination"]
+            )
+            if enrichment["success"]:
+                result = {**result, "data": enrichment["data"]["itinerary"]}
+
         return jsonify(result)
 
     except BadRequest as e:
@@ -214,6 +326,24 @@ def generate_itinerary():
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def get_destination_insights(current_user=None):
+    """Get travel insights for a destination"""
+    try:
+        destination = request.args.get("destination")
+        if not destination:
+            raise BadRequest("Destination is required")
+
+        result = ai_service.get_destination_insights(destination)
+
+        return jsonify(result)
+
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Destination insights error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 def save_itinerary(current_user):
     """Save itinerary to database (requires authentication)"""
     try:
@@ -258,16 +388,24 @@ def list_itineraries(current_user):
         # Get user ID from authenticated user
         user_id = current_user["id"]
 
-        # Fetch from Supabase
-        response = (
-            supabase.table("itineraries")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .execute()
-        )
+        def fetch(columns):
+            return (
+                supabase.table("itineraries")
+                .select(columns)
+                .eq("user_id", user_id)
+                .order("created_at", desc=True)
+                .execute()
+                .data
+            )
 
-        return jsonify({"success": True, "data": response.data})
+        # Cheap version check first; full rows are only fetched on a miss
+        etag = rows_etag("itineraries", fetch("id, updated_at"))
+        return conditional_json(
+            etag,
+            lambda: json_list_response(fetch("*"), success=True),
+            Config.CACHE_CONTROL_ITINERARY_LIST,
+            vary="Authorization",
+        )
 
     except BadRequest as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -279,21 +417,41 @@ def list_itineraries(current_user):
 def get_itinerary(itinerary_id):
     """Get single itinerary"""
     try:
-        # Fetch from Supabase
-        response = (
-            supabase.table("itineraries").select("*").eq("id", itinerary_id).execute()
+        # Cheap version check first; the full row is only fetched on a miss
+        version = (
+            supabase.table("itineraries")
+            .select("id, updated_at")
+            .eq("id", itinerary_id)
+            .execute()
         )
-
-        if response.data and len(response.data) > 0:
-            return jsonify({"success": True, "data": response.data[0]})
-        else:
+        if not version.data:
             return jsonify({"success": False, "error": "Itinerary not found"}), 404
 
+        etag = compute_etag("itinerary", itinerary_id, version.data[0]["updated_at"])
+        response = conditional_json(
+            etag,
+            lambda: fetch_itinerary(itinerary_id),
+            Config.CACHE_CONTROL_ITINERARY,
+        )
+        if response.status_code == 200 and not response.get_json()["success"]:
+            return response, 404
+        return response
+
     except Exception as e:
         logger.error(f"Get itinerary error: {e}")
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def fetch_itinerary(itinerary_id):
+    """Fetch the full itinerary row as a response body"""
+    response = (
+        supabase.table("itineraries").select("*").eq("id", itinerary_id).execute()
+    )
+    if response.data:
+        return {"success": True, "data": response.data[0]}
+    return {"success": False, "error": "Itinerary not found"}
+
+
 def update_itinerary(current_user, itinerary_id):
     """Update itinerary (requires authentication)"""
     try:
@@ -348,6 +506,252 @@ def update_itinerary(current_user, itinerary_id):
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def patch_itinerary(current_user, itinerary_id):
+    """
+    Apply an RFC 6902 JSON Patch to a saved itinerary's ai_response
+
+    The patch is applied only if the itinerary is unchanged since the
+    client's version, given as `base_updated_at` in the body or as the
+    itinerary's ETag in If-Match. Only the changed paths are returned.
+    """
+    try:
+        if request.mimetype not in JSON_PATCH_MIMETYPES:
+            return jsonify(
+                {
+                    "success": False,
+                    "error": "Content-Type must be application/json-patch+json "
+                    "or application/json",
+                }
+            ), 415
+
+        data = request.get_json()
+        user_id = current_user["id"]
+
+        # Accept a bare operation list (application/json-patch+json) or
+        # {"operations": [...], "base_updated_at": "..."}
+        if isinstance(data, list):
+            operations, base_updated_at = data, None
+        elif isinstance(data, dict):
+            operations = data.get("operations")
+            base_updated_at = data.get("base_updated_at")
+        else:
+            raise BadRequest("Request body must be a JSON Patch")
+        if not isinstance(operations, list) or not operations:
+            raise BadRequest("Missing required field: operations")
+
+        if_match = request.headers.get("If-Match")
+        if not base_updated_at and not if_match:
+            return jsonify(
+                {
+                    "success": False,
+                    "error": "base_updated_at or If-Match is required",
+                }
+            ), 428
+
+        response = (
+            supabase.table("itineraries")
+            .select("user_id, updated_at, ai_response")
+            .eq("id", itinerary_id)
+            .execute()
+        )
+
+        if not response.data:
+            return jsonify({"success": False, "error": "Itinerary not found"}), 404
+
+        itinerary = response.data[0]
+        if itinerary["user_id"] != user_id:
+            return jsonify({"success": False, "error": "Unauthorized"}), 403
+
+        current_updated_at = itinerary["updated_at"]
+        if if_match:
+            etag = compute_etag("itinerary", itinerary_id, current_updated_at)
+            if matching_etag(etag, if_match) is None:
+                return jsonify(
+                    {
+                        "success": False,
+                        "error": "Itinerary was modified",
+                        "updated_at": current_updated_at,
+                    }
+                ), 412
+        elif base_updated_at != current_updated_at:
+            return jsonify(
+                {
+                    "success": False,
+                    "error": "Itinerary was modified",
+                    "updated_at": current_updated_at,
+                }
+            ), 409
+
+        try:
+            ai_response, changes = apply_patch(
+                itinerary.get("ai_response") or {}, operations
+            )
+        except JsonPatchTestFailed as e:
+            return jsonify({"success": False, "error": str(e)}), 409
+
+        if not changes:
+            return jsonify(
+                {
+                    "success": True,
+                    "data": {"updated_at": current_updated_at, "changes": []},
+                }
+            )
+
+        # Conditional write: matches no row if someone saved in between
+        update_response = (
+            supabase.table("itineraries")
+            .update(
+                {"ai_response": ai_response, "updated_at": datetime.now().isoformat()}
+            )
+            .eq("id", itinerary_id)
+            .eq("updated_at", current_updated_at)
+            .execute()
+        )
+
+        if not update_response.data:
+            return jsonify({"success": False, "error": "Itinerary was modified"}), 409
+
+        updated_at = update_response.data[0]["updated_at"]
+        result = jsonify(
+            {"success": True, "data": {"updated_at": updated_at, "changes": changes}}
+        )
+        result.headers["ETag"] = compute_etag("itinerary", itinerary_id, updated_at)
+        return result
+
+    except (BadRequest, JsonPatchError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Patch itinerary error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+def regenerate_itinerary_segment(current_user, itinerary_id):
+    """Regenerate one day, item or time range of a saved itinerary"""
+    try:
+        data = request.get_json() or {}
+        user_id = current_user["id"]
+
+        if "day_index" not in data:
+            raise BadRequest("Missing required field: day_index")
+
+        response = (
+            supabase.table("itineraries")
+            .select("*")
+            .eq("id", itinerary_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+
+        if not response.data:
+            return jsonify({"success": False, "error": "Itinerary not found"}), 404
+
+        itinerary = response.data[0]
+        ai_response = dict(itinerary.get("ai_response") or {})
+        ai_response["metadata"] = {
+            **(ai_response.get("metadata") or {}),
+            "destination": itinerary.get("destination"),
+            "budget": itinerary.get("budget"),
+            "people_count": itinerary.get("people_count"),
+        }
+
+        item_index = data.get("item_index")
+        result = ai_service.regenerate_segment(
+            ai_response,
+            day_index=int(data["day_index"]),
+            instruction=data.get("instruction", ""),
+            item_index=int(item_index) if item_index is not None else None,
+            time_range=data.get("time_range"),
+        )
+
+        if not result["success"]:
+            return jsonify(result), 400
+
+        # Persist the spliced itinerary unless the client only wants a preview
+        if data.get("save", True):
+            update_response = (
+                supabase.table("itineraries")
+                .update(
+                    {
+                        "ai_response": result["data"]["itinerary"],
+                        "updated_at": datetime.now().isoformat(),
+                    }
+                )
+                .eq("id", itinerary_id)
+                .execute()
+            )
+            if not update_response.data:
+                raise Exception("Failed to save regenerated itinerary")
+
+        return jsonify(result)
+
+    except (BadRequest, ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Regenerate itinerary segment error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+def optimize_itinerary_budget(current_user, itinerary_id):
+    """Fit a saved itinerary into a new budget without regenerating it"""
+    try:
+        data = request.get_json() or {}
+        user_id = current_user["id"]
+
+        if "budget" not in data:
+            raise BadRequest("Missing required field: budget")
+        new_budget = float(data["budget"])
+
+        response = (
+            supabase.table("itineraries")
+            .select("*")
+            .eq("id", itinerary_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+
+        if not response.data:
+            return jsonify({"success": False, "error": "Itinerary not found"}), 404
+
+        itinerary = response.data[0]
+        ai_response = dict(itinerary.get("ai_response") or {})
+        ai_response["metadata"] = {
+            **(ai_response.get("metadata") or {}),
+            "destination": itinerary.get("destination"),
+            "budget": itinerary.get("budget"),
+        }
+
+        result = ai_service.optimize_budget(
+            ai_response, new_budget, substitutions=bool(data.get("substitutions"))
+        )
+
+        if not result["success"]:
+            return jsonify(result), 400
+
+        if data.get("save", True):
+            update_response = (
+                supabase.table("itineraries")
+                .update(
+                    {
+                        "budget": new_budget,
+                        "ai_response": result["data"]["itinerary"],
+                        "updated_at": datetime.now().isoformat(),
+                    }
+                )
+                .eq("id", itinerary_id)
+                .execute()
+            )
+            if not update_response.data:
+                raise Exception("Failed to save optimized itinerary")
+
+        return jsonify(result)
+
+    except (BadRequest, ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Optimize itinerary budget error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 def delete_itinerary(current_user, itinerary_id):
     """Delete itinerary (requires authentication)"""
     try:
@@ -434,7 +838,8 @@ def get_route():
             raise BadRequest("Origin and destination are required")
 
         mode = request.args.get("mode", "driving")
-        result = map_service.get_route(origin, destination, mode)
+        city = request.args.get("city")
+        result = map_service.get_route(origin, destination, mode, city=city)
 
         return jsonify(result)
 
@@ -445,6 +850,58 @@ def get_route():
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def get_day_route(current_user=None):
+    """Plan all legs of a day, from a saved itinerary day or a list of stops"""
+    try:
+        data = request.get_json() or {}
+        mode = data.get("mode", "driving")
+        city = data.get("city")
+        stops = data.get("stops")
+
+        if data.get("itinerary_id"):
+            if not current_user:
+                return jsonify({"success": False, "error": "Unauthorized"}), 401
+            if "day_index" not in data:
+                raise BadRequest("Missing required field: day_index")
+
+            response = (
+                supabase.table("itineraries")
+                .select("destination, ai_response")
+                .eq("id", data["itinerary_id"])
+                .eq("user_id", current_user["id"])
+                .execute()
+            )
+            if not response.data:
+                return jsonify({"success": False, "error": "Itinerary not found"}), 404
+
+            itinerary = response.data[0]
+            days = (itinerary.get("ai_response") or {}).get("daily_itinerary") or []
+            day_index = int(data["day_index"])
+            if not 0 <= day_index < len(days):
+                raise BadRequest("day_index out of range")
+            stops = days[day_index].get("items") or []
+            city = city or itinerary.get("destination")
+
+        if not isinstance(stops, list):
+            raise BadRequest("Either itinerary_id and day_index or stops is required")
+        if len(stops) > Config.MAX_DAY_ROUTE_STOPS:
+            raise BadRequest(
+                f"Too many stops: at most {Config.MAX_DAY_ROUTE_STOPS} per day route"
+            )
+
+        result = map_service.get_day_route(stops, mode=mode, city=city)
+        if not result["success"]:
+            return jsonify(result), 400
+
+        return jsonify(result)
+
+    except (BadRequest, ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Day route planning error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 def get_weather():
     """Get weather information"""
     try:
@@ -463,6 +920,63 @@ def get_weather():
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def get_weather_forecast():
+    """Get the multi-day weather forecast"""
+    try:
+        city = request.args.get("city")
+        if not city:
+            raise BadRequest("City is required")
+
+        result = map_service.get_weather_forecast(city)
+
+        return jsonify(result)
+
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Weather forecast error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
+def get_itinerary_weather(current_user, itinerary_id):
+    """Get the forecast for each day of a saved itinerary"""
+    try:
+        response = (
+            supabase.table("itineraries")
+            .select("destination, ai_response")
+            .eq("id", itinerary_id)
+            .eq("user_id", current_user["id"])
+            .execute()
+        )
+
+        if not response.data:
+            return jsonify({"success": False, "error": "Itinerary not found"}), 404
+
+        itinerary = response.data[0]
+        result = map_service.annotate_itinerary_weather(
+            itinerary.get("ai_response") or {},
+            city=request.args.get("city") or itinerary.get("destination"),
+        )
+        if not result["success"]:
+            return jsonify(result)
+
+        # Return only the per-day forecast, not the whole itinerary
+        annotated = result["data"].pop("itinerary")
+        result["data"]["days"] = [
+            {
+                "day": day.get("day"),
+                "date": day.get("date"),
+                "weather": day.get("weather"),
+            }
+            for day in annotated.get("daily_itinerary") or []
+        ]
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Itinerary weather error: {e}")
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+
+
 # Expense management routes
 def add_expense(current_user: dict):
     """Add a new expense record"""
@@ -518,16 +1032,25 @@ def list_expenses(current_user: dict):
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
 
-        # Get expenses
-        expenses = expense_service.get_expenses(
-            user_id=user_id,
-            itinerary_id=itinerary_id,
-            category=category,
-            start_date=start_date,
-            end_date=end_date,
-        )
+        filters = {
+            "user_id": user_id,
+            "itinerary_id": itinerary_id,
+            "category": category,
+            "start_date": start_date,
+            "end_date": end_date,
+        }
 
-        return jsonify({"success": True, "data": expenses})
+        # Cheap version check first; full rows are only fetched on a miss
+        versions = expense_service.get_expenses(**filters, columns="id, updated_at")
+        etag = rows_etag(f"expenses:{sorted(filters.items())}", versions)
+        return conditional_json(
+            etag,
+            lambda: json_list_response(
+                expense_service.get_expenses(**filters), success=True
+            ),
+            Config.CACHE_CONTROL_EXPENSE_LIST,
+            vary="Authorization",
+        )
 
     except Exception as e:
         logger.error(f"Error listing expenses: {e}")
@@ -606,7 +1129,7 @@ def get_expense_stats(current_user: dict):
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
-def parse_voice_expense():
+def parse_voice_expense(current_user=None):
     """Parse voice text into structured expense data using AI"""
     try:
         data = request.get_json()
@@ -627,6 +1150,55 @@ def parse_voice_expense():
         return jsonify({"success": False, "error": "Internal server error"}), 500
 
 
+def add_voice_expense(current_user: dict):
+    """Record an expense from a voice upload (ASR, parsing and insert in one call)"""
+    temp_path = None
+    try:
+        if "audio" not in request.files:
+            raise BadRequest("No audio file provided")
+
+        audio_file = request.files["audio"]
+        if audio_file.filename == "":
+            raise BadRequest("No file selected")
+
+        itinerary_id = request.form.get("itinerary_id")
+        if not itinerary_id:
+            raise BadRequest("itinerary_id is required")
+
+        language = request.form.get("language", "zh-CN")
+        require_confirmation = request.form.get(
+            "require_confirmation", "true"
+        ).lower() not in ("0", "false", "no")
+
+        saved = voice_service.save_uploaded_file(audio_file)
+        if not saved:
+            raise BadRequest("Failed to save audio file")
+        temp_path, content_hash = saved
+
+        result = voice_expense_pipeline.run(
+            current_user["id"],
+            itinerary_id,
+            temp_path,
+            content_hash,
+            language=language,
+            require_confirmation=require_confirmation,
+        )
+        return jsonify(result)
+
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except LookupError:
+        return jsonify({"success": False, "error": "Itinerary not found"}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error recording voice expense: {e}", exc_info=True)
+        return jsonify({"success": False, "error": "Internal server error"}), 500
+    finally:
+        if temp_path:
+            voice_service.cleanup_temp_file(temp_path)
+
+
 def analyze_budget(current_user: dict):
     """AI-powered budget analysis"""
     try:
@@ -651,8 +1223,12 @@ def analyze_budget(current_user: dict):
 
         itinerary = itinerary_response.data[0]
 
-        # Get expenses
-        expenses = expense_service.get_expenses(user_id, itinerary_id)
+        # Totals come from the maintained summary; only recent rows are
+        # fetched for the itemized part of the prompt
+        stats = expense_service.get_expense_statistics(user_id, itinerary_id)
+        expenses = expense_service.get_expenses(
+            user_id, itinerary_id, limit=RECENT_EXPENSES_FOR_ANALYSIS
+        )
 
         # Extract budget breakdown from ai_response
         ai_response = itinerary.get("ai_response", {})
@@ -680,6 +1256,7 @@ def analyze_budget(current_user: dict):
             total_budget=total_budget,
             destination=destination,
             remaining_days=remaining_days,
+            summary=stats,
         )
 
         return jsonify(result)
@@ -706,26 +1283,49 @@ def register_routes(app):
     voice_api.route("/transcribe", methods=["POST"])(
         recognize_voice
     )  # 添加transcribe别名
+    if Sock is not None:
+        Sock().route("/stream", bp=voice_api)(optional_auth(stream_voice))
+    else:
+        logger.info("flask-sock not installed, streaming voice endpoint disabled")
 
     # Create itinerary API blueprint
     itinerary_api = Blueprint("itinerary", __name__)
-    itinerary_api.route("/generate", methods=["POST"])(generate_itinerary)
+    itinerary_api.route("/generate", methods=["POST"])(
+        optional_auth(llm_quota(generate_itinerary))
+    )
+    itinerary_api.route("/insights", methods=["GET"])(
+        optional_auth(llm_quota(get_destination_insights))
+    )
     itinerary_api.route("/save", methods=["POST"])(require_auth(save_itinerary))
     itinerary_api.route("/list", methods=["GET"])(require_auth(list_itineraries))
     itinerary_api.route("/<itinerary_id>", methods=["GET"])(get_itinerary)
     itinerary_api.route("/<itinerary_id>", methods=["PUT"])(
         require_auth(update_itinerary)
     )
+    itinerary_api.route("/<itinerary_id>", methods=["PATCH"])(
+        require_auth(patch_itinerary)
+    )
     itinerary_api.route("/<itinerary_id>", methods=["DELETE"])(
         require_auth(delete_itinerary)
     )
+    itinerary_api.route("/<itinerary_id>/regenerate", methods=["POST"])(
+        require_auth(llm_quota(regenerate_itinerary_segment))
+    )
+    itinerary_api.route("/<itinerary_id>/optimize-budget", methods=["POST"])(
+        require_auth(llm_quota(optimize_itinerary_budget))
+    )
+    itinerary_api.route("/<itinerary_id>/weather", methods=["GET"])(
+        require_auth(get_itinerary_weather)
+    )
 
     # Create map API blueprint
     map_api = Blueprint("map", __name__)
     map_api.route("/geocode", methods=["GET"])(geocode)
     map_api.route("/search", methods=["GET"])(search_poi)
     map_api.route("/route", methods=["GET"])(get_route)
+    map_api.route("/day-route", methods=["POST"])(optional_auth(get_day_route))
     map_api.route("/weather", methods=["GET"])(get_weather)
+    map_api.route("/weather/forecast", methods=["GET"])(get_weather_forecast)
 
     # Create expense API blueprint
     expense_api = Blueprint("expenses", __name__)
@@ -735,17 +1335,30 @@ def register_routes(app):
     expense_api.route("/<expense_id>", methods=["PUT"])(require_auth(update_expense))
     expense_api.route("/<expense_id>", methods=["DELETE"])(require_auth(delete_expense))
     expense_api.route("/stats", methods=["GET"])(require_auth(get_expense_stats))
-    expense_api.route("/voice-parse", methods=["POST"])(parse_voice_expense)
-    expense_api.route("/ai-analysis", methods=["POST"])(require_auth(analyze_budget))
+    expense_api.route("/voice-parse", methods=["POST"])(
+        optional_auth(llm_quota(parse_voice_expense))
+    )
+    expense_api.route("/voice-add", methods=["POST"])(
+        require_auth(llm_quota(add_voice_expense))
+    )
+    expense_api.route("/ai-analysis", methods=["POST"])(
+        require_auth(llm_quota(analyze_budget))
+    )
+
+    # Admin routes
+    admin_api = Blueprint("admin", __name__)
+    admin_api.route("/usage", methods=["GET"])(require_admin(get_llm_usage))
 
     # Create main API blueprint and register all sub-blueprints
     main_api = Blueprint("api", __name__, url_prefix="/api")
     main_api.route("/health", methods=["GET"])(health_check)
+    main_api.route("/metrics", methods=["GET"])(get_metrics)
     main_api.register_blueprint(auth_api, url_prefix="/auth")
     main_api.register_blueprint(voice_api, url_prefix="/voice")
     main_api.register_blueprint(itinerary_api, url_prefix="/itinerary")
     main_api.register_blueprint(map_api, url_prefix="/map")
     main_api.register_blueprint(expense_api, url_prefix="/expenses")
+    main_api.register_blueprint(admin_api, url_prefix="/admin")
 
     # Register main blueprint with app
     app.register_blueprint(main_api)
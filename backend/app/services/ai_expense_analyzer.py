@@ -3,27 +3,20 @@ AI Expense Analyzer for intelligent expense parsing and budget analysis
 """
 
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from loguru import logger
 
-from ..config import Config
+from ..utils.json_repair import parse_tolerant_json
+from .llm_gateway import llm_gateway
 
 
 class AIExpenseAnalyzer:
     """AI-powered expense analysis service"""
 
     def __init__(self):
-        """Initialize AI expense analyzer with DeepSeek"""
-        self.llm = ChatOpenAI(
-            model="deepseek-chat",
-            base_url="https://api.deepseek.com",
-            api_key=Config.DEEPSEEK_API_KEY,
-            temperature=0.3,  # Lower temperature for more consistent parsing
-            max_tokens=2000,
-        )
+        """Initialize AI expense analyzer (LLM calls go through the gateway)"""
         logger.info("AI Expense Analyzer initialized")
 
     def parse_voice_expense(self, voice_text: str) -> Dict[str, Any]:
@@ -61,7 +54,7 @@ class AIExpenseAnalyzer:
             ]
 
             logger.info(f"Parsing voice expense: {voice_text}")
-            response = self.llm.invoke(messages)
+            response = llm_gateway.invoke("voice_parse", messages)
 
             # Parse JSON response
             result = self._parse_json_response(response.content)
@@ -92,16 +85,20 @@ class AIExpenseAnalyzer:
         total_budget: float,
         destination: str,
         remaining_days: int = 0,
+        summary: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """
         Comprehensive AI budget analysis
 
         Args:
-            expenses: List of expense records
+            expenses: List of expense records (the most recent ones are enough
+                when `summary` is given)
             budget_breakdown: Original budget allocation by category
             total_budget: Total budget amount
             destination: Travel destination
             remaining_days: Days remaining in trip
+            summary: Precomputed expense statistics (total_spent,
+                expense_count, by_category); computed from `expenses` if omitted
 
         Returns:
             Dictionary with analysis results:
@@ -112,7 +109,12 @@ class AIExpenseAnalyzer:
         """
         try:
             prompt = self._create_budget_analysis_prompt(
-                expenses, budget_breakdown, total_budget, destination, remaining_days
+                expenses,
+                budget_breakdown,
+                total_budget,
+                destination,
+                remaining_days,
+                summary,
             )
 
             messages = [
@@ -130,7 +132,7 @@ class AIExpenseAnalyzer:
             ]
 
             logger.info("Analyzing budget...")
-            response = self.llm.invoke(messages)
+            response = llm_gateway.invoke("budget_analysis", messages)
 
             # Parse JSON response
             result = self._parse_json_response(response.content)
@@ -186,15 +188,22 @@ class AIExpenseAnalyzer:
         total_budget: float,
         destination: str,
         remaining_days: int,
+        summary: Optional[Dict[str, Any]] = None,
     ) -> str:
         """Create prompt for budget analysis"""
         # Calculate current spending
-        total_spent = sum(float(exp.get("amount", 0)) for exp in expenses)
-        by_category = {}
-        for exp in expenses:
-            cat = exp.get("category", "其他")
-            amount = float(exp.get("amount", 0))
-            by_category[cat] = by_category.get(cat, 0) + amount
+        if summary is not None:
+            total_spent = summary["total_spent"]
+            expense_count = summary["expense_count"]
+            by_category = summary["by_category"]
+        else:
+            total_spent = sum(float(exp.get("amount", 0)) for exp in expenses)
+            expense_count = len(expenses)
+            by_category = {}
+            for exp in expenses:
+                cat = exp.get("category", "其他")
+                amount = float(exp.get("amount", 0))
+                by_category[cat] = by_category.get(cat, 0) + amount
 
         # Map categories
         category_map = {
@@ -227,7 +236,7 @@ class AIExpenseAnalyzer:
 ## 预算分配
 {json.dumps(budget_by_cn_category, ensure_ascii=False, indent=2)}
 
-## 实际开销（共 {len(expenses)} 笔，总计 ¥{total_spent}）
+## 实际开销（共 {expense_count} 笔，总计 ¥{total_spent}）
 ### 按类别汇总：
 {json.dumps(by_category, ensure_ascii=False, indent=2)}
 
@@ -277,24 +286,21 @@ class AIExpenseAnalyzer:
 请基于实际数据提供专业、客观的分析。"""
 
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse JSON from AI response, handling markdown code blocks"""
-        # Remove markdown code blocks if present
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-
-        response_text = response_text.strip()
-
+        """Parse JSON from AI response, repairing common formatting errors"""
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            result = parse_tolerant_json(response_text)
+        except ValueError as e:
             logger.error(f"Failed to parse JSON: {e}\nResponse: {response_text}")
             raise ValueError(f"AI 返回的数据格式错误: {str(e)}")
 
+        if not isinstance(result.data, dict):
+            logger.error(f"AI response is not a JSON object: {response_text}")
+            raise ValueError("AI 返回的数据格式错误: 不是 JSON 对象")
+
+        if result.repairs:
+            logger.warning(f"Repaired AI response JSON: {'; '.join(result.repairs)}")
+        return result.data
+
     def _validate_expense_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and normalize parsed expense data"""
         valid_categories = ["交通", "住宿", "餐饮", "景点", "购物", "其他"]
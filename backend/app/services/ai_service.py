@@ -2,15 +2,38 @@
 AI Service for travel itinerary planning using DeepSeek
 """
 
-import json
-from datetime import datetime
-from typing import Any, Dict
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
 from loguru import logger
 
 from ..config import Config
+from ..utils.city_index import city_index
+from ..utils.json_repair import parse_tolerant_json
+from ..utils.persistent_cache import persistent_cache
+from ..utils.rate_limiter import Priority, upstream_priority
+from ..utils.single_flight import normalize_key, single_flight_group
+from ..utils.usage_meter import usage_scope
+from .budget_optimizer import budget_optimizer
+from .llm_gateway import llm_gateway
+
+# Allowed values for the `type` field of itinerary items
+ITEM_TYPES = ("attraction", "restaurant", "hotel", "transportation")
+
+# Completion budgets: sized per call instead of one fixed cap for the trip
+MAX_COMPLETION_TOKENS = 8000
+SKELETON_BASE_TOKENS = 1200
+SKELETON_DAY_TOKENS = 120
+DAY_TOKENS = 1600
+
+TIME_PATTERN = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+# Bump when the insights prompt or key changes so cached answers are regenerated
+INSIGHTS_PROMPT_VERSION = 2
 
 
 class AIService:
@@ -18,12 +41,18 @@ class AIService:
 
     def __init__(self):
         """Initialize the AI service with DeepSeek"""
-        self.llm = ChatOpenAI(
-            model="deepseek-chat",
-            base_url="https://api.deepseek.com",
-            api_key=Config.DEEPSEEK_API_KEY,
-            temperature=0.7,
-            max_tokens=4000,
+        self._generate_flight = single_flight_group(
+            "ai.generate_itinerary",
+            enabled=Config.single_flight_enabled("ai.generate_itinerary"),
+            wait_timeout=Config.SINGLE_FLIGHT_LLM_WAIT_TIMEOUT,
+        )
+        self._insights_flight = single_flight_group(
+            "ai.destination_insights",
+            enabled=Config.single_flight_enabled("ai.destination_insights"),
+            wait_timeout=Config.SINGLE_FLIGHT_LLM_WAIT_TIMEOUT,
+        )
+        self._insights_cache = persistent_cache(
+            "ai.destination_insights", default_ttl=Config.INSIGHTS_CACHE_TTL
         )
         logger.info("AI Service initialized with DeepSeek")
 
@@ -50,39 +79,60 @@ class AIService:
         Returns:
             dict: Generated itinerary with structured data
         """
+        # Identical concurrent requests share one LLM call
+        key = normalize_key(
+            destination, start_date, end_date, budget, people_count, preferences
+        )
+        return self._generate_flight.do(
+            key,
+            self._generate_itinerary,
+            destination,
+            start_date,
+            end_date,
+            budget,
+            people_count,
+            preferences,
+        )
+
+    def _generate_itinerary(
+        self,
+        destination: str,
+        start_date: str,
+        end_date: str,
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> Dict[str, Any]:
+        """Generate an itinerary, chunking long trips by day"""
         try:
             # Calculate days
             start = datetime.strptime(start_date, "%Y-%m-%d")
             end = datetime.strptime(end_date, "%Y-%m-%d")
             days = (end - start).days + 1
 
-            # Prepare the prompt
-            prompt = self._create_itinerary_prompt(
-                destination,
-                start_date,
-                end_date,
-                days,
-                budget,
-                people_count,
-                preferences,
-            )
-
-            # Create messages
-            messages = [
-                SystemMessage(
-                    content="你是一个专业的旅行规划师，擅长为用户制定详细、实用的旅行计划。请用中文回答。"
-                ),
-                HumanMessage(content=prompt),
-            ]
-
-            # Call the model
             logger.info(
                 f"Generating itinerary for {destination}, {days} days, budget: {budget}"
             )
-            response = self.llm.invoke(messages)
-
-            # Parse the response
-            result = self._parse_itinerary_response(response.content)
+            if days >= Config.ITINERARY_CHUNK_MIN_DAYS:
+                result = self._generate_chunked(
+                    destination,
+                    start_date,
+                    end_date,
+                    days,
+                    budget,
+                    people_count,
+                    preferences,
+                )
+            else:
+                result = self._generate_single(
+                    destination,
+                    start_date,
+                    end_date,
+                    days,
+                    budget,
+                    people_count,
+                    preferences,
+                )
 
             # Add metadata
             result["metadata"] = {
@@ -102,6 +152,170 @@ class AIService:
             logger.error(f"Failed to generate itinerary: {e}")
             return {"success": False, "error": str(e)}
 
+    def _generate_single(
+        self,
+        destination: str,
+        start_date: str,
+        end_date: str,
+        days: int,
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> Dict[str, Any]:
+        """Generate a short trip with a single LLM call"""
+        # Prepare the prompt
+        prompt = self._create_itinerary_prompt(
+            destination,
+            start_date,
+            end_date,
+            days,
+            budget,
+            people_count,
+            preferences,
+        )
+
+        # Create messages
+        messages = [
+            SystemMessage(
+                content="你是一个专业的旅行规划师，擅长为用户制定详细、实用的旅行计划。请用中文回答。"
+            ),
+            HumanMessage(content=prompt),
+        ]
+
+        # Call the model
+        max_tokens = min(
+            MAX_COMPLETION_TOKENS, SKELETON_BASE_TOKENS + DAY_TOKENS * days
+        )
+        response = llm_gateway.invoke("itinerary", messages, max_tokens=max_tokens)
+
+        # Parse the response
+        return self._parse_itinerary_response(response.content)
+
+    def _generate_chunked(
+        self,
+        destination: str,
+        start_date: str,
+        end_date: str,
+        days: int,
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> Dict[str, Any]:
+        """
+        Generate a long trip in two phases
+
+        A quick skeleton call plans the summary, budget and day themes, then
+        every day's items are generated in parallel with bounded concurrency,
+        so latency stays close to that of a single day and no completion
+        is large enough to be truncated.
+        """
+        prompt = self._create_skeleton_prompt(
+            destination, start_date, end_date, days, budget, people_count, preferences
+        )
+        messages = [
+            SystemMessage(
+                content="你是一个专业的旅行规划师，擅长为用户制定详细、实用的旅行计划。请用中文回答。"
+            ),
+            HumanMessage(content=prompt),
+        ]
+
+        max_tokens = min(
+            MAX_COMPLETION_TOKENS, SKELETON_BASE_TOKENS + SKELETON_DAY_TOKENS * days
+        )
+        response = llm_gateway.invoke("itinerary", messages, max_tokens=max_tokens)
+        skeleton = self._parse_itinerary_response(response.content)
+        if "parse_error" in skeleton:
+            return skeleton
+
+        # Fill in any day the skeleton left out so every date gets items
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        planned = {
+            day.get("day"): day
+            for day in skeleton.get("daily_itinerary") or []
+            if isinstance(day, dict)
+        }
+        day_plans = []
+        for offset in range(days):
+            plan = dict(planned.get(offset + 1) or {})
+            plan["day"] = offset + 1
+            plan["date"] = (start + timedelta(days=offset)).strftime("%Y-%m-%d")
+            day_plans.append(plan)
+
+        logger.info(
+            f"Skeleton ready, generating {days} days with "
+            f"concurrency {Config.ITINERARY_DAY_CONCURRENCY}"
+        )
+        daily_itinerary = []
+        warnings = []
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(Config.ITINERARY_DAY_CONCURRENCY, days)),
+            thread_name_prefix="itinerary-day",
+        ) as executor:
+            futures = [
+                executor.submit(
+                    # Keep the caller's priority and usage attribution
+                    contextvars.copy_context().run,
+                    self._generate_day,
+                    destination,
+                    plan,
+                    day_plans,
+                    budget,
+                    people_count,
+                    preferences,
+                )
+                for plan in day_plans
+            ]
+            # Collect in day order; the calls themselves run concurrently
+            for index, future in enumerate(futures):
+                plan = day_plans[index]
+                day = {
+                    "day": plan["day"],
+                    "date": plan["date"],
+                    "theme": plan.get("theme", ""),
+                    "items": [],
+                }
+                try:
+                    day["items"] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to generate day {plan['day']}: {e}")
+                    warnings.append(f"第 {plan['day']} 天生成失败，请单独重新生成")
+                warnings.extend(self._validate_day(day))
+                daily_itinerary.append(day)
+
+        skeleton["daily_itinerary"] = daily_itinerary
+        if warnings:
+            skeleton["generation_warnings"] = warnings
+        return skeleton
+
+    def _generate_day(
+        self,
+        destination: str,
+        plan: Dict[str, Any],
+        day_plans: List[Dict[str, Any]],
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> List[Dict[str, Any]]:
+        """Generate the items of one day from its skeleton plan"""
+        prompt = self._create_day_prompt(
+            destination, plan, day_plans, budget, people_count, preferences
+        )
+        messages = [
+            SystemMessage(
+                content="你是一个专业的旅行规划师，负责细化某一天的行程。请用中文回答，只返回 JSON。"
+            ),
+            HumanMessage(content=prompt),
+        ]
+
+        response = llm_gateway.invoke("itinerary", messages, max_tokens=DAY_TOKENS)
+        parsed = self._parse_itinerary_response(
+            response.content, required_keys=("items",)
+        )
+        items = parsed.get("items")
+        if "parse_error" in parsed or not isinstance(items, list):
+            raise ValueError("AI response did not contain a valid items list")
+        return items
+
     def _create_itinerary_prompt(
         self,
         destination: str,
@@ -188,62 +402,161 @@ class AIService:
 
         return prompt
 
-    def _parse_itinerary_response(self, response: str) -> Dict[str, Any]:
-        """Parse the AI response to extract structured data"""
-        try:
-            # Try to find JSON in the response
-            response = response.strip()
+    def _create_skeleton_prompt(
+        self,
+        destination: str,
+        start_date: str,
+        end_date: str,
+        days: int,
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> str:
+        """Create the prompt for the trip skeleton of a chunked generation"""
+
+        return f"""请为我规划一份旅行计划的整体框架（暂不需要每天的具体行程项目），要求如下：
+
+旅行信息：
+- 目的地：{destination}
+- 出行时间：{start_date} 至 {end_date}（共 {days} 天）
+- 预算：{budget} 元人民币
+- 同行人数：{people_count} 人
+- 特别偏好：{preferences if preferences else "无特别要求"}
+
+必须严格按照以下 JSON 格式返回：
+
+{{
+  "summary": "简要总结这次旅行的亮点（50-100字）",
+  "budget_breakdown": {{
+    "transportation": 800,
+    "accommodation": 1200,
+    "food": 1500,
+    "attractions": 800,
+    "shopping": 500,
+    "other": 200
+  }},
+  "daily_itinerary": [
+    {{
+      "day": 1,
+      "theme": "第一天的主题（如：历史文化探索）",
+      "area": "当天主要活动区域",
+      "highlights": ["当天的核心景点1", "核心景点2"],
+      "day_budget": 500
+    }}
+  ],
+  "accommodation_suggestions": [
+    {{
+      "name": "酒店名称",
+      "location": "具体地址",
+      "price_range": "价格范围（如：300-500元/晚）",
+      "features": "特色（如：近地铁、含早餐）",
+      "booking_tips": "预订建议"
+    }}
+  ],
+  "travel_tips": ["实用建议1", "实用建议2", "实用建议3"],
+  "emergency_contacts": [
+    {{
+      "name": "紧急联系名称（如：当地警察）",
+      "phone": "电话号码"
+    }}
+  ]
+}}
+
+要求：
+1. 必须返回有效的 JSON 格式，不要包含任何其他说明文字
+2. daily_itinerary 必须包含全部 {days} 天，每天的核心景点不要重复
+3. 数字类型的字段必须使用数字，预算分配不能超出总预算
+4. 同一天的活动区域要集中，减少路上时间"""
 
-            # If response starts with ```json, extract the JSON part
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
+    def _create_day_prompt(
+        self,
+        destination: str,
+        plan: Dict[str, Any],
+        day_plans: List[Dict[str, Any]],
+        budget: float,
+        people_count: int,
+        preferences: str,
+    ) -> str:
+        """Create the prompt for one day of a chunked generation"""
+        other_days = "\n".join(
+            f"- 第 {other['day']} 天：{other.get('theme', '')}"
+            f"（{'、'.join(other.get('highlights') or [])}）"
+            for other in day_plans
+            if other["day"] != plan["day"]
+        )
+        day_budget = plan.get("day_budget") or round(budget / max(len(day_plans), 1))
 
-            # Additional cleaning: remove any text before the first {
-            json_start = response.find("{")
-            if json_start > 0:
-                response = response[json_start:]
+        return f"""请细化{destination}旅行第 {plan["day"]} 天（{plan["date"]}）的行程。
 
-            # Additional cleaning: remove any text after the last }
-            json_end = response.rfind("}")
-            if json_end > 0:
-                response = response[: json_end + 1]
+当天安排：
+- 主题：{plan.get("theme", "自由安排")}
+- 活动区域：{plan.get("area", "不限")}
+- 核心景点：{"、".join(plan.get("highlights") or []) or "自行推荐"}
+- 当天预算：约 {day_budget} 元（{people_count} 人）
+- 特别偏好：{preferences if preferences else "无特别要求"}
+
+其他天的安排（不要重复其中的景点）：
+{other_days or "- 无"}
+
+请严格按照以下 JSON 格式返回，不要包含其他文字：
+{{
+  "items": [
+    {{
+      "time": "09:00",
+      "type": "attraction",
+      "title": "具体地点或活动名称",
+      "description": "详细描述（50-100字）",
+      "location": "具体地址",
+      "estimated_cost": 100,
+      "duration": "2小时",
+      "tips": "实用建议或注意事项"
+    }}
+  ]
+}}
 
-            # Try to fix common JSON errors
-            response = response.strip()
+要求：
+1. 安排 4-6 个行程项目，按时间顺序排列，包含午餐和晚餐
+2. type 只能是：attraction, restaurant, hotel, transportation 之一
+3. estimated_cost 必须是数字，总费用不超过当天预算
+4. 提供具体的地址，方便导航"""
 
-            # Parse JSON
-            data = json.loads(response)
+    def _parse_itinerary_response(
+        self,
+        response: str,
+        required_keys: Tuple[str, ...] = (
+            "summary",
+            "budget_breakdown",
+            "daily_itinerary",
+        ),
+    ) -> Dict[str, Any]:
+        """Parse the AI response to extract structured data"""
+        try:
+            # Fences, prose, comments and truncation are repaired by the
+            # tolerant parser instead of failing the whole generation
+            result = parse_tolerant_json(response)
+            data = result.data
+            if not isinstance(data, dict):
+                raise ValueError("AI response is not a JSON object")
+
+            if result.repairs:
+                logger.warning(
+                    f"Repaired AI response JSON: {'; '.join(result.repairs)}"
+                )
+                data["parse_repairs"] = result.repairs
+            if result.truncated:
+                data["truncated"] = True
 
             # Validate the structure
-            required_keys = ["summary", "budget_breakdown", "daily_itinerary"]
             for key in required_keys:
                 if key not in data:
                     logger.warning(f"Missing required key in AI response: {key}")
 
             return data
 
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             logger.error(f"Failed to parse AI response as JSON: {e}")
             logger.debug(f"Response was: {response[:1000]}...")
 
-            # Try to extract useful information even if JSON parsing fails
-            try:
-                # Attempt to fix common issues and retry
-                # Remove any trailing commas before } or ]
-                import re
-
-                fixed_response = re.sub(r",(\s*[}\]])", r"\1", response)
-                # Try parsing again
-                data = json.loads(fixed_response)
-                logger.info("Successfully parsed JSON after fixing common errors")
-                return data
-            except:  # noqa
-                pass
-
             # Return a fallback structure
             return {
                 "summary": "行程生成成功，但格式解析失败。请查看原始响应。",
@@ -261,32 +574,385 @@ class AIService:
                 "travel_tips": ["请查看原始响应获取完整行程信息"],
             }
 
+    def regenerate_segment(
+        self,
+        itinerary_data: Dict[str, Any],
+        day_index: int,
+        instruction: str = "",
+        item_index: Optional[int] = None,
+        time_range: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Regenerate one day, one item or a time range of an existing itinerary
+
+        Only the targeted items, their neighbours and the remaining budget
+        are sent to the model, so an edit costs a few hundred tokens instead
+        of a full regeneration.
+
+        Args:
+            itinerary_data: Existing itinerary (the saved `ai_response`)
+            day_index: Index of the day in `daily_itinerary` (0-based)
+            instruction: What the user wants changed
+            item_index: Index of a single item to replace (0-based, optional)
+            time_range: Time range to replace, e.g. "13:00-18:00" (optional)
+
+        Returns:
+            dict: Updated itinerary, replaced and new items, validation warnings
+        """
+        try:
+            days = itinerary_data.get("daily_itinerary") or []
+            if not 0 <= day_index < len(days):
+                raise ValueError(f"Day index {day_index} out of range")
+
+            day = days[day_index]
+            items = day.get("items") or []
+            start, end = self._select_segment(items, item_index, time_range)
+
+            metadata = itinerary_data.get("metadata") or {}
+            replaced = items[start:end]
+            other_cost = sum(
+                self._item_cost(item)
+                for i, other_day in enumerate(days)
+                for j, item in enumerate(other_day.get("items") or [])
+                if i != day_index or not start <= j < end
+            )
+            budget = metadata.get("budget")
+            remaining_budget = max(0.0, float(budget) - other_cost) if budget else None
+
+            prompt = self._create_segment_prompt(
+                destination=metadata.get("destination", ""),
+                day=day,
+                replaced=replaced,
+                previous_item=items[start - 1] if start > 0 else None,
+                next_item=items[end] if end < len(items) else None,
+                remaining_budget=remaining_budget,
+                people_count=metadata.get("people_count"),
+                instruction=instruction,
+            )
+
+            messages = [
+                SystemMessage(
+                    content="你是一个专业的旅行规划师，负责局部调整已有行程。请用中文回答，只返回 JSON。"
+                ),
+                HumanMessage(content=prompt),
+            ]
+
+            # Size the completion to the segment instead of the whole trip
+            expected_items = max(len(replaced), 1) if replaced else 4
+            max_tokens = min(1500, 300 + 250 * expected_items)
+
+            logger.info(
+                f"Regenerating day {day_index} items [{start}:{end}] "
+                f"(max_tokens={max_tokens})"
+            )
+            response = llm_gateway.invoke("itinerary", messages, max_tokens=max_tokens)
+
+            parsed = self._parse_itinerary_response(
+                response.content, required_keys=("items",)
+            )
+            new_items = parsed.get("items")
+            if "parse_error" in parsed or not isinstance(new_items, list):
+                raise ValueError("AI response did not contain a valid items list")
+
+            updated = dict(itinerary_data)
+            updated_days = list(days)
+            updated_day = dict(day)
+            new_items = [dict(item) for item in new_items if isinstance(item, dict)]
+            updated_day["items"] = (
+                [dict(item) for item in items[:start]]
+                + new_items
+                + [dict(item) for item in items[end:]]
+            )
+            warnings = self._validate_day(updated_day)
+            updated_days[day_index] = updated_day
+            updated["daily_itinerary"] = updated_days
+
+            new_total = other_cost + sum(self._item_cost(item) for item in new_items)
+            if budget and new_total > float(budget):
+                warnings.append(
+                    f"行程项目总费用 {new_total:.0f} 元超出预算 {budget} 元"
+                )
+
+            logger.info(f"Regenerated {len(new_items)} items for day {day_index}")
+            return {
+                "success": True,
+                "data": {
+                    "itinerary": updated,
+                    "day_index": day_index,
+                    "replaced": replaced,
+                    "items": new_items,
+                    "warnings": warnings,
+                },
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to regenerate itinerary segment: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _select_segment(
+        self,
+        items: List[Dict[str, Any]],
+        item_index: Optional[int],
+        time_range: Optional[str],
+    ) -> Tuple[int, int]:
+        """Resolve the item slice [start, end) to regenerate"""
+        if item_index is not None:
+            if not 0 <= item_index < len(items):
+                raise ValueError(f"Item index {item_index} out of range")
+            return item_index, item_index + 1
+
+        if time_range:
+            bounds = [self._normalize_time(part) for part in time_range.split("-")]
+            if len(bounds) != 2 or None in bounds:
+                raise ValueError(f"Invalid time range '{time_range}', use HH:MM-HH:MM")
+            range_start, range_end = bounds
+
+            selected = []
+            for i, item in enumerate(items):
+                item_time = self._normalize_time(item.get("time", ""))
+                if item_time and range_start <= item_time < range_end:
+                    selected.append(i)
+            if not selected:
+                raise ValueError(f"No items found in time range {time_range}")
+            return selected[0], selected[-1] + 1
+
+        return 0, len(items)
+
+    def _create_segment_prompt(
+        self,
+        destination: str,
+        day: Dict[str, Any],
+        replaced: List[Dict[str, Any]],
+        previous_item: Optional[Dict[str, Any]],
+        next_item: Optional[Dict[str, Any]],
+        remaining_budget: Optional[float],
+        people_count: Optional[int],
+        instruction: str,
+    ) -> str:
+        """Create a compact prompt for regenerating part of a day"""
+
+        def brief(item: Dict[str, Any]) -> str:
+            location = f"{item['location']}，" if item.get("location") else ""
+            return (
+                f"{item.get('time', '')} [{item.get('type', '')}] {item.get('title', '')}"
+                f"（{location}约 {item.get('estimated_cost', 0)} 元）"
+            )
+
+        replaced_text = (
+            "\n".join(f"- {brief(item)}" for item in replaced) if replaced else "- 无"
+        )
+        context_lines = []
+        if previous_item:
+            context_lines.append(f"- 之前的安排：{brief(previous_item)}")
+        if next_item:
+            context_lines.append(f"- 之后的安排：{brief(next_item)}")
+
+        return f"""请替换 {destination} 行程中第 {day.get("day", "")} 天（{day.get("date", "")}，主题：{day.get("theme", "")}）的部分安排。
+
+需要替换的项目：
+{replaced_text}
+
+相邻安排（保持不变，注意衔接时间和路程）：
+{chr(10).join(context_lines) if context_lines else "- 无"}
+
+剩余可用预算：{f"{remaining_budget:.0f} 元" if remaining_budget is not None else "不限"}
+同行人数：{people_count or "未知"} 人
+用户要求：{instruction or "换成不同的安排"}
+
+请严格按照以下 JSON 格式返回，不要包含其他文字：
+{{
+  "items": [
+    {{
+      "time": "14:00",
+      "type": "attraction",
+      "title": "具体地点或活动名称",
+      "description": "详细描述（50-100字）",
+      "location": "具体地址",
+      "estimated_cost": 100,
+      "duration": "2小时",
+      "tips": "实用建议或注意事项"
+    }}
+  ]
+}}
+
+要求：
+1. type 只能是：attraction, restaurant, hotel, transportation 之一
+2. estimated_cost 必须是数字，总费用不要超过剩余可用预算
+3. 时间必须落在相邻安排之间，并按时间顺序排列"""
+
+    def _validate_day(self, day: Dict[str, Any]) -> List[str]:
+        """
+        Normalize a day's items in place and report problems
+
+        Args:
+            day: One entry of `daily_itinerary`
+
+        Returns:
+            list: Human-readable validation warnings
+        """
+        warnings = []
+        items = []
+        for item in day.get("items") or []:
+            if not isinstance(item, dict) or not item.get("title"):
+                warnings.append("已移除缺少标题的行程项目")
+                continue
+
+            if item.get("type") not in ITEM_TYPES:
+                warnings.append(
+                    f"项目「{item['title']}」类型 '{item.get('type')}' 无效，已设为 attraction"
+                )
+                item["type"] = "attraction"
+
+            item["estimated_cost"] = self._item_cost(item)
+            item_time = self._normalize_time(item.get("time", ""))
+            if item_time:
+                item["time"] = item_time
+            else:
+                warnings.append(f"项目「{item['title']}」时间格式无效")
+            items.append(item)
+
+        # Items with invalid times keep their relative order at the end
+        items.sort(
+            key=lambda item: self._normalize_time(item.get("time", "")) or "99:99"
+        )
+        titles = [item["title"] for item in items]
+        for title in sorted({t for t in titles if titles.count(t) > 1}):
+            warnings.append(f"项目「{title}」在同一天重复出现")
+
+        day["items"] = items
+        return warnings
+
+    @staticmethod
+    def _normalize_time(value: Any) -> Optional[str]:
+        """Normalize "9:00" to "09:00", returning None for invalid times"""
+        match = TIME_PATTERN.match(str(value).strip())
+        if not match:
+            return None
+        return f"{int(match.group(1)):02d}:{match.group(2)}"
+
+    @staticmethod
+    def _item_cost(item: Dict[str, Any]) -> float:
+        """Get an item's estimated cost as a non-negative number"""
+        try:
+            return max(0.0, float(item.get("estimated_cost") or 0))
+        except (TypeError, ValueError):
+            return 0.0
+
     def optimize_budget(
-        self, itinerary_data: Dict, new_budget: float
+        self, itinerary_data: Dict, new_budget: float, substitutions: bool = False
     ) -> Dict[str, Any]:
         """
         Optimize an existing itinerary for a new budget
 
+        The budget is fitted by a local solver in milliseconds; the LLM is
+        only called when the user asks for substitutions of the items the
+        solver downgraded or dropped.
+
         Args:
             itinerary_data: Existing itinerary data
             new_budget: New budget constraint
+            substitutions: Ask the LLM for cheaper alternatives (optional)
 
         Returns:
-            dict: Optimized itinerary
+            dict: Optimized itinerary with the item and breakdown diff
         """
-        # TODO: Implement budget optimization logic
-        pass
+        try:
+            result = budget_optimizer.optimize(itinerary_data, new_budget)
+
+            if substitutions and result["changes"]:
+                destination = (itinerary_data.get("metadata") or {}).get(
+                    "destination", ""
+                )
+                result["substitutions"] = self._suggest_substitutions(
+                    destination, result["changes"]
+                )
+
+            return {"success": True, "data": result}
+
+        except Exception as e:
+            logger.error(f"Failed to optimize budget: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _suggest_substitutions(
+        self, destination: str, changes: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Ask the LLM for cheaper alternatives to downgraded or dropped items"""
+        lines = "\n".join(
+            f"- 第 {change['day_index'] + 1} 天 {change['title']}（{change['type']}，"
+            f"原价约 {change['old_cost']:.0f} 元，"
+            + (
+                "已删除，希望找到免费或低价替代"
+                if change["action"] == "drop"
+                else f"预算不超过 {change['new_cost']:.0f} 元"
+            )
+            + "）"
+            for change in changes
+        )
+        prompt = f"""以下是{destination}行程中因预算调整被降级或删除的项目：
+{lines}
+
+请为每个项目推荐一个更便宜的替代方案，严格按照以下 JSON 格式返回，不要包含其他文字：
+{{
+  "substitutions": [
+    {{
+      "replaces": "原项目名称",
+      "type": "attraction",
+      "title": "替代地点或活动名称",
+      "location": "具体地址",
+      "estimated_cost": 30,
+      "reason": "推荐理由（20字以内）"
+    }}
+  ]
+}}"""
+
+        messages = [
+            SystemMessage(
+                content="你是一个精打细算的旅行规划师。请用中文回答，只返回 JSON。"
+            ),
+            HumanMessage(content=prompt),
+        ]
+
+        logger.info(f"Requesting substitutions for {len(changes)} changed items")
+        response = llm_gateway.invoke(
+            "itinerary", messages, max_tokens=min(1500, 200 + 150 * len(changes))
+        )
+        parsed = self._parse_itinerary_response(
+            response.content, required_keys=("substitutions",)
+        )
+        substitutions = parsed.get("substitutions")
+        return substitutions if isinstance(substitutions, list) else []
 
     def get_destination_insights(self, destination: str) -> Dict[str, Any]:
         """
         Get insights and recommendations for a destination
 
+        Insights are mostly static, so they are kept in the persistent
+        cache, keyed by destination and prompt version.
+
         Args:
             destination: The destination to analyze
 
         Returns:
             dict: Destination insights and tips
         """
+        key = self._insights_key(destination)
+        cached = self._insights_cache.get(key)
+        if cached is not None:
+            return {"success": True, "data": cached, "cached": True}
+        return self._insights_flight.do(
+            key, self._get_destination_insights, key, destination
+        )
+
+    def _insights_key(self, destination: str) -> str:
+        """Cache key; a city's official and short names share one entry"""
+        # Aliases are skipped: many name scenic spots (鼓浪屿, 泰山) whose
+        # insights differ from their host city's
+        city = city_index.lookup_exact(destination, aliases=False)
+        name = city.name if city else destination
+        return normalize_key(f"v{INSIGHTS_PROMPT_VERSION}", name)
+
+    def _get_destination_insights(self, key: str, destination: str) -> Dict[str, Any]:
+        """Ask the LLM for destination insights and cache the answer"""
         try:
             prompt = f"""请提供关于{destination}的旅行见解，包括：
             1. 最佳旅行季节
@@ -302,12 +968,52 @@ class AIService:
                 HumanMessage(content=prompt),
             ]
 
-            response = self.llm.invoke(messages)
+            response = llm_gateway.invoke("insights", messages)
+            self._insights_cache.set(key, response.content)
             return {"success": True, "data": response.content}
         except Exception as e:
             logger.error(f"Failed to get destination insights: {e}")
             return {"success": False, "error": str(e)}
 
+    def warm_up_insights(
+        self, destinations: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Pre-populate the insights cache for popular destinations
+
+        Runs at background priority so it never delays user requests;
+        destinations that are already cached are skipped.
+
+        Args:
+            destinations: Destinations to warm (defaults to
+                Config.INSIGHTS_WARMUP_DESTINATIONS)
+
+        Returns:
+            dict: Counts of generated, already cached and failed entries
+        """
+        if destinations is None:
+            destinations = Config.INSIGHTS_WARMUP_DESTINATIONS
+        counts = {"generated": 0, "cached": 0, "failed": 0}
+
+        with (
+            upstream_priority(Priority.BACKGROUND),
+            usage_scope(endpoint="insights_warmup"),
+        ):
+            for destination in destinations:
+                result = self.get_destination_insights(destination)
+                if not result["success"]:
+                    counts["failed"] += 1
+                elif result.get("cached"):
+                    counts["cached"] += 1
+                else:
+                    counts["generated"] += 1
+
+        logger.info(
+            f"Destination insights warm-up: {counts['generated']} generated, "
+            f"{counts['cached']} cached, {counts['failed']} failed"
+        )
+        return counts
+
 
 # Create a singleton instance
 ai_service = AIService()
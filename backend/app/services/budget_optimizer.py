@@ -0,0 +1,319 @@
+"""
+Deterministic budget optimizer for generated itineraries
+
+Fits an existing itinerary into a new budget without calling the LLM:
+the budget breakdown is rescaled and itinerary items are downgraded or
+dropped by cost, priority and type until every category fits.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+# Budget breakdown category that each item type is paid from
+CATEGORY_BY_TYPE = {
+    "attraction": "attractions",
+    "restaurant": "food",
+    "hotel": "accommodation",
+    "transportation": "transportation",
+}
+
+BUDGET_CATEGORIES = [
+    "transportation",
+    "accommodation",
+    "food",
+    "attractions",
+    "shopping",
+    "other",
+]
+
+# Cost multiplier when switching to a cheaper option of the same kind
+# (None means the item cannot be downgraded, e.g. fixed ticket prices)
+DOWNGRADE_FACTORS = {
+    "restaurant": 0.6,
+    "hotel": 0.7,
+    "transportation": 0.5,
+    "attraction": None,
+}
+
+DOWNGRADE_NOTES = {
+    "restaurant": "预算调整：建议改为当地平价餐厅或小吃",
+    "hotel": "预算调整：建议选择经济型酒店或民宿",
+    "transportation": "预算调整：建议改乘公共交通",
+}
+
+# Default importance when an item carries no explicit `priority`
+# (lower values are dropped first; only droppable types are ever removed)
+DEFAULT_PRIORITY = {
+    "attraction": 2,
+    "restaurant": 3,
+    "transportation": 4,
+    "hotel": 5,
+}
+
+DROPPABLE_TYPES = {"attraction"}
+
+# Categories that give up their allocation first when others overflow
+SLACK_DONOR_ORDER = ["other", "shopping", "attractions", "food", "transportation"]
+
+
+class BudgetOptimizer:
+    """Local constraint solver that fits an itinerary into a new budget"""
+
+    def optimize(
+        self, itinerary_data: Dict[str, Any], new_budget: float
+    ) -> Dict[str, Any]:
+        """
+        Fit an itinerary into a new total budget
+
+        Args:
+            itinerary_data: Existing itinerary (the saved `ai_response`)
+            new_budget: New total budget in CNY
+
+        Returns:
+            dict: Optimized itinerary, item changes, breakdown diff and
+            whether the new budget could be met
+        """
+        if new_budget <= 0:
+            raise ValueError("Budget must be positive")
+
+        itinerary = copy.deepcopy(itinerary_data)
+        old_breakdown = self._numeric_breakdown(itinerary.get("budget_breakdown"))
+        days = itinerary.get("daily_itinerary") or []
+
+        entries = self._collect_items(days)
+        cost_before = sum(entry["cost"] for entry in entries)
+        new_breakdown = self._rescale_breakdown(old_breakdown, entries, new_budget)
+
+        changes: List[Dict[str, Any]] = []
+        for category in BUDGET_CATEGORIES:
+            category_entries = [e for e in entries if e["category"] == category]
+            self._fit_category(
+                category_entries, new_breakdown.get(category, 0), days, changes
+            )
+
+        shortfall = self._rebalance(new_breakdown, entries)
+
+        # Apply changes to the copied itinerary, removing dropped items last
+        for entry in entries:
+            if entry["dropped"] or entry["cost"] == entry["original_cost"]:
+                continue
+            entry["item"]["estimated_cost"] = entry["cost"]
+            entry["item"]["budget_note"] = DOWNGRADE_NOTES.get(entry["type"], "")
+        for day in days:
+            day["items"] = [
+                item for item in day.get("items") or [] if not item.get("_dropped")
+            ]
+
+        itinerary["budget_breakdown"] = new_breakdown
+        metadata = itinerary.setdefault("metadata", {})
+        metadata["budget"] = new_budget
+
+        cost_after = sum(e["cost"] for e in entries if not e["dropped"])
+        breakdown_diff = {
+            category: {
+                "old": old_breakdown.get(category, 0),
+                "new": new_breakdown.get(category, 0),
+            }
+            for category in sorted(set(old_breakdown) | set(new_breakdown))
+            if old_breakdown.get(category, 0) != new_breakdown.get(category, 0)
+        }
+
+        logger.info(
+            f"Budget optimized to {new_budget}: {len(changes)} item changes, "
+            f"items cost {cost_before:.0f} -> {cost_after:.0f}"
+        )
+        return {
+            "itinerary": itinerary,
+            "changes": changes,
+            "budget_breakdown_diff": breakdown_diff,
+            "items_cost_before": cost_before,
+            "items_cost_after": cost_after,
+            "new_budget": new_budget,
+            "feasible": shortfall == 0,
+            "shortfall": shortfall,
+        }
+
+    def _collect_items(self, days: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Flatten itinerary items into solver entries"""
+        entries = []
+        for day_index, day in enumerate(days):
+            for item_index, item in enumerate(day.get("items") or []):
+                if not isinstance(item, dict):
+                    continue
+                item_type = item.get("type", "attraction")
+                cost = self._item_cost(item)
+                entries.append(
+                    {
+                        "item": item,
+                        "day": day,
+                        "day_index": day_index,
+                        "item_index": item_index,
+                        "type": item_type,
+                        "category": CATEGORY_BY_TYPE.get(item_type, "other"),
+                        "priority": self._priority(item, item_type),
+                        "cost": cost,
+                        "original_cost": cost,
+                        "dropped": False,
+                    }
+                )
+        return entries
+
+    def _rescale_breakdown(
+        self,
+        old_breakdown: Dict[str, float],
+        entries: List[Dict[str, Any]],
+        new_budget: float,
+    ) -> Dict[str, float]:
+        """Scale the budget breakdown so that it sums to the new budget"""
+        weights = dict(old_breakdown)
+        if sum(weights.values()) <= 0:
+            # No usable breakdown: weight categories by what the items cost
+            weights = {category: 0.0 for category in BUDGET_CATEGORIES}
+            for entry in entries:
+                weights[entry["category"]] += entry["cost"]
+        if sum(weights.values()) <= 0:
+            weights = {category: 1.0 for category in BUDGET_CATEGORIES}
+
+        total = sum(weights.values())
+        scaled = {
+            category: float(round(value / total * new_budget))
+            for category, value in weights.items()
+        }
+
+        # Push the rounding remainder into the largest category
+        remainder = round(new_budget - sum(scaled.values()), 2)
+        if remainder:
+            largest = max(scaled, key=scaled.get)
+            scaled[largest] += remainder
+        return scaled
+
+    def _fit_category(
+        self,
+        entries: List[Dict[str, Any]],
+        target: float,
+        days: List[Dict[str, Any]],
+        changes: List[Dict[str, Any]],
+    ) -> None:
+        """Downgrade, then drop, items until a category fits its allocation"""
+        current = sum(e["cost"] for e in entries if not e["dropped"])
+        if current <= target:
+            return
+
+        # Downgrades first: most expensive downgradable items
+        for entry in sorted(entries, key=lambda e: -e["cost"]):
+            if current <= target:
+                return
+            factor = DOWNGRADE_FACTORS.get(entry["type"])
+            if factor is None or entry["cost"] <= 0:
+                continue
+            new_cost = float(round(entry["cost"] * factor))
+            current -= entry["cost"] - new_cost
+            changes.append(self._change(entry, "downgrade", new_cost))
+            entry["cost"] = new_cost
+
+        # Then drop optional items: lowest priority, most expensive first
+        candidates = [
+            e
+            for e in entries
+            if e["type"] in DROPPABLE_TYPES and e["cost"] > 0 and not e["dropped"]
+        ]
+        for entry in sorted(candidates, key=lambda e: (e["priority"], -e["cost"])):
+            if current <= target:
+                return
+            remaining = [
+                item
+                for item in entry["day"].get("items") or []
+                if not item.get("_dropped")
+            ]
+            if len(remaining) <= 1:
+                continue  # Never empty a whole day
+            current -= entry["cost"]
+            changes.append(self._change(entry, "drop", 0.0))
+            entry["item"]["_dropped"] = True
+            entry["dropped"] = True
+
+    def _rebalance(
+        self, breakdown: Dict[str, float], entries: List[Dict[str, Any]]
+    ) -> float:
+        """
+        Move unused allocation to categories that still overflow
+
+        Args:
+            breakdown: Rescaled breakdown (updated in place)
+            entries: Solver entries after fitting
+
+        Returns:
+            float: Amount by which the items still exceed the budget
+        """
+        spent = {category: 0.0 for category in breakdown}
+        for entry in entries:
+            if not entry["dropped"]:
+                spent[entry["category"]] = (
+                    spent.get(entry["category"], 0) + entry["cost"]
+                )
+
+        shortfall = 0.0
+        for category, amount in spent.items():
+            overflow = amount - breakdown.get(category, 0)
+            if overflow <= 0:
+                continue
+            for donor in SLACK_DONOR_ORDER:
+                if overflow <= 0:
+                    break
+                if donor == category:
+                    continue
+                slack = breakdown.get(donor, 0) - spent.get(donor, 0)
+                moved = min(max(slack, 0), overflow)
+                if moved > 0:
+                    breakdown[donor] -= moved
+                    breakdown[category] = breakdown.get(category, 0) + moved
+                    overflow -= moved
+            shortfall += max(overflow, 0)
+
+        return round(shortfall, 2)
+
+    @staticmethod
+    def _change(entry: Dict[str, Any], action: str, new_cost: float) -> Dict[str, Any]:
+        """Describe one item change for the diff"""
+        return {
+            "action": action,
+            "day_index": entry["day_index"],
+            "item_index": entry["item_index"],
+            "title": entry["item"].get("title", ""),
+            "type": entry["type"],
+            "old_cost": entry["cost"],
+            "new_cost": new_cost,
+        }
+
+    @staticmethod
+    def _numeric_breakdown(breakdown: Optional[Dict[str, Any]]) -> Dict[str, float]:
+        """Coerce budget breakdown values to numbers"""
+        result = {}
+        for category, value in (breakdown or {}).items():
+            try:
+                result[category] = max(0.0, float(value))
+            except (TypeError, ValueError):
+                result[category] = 0.0
+        return result
+
+    @staticmethod
+    def _priority(item: Dict[str, Any], item_type: str) -> float:
+        """Get an item's importance, defaulting by type"""
+        try:
+            return float(item["priority"])
+        except (KeyError, TypeError, ValueError):
+            return DEFAULT_PRIORITY.get(item_type, 1)
+
+    @staticmethod
+    def _item_cost(item: Dict[str, Any]) -> float:
+        """Get an item's estimated cost as a non-negative number"""
+        try:
+            return max(0.0, float(item.get("estimated_cost") or 0))
+        except (TypeError, ValueError):
+            return 0.0
+
+
+# Singleton instance
+budget_optimizer = BudgetOptimizer()
@@ -6,6 +6,8 @@ Handles CRUD operations for expense tracking
 from datetime import date
 from typing import Any, Dict, List, Optional
 
+from loguru import logger
+from postgrest.exceptions import APIError
 from supabase import Client, create_client
 
 from app.config import Config
@@ -103,6 +105,8 @@ class ExpenseService:
         category: Optional[str] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        columns: str = "*",
     ) -> List[Dict[str, Any]]:
         """
         Get expenses with optional filters
@@ -113,11 +117,14 @@ class ExpenseService:
             category: Optional category filter
             start_date: Optional start date filter
             end_date: Optional end date filter
+            limit: Optional maximum number of (most recent) expenses
+            columns: Columns to select (e.g. "id, updated_at" for a cheap
+                version check)
 
         Returns:
             List of expense records
         """
-        query = self.supabase.table("expenses").select("*").eq("user_id", user_id)
+        query = self.supabase.table("expenses").select(columns).eq("user_id", user_id)
 
         if itinerary_id:
             query = query.eq("itinerary_id", itinerary_id)
@@ -130,10 +137,32 @@ class ExpenseService:
 
         # Order by expense date descending
         query = query.order("expense_date", desc=True)
+        if limit:
+            query = query.limit(limit)
 
         response = query.execute()
         return response.data if response.data else []
 
+    def owns_itinerary(self, user_id: str, itinerary_id: str) -> bool:
+        """
+        Check that an itinerary exists and belongs to a user
+
+        Args:
+            user_id: User ID
+            itinerary_id: Itinerary ID
+
+        Returns:
+            True if the user owns the itinerary
+        """
+        response = (
+            self.supabase.table("itineraries")
+            .select("id")
+            .eq("id", itinerary_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+        return bool(response.data)
+
     def get_expense_by_id(
         self, expense_id: str, user_id: str
     ) -> Optional[Dict[str, Any]]:
@@ -234,6 +263,53 @@ class ExpenseService:
 
         return True
 
+    def get_expense_summary(
+        self, user_id: str, itinerary_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Read the trigger-maintained expense aggregates for an itinerary
+
+        Args:
+            user_id: User ID
+            itinerary_id: Itinerary ID
+
+        Returns:
+            Summary row (total, count, per-category and per-day sums), or
+            None if the summary table has not been migrated yet
+        """
+        try:
+            response = (
+                self.supabase.table("expense_summaries")
+                .select("total_amount, expense_count, by_category, by_day")
+                .eq("itinerary_id", itinerary_id)
+                .eq("user_id", user_id)
+                .execute()
+            )
+        except APIError as e:
+            logger.warning(f"Expense summary unavailable, recomputing: {e}")
+            return None
+
+        if response.data:
+            return response.data[0]
+
+        # No row yet: the trigger creates it with the first expense
+        return {"total_amount": 0, "expense_count": 0, "by_category": {}, "by_day": {}}
+
+    def repair_expense_summaries(self, itinerary_id: Optional[str] = None) -> int:
+        """
+        Recompute expense summaries from the expenses table
+
+        Args:
+            itinerary_id: Only repair this itinerary (defaults to all)
+
+        Returns:
+            Number of summary rows that were missing or inconsistent
+        """
+        response = self.supabase.rpc(
+            "rebuild_expense_summaries", {"p_itinerary_id": itinerary_id}
+        ).execute()
+        return int(response.data or 0)
+
     def get_expense_statistics(self, user_id: str, itinerary_id: str) -> Dict[str, Any]:
         """
         Get expense statistics for an itinerary
@@ -246,37 +322,48 @@ class ExpenseService:
             Dictionary with expense statistics:
             - total_spent: Total amount spent
             - by_category: Breakdown by category
+            - by_day: Breakdown by expense date
             - expense_count: Number of expenses
             - avg_expense: Average expense amount
         """
-        expenses = self.get_expenses(user_id, itinerary_id)
-
-        if not expenses:
-            return {
-                "total_spent": 0,
-                "by_category": {},
-                "expense_count": 0,
-                "avg_expense": 0,
-            }
-
-        total_spent = sum(float(exp["amount"]) for exp in expenses)
-        expense_count = len(expenses)
+        summary = self.get_expense_summary(user_id, itinerary_id)
+        if summary is None:
+            summary = self._summarize_expenses(self.get_expenses(user_id, itinerary_id))
 
-        # Group by category
-        by_category = {}
-        for exp in expenses:
-            category = exp["category"]
-            if category not in by_category:
-                by_category[category] = 0
-            by_category[category] += float(exp["amount"])
+        total_spent = float(summary["total_amount"])
+        expense_count = int(summary["expense_count"])
 
         return {
             "total_spent": total_spent,
-            "by_category": by_category,
+            "by_category": {
+                category: float(amount)
+                for category, amount in (summary["by_category"] or {}).items()
+            },
+            "by_day": {
+                day: float(amount) for day, amount in (summary["by_day"] or {}).items()
+            },
             "expense_count": expense_count,
             "avg_expense": total_spent / expense_count if expense_count > 0 else 0,
         }
 
+    def _summarize_expenses(self, expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aggregate expense rows into the summary shape"""
+        by_category: Dict[str, float] = {}
+        by_day: Dict[str, float] = {}
+        for exp in expenses:
+            amount = float(exp["amount"])
+            by_category[exp["category"]] = by_category.get(exp["category"], 0) + amount
+            day = exp.get("expense_date")
+            if day:
+                by_day[day] = by_day.get(day, 0) + amount
+
+        return {
+            "total_amount": sum(float(exp["amount"]) for exp in expenses),
+            "expense_count": len(expenses),
+            "by_category": by_category,
+            "by_day": by_day,
+        }
+
     def get_budget_comparison(
         self, user_id: str, itinerary_id: str, budget_breakdown: Dict[str, float]
     ) -> Dict[str, Any]:
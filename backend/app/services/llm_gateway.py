@@ -0,0 +1,130 @@
+"""
+Shared LLM gateway for all AI features
+
+Owns one pooled HTTP transport and one chat client per task profile, so
+every LLM call reuses keep-alive connections and goes through the shared
+DeepSeek rate limiter. Profiles (model, temperature, max_tokens, timeout,
+retries) come from Config.LLM_PROFILES, so short parsing tasks can use a
+faster, cheaper model than itinerary generation.
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+import httpx
+from langchain_openai import ChatOpenAI
+from loguru import logger
+from openai import RateLimitError
+
+from ..config import Config
+from ..utils.rate_limiter import RateLimitExceeded, rate_limiter
+from ..utils.usage_meter import usage_meter
+
+
+class LLMGateway:
+    """Pooled, rate-limited access to the chat model by task profile"""
+
+    def __init__(self):
+        """Initialize the gateway (clients are created on first use)"""
+        self.base_url = Config.LLM_BASE_URL
+        self.profiles = Config.LLM_PROFILES
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        self._clients: Dict[str, ChatOpenAI] = {}
+        self._lock = threading.Lock()
+        self._limiter = rate_limiter(
+            "deepseek",
+            Config.DEEPSEEK_API_KEY,
+            qps=Config.DEEPSEEK_QPS,
+            burst=Config.DEEPSEEK_BURST,
+            max_wait=Config.RATE_LIMIT_MAX_WAIT,
+            background_wait=Config.RATE_LIMIT_BACKGROUND_MAX_WAIT,
+        )
+        logger.info(
+            f"LLM gateway initialized with profiles: {', '.join(self.profiles)}"
+        )
+
+    def client(self, task: str) -> ChatOpenAI:
+        """
+        Get the chat client for a task profile
+
+        Args:
+            task: Profile name (e.g. "itinerary", "voice_parse")
+
+        Returns:
+            ChatOpenAI: Client sharing the gateway's connection pool
+
+        Raises:
+            ValueError: If the profile is unknown
+        """
+        with self._lock:
+            llm = self._clients.get(task)
+            if llm is None:
+                profile = self.profiles.get(task)
+                if profile is None:
+                    raise ValueError(f"Unknown LLM task profile: {task}")
+                llm = ChatOpenAI(
+                    model=profile["model"],
+                    base_url=self.base_url,
+                    api_key=Config.DEEPSEEK_API_KEY,
+                    temperature=profile["temperature"],
+                    max_tokens=profile["max_tokens"],
+                    timeout=profile["timeout"],
+                    max_retries=profile["max_retries"],
+                    http_client=self._http_client,
+                )
+                self._clients[task] = llm
+            return llm
+
+    def invoke(self, task: str, messages, **kwargs: Any):
+        """
+        Call the LLM with a task profile through the shared rate limiter
+
+        Token usage and latency are recorded for the current user and
+        endpoint.
+
+        Args:
+            task: Profile name
+            messages: Chat messages
+            **kwargs: Per-call overrides (e.g. a smaller `max_tokens`)
+
+        Returns:
+            The model response message
+
+        Raises:
+            RateLimitExceeded: If no token became available in time
+        """
+        llm = self.client(task)
+        if not self._limiter.acquire():
+            raise RateLimitExceeded("LLM rate limit exceeded, please retry later")
+
+        started = time.monotonic()
+        try:
+            response = llm.invoke(messages, **kwargs)
+        except Exception as e:
+            usage_meter.record(
+                task, llm.model_name, latency=time.monotonic() - started, success=False
+            )
+            if isinstance(e, RateLimitError):
+                # Upstream throttled us despite local limiting: pause the bucket
+                self._limiter.throttle(Config.DEEPSEEK_THROTTLE_BACKOFF)
+            raise
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        usage_meter.record(
+            task,
+            llm.model_name,
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+            latency=time.monotonic() - started,
+        )
+        return response
+
+
+# Singleton instance
+llm_gateway = LLMGateway()
@@ -2,12 +2,55 @@
 Map service for integrating with Amap (高德地图) API
 """
 
-from typing import Any, Dict, List
+import contextvars
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 import requests
 from loguru import logger
 
 from ..config import Config
+from ..utils import geohash
+from ..utils.circuit_breaker import CircuitOpenError, circuit_breaker
+from ..utils.city_index import city_index, parse_location
+from ..utils.hedging import LatencyTracker, hedged_call
+from ..utils.poi_index import poi_index
+from ..utils.rate_limiter import Priority, rate_limiter, upstream_priority
+from ..utils.single_flight import normalize_key, single_flight_group
+from ..utils.ttl_cache import ttl_cache
+
+# Amap report times are China Standard Time
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# Amap infocodes for exceeded QPS / access frequency limits
+AMAP_QPS_INFOCODES = {"10004", "10014", "10019", "10020", "10021"}
+
+# Route modes whose result can be reused for the reverse leg
+REVERSIBLE_ROUTE_MODES = {"walking", "bicycling"}
+
+# Nearby POI searches run for each itinerary item type during enrichment
+ENRICHMENT_QUERIES = {
+    "attraction": {"restaurants": "餐厅", "hotels": "酒店"},
+    "hotel": {"restaurants": "餐厅"},
+}
+
+# Page size of enrichment searches; a full page gives the local POI index a
+# wider covered radius to reuse
+ENRICHMENT_SEARCH_LIMIT = 20
+
+# POI fields attached to enriched items
+ENRICHMENT_POI_FIELDS = (
+    "name",
+    "type",
+    "address",
+    "location",
+    "distance",
+    "rating",
+    "cost",
+)
 
 
 class MapService:
@@ -17,8 +60,133 @@ class MapService:
         """Initialize the map service"""
         self.api_key = Config.AMAP_API_KEY
         self.base_url = "https://restapi.amap.com/v3"
+        self._limiter = rate_limiter(
+            "amap",
+            self.api_key,
+            qps=Config.AMAP_QPS,
+            burst=Config.AMAP_BURST,
+            max_wait=Config.RATE_LIMIT_MAX_WAIT,
+            background_wait=Config.RATE_LIMIT_BACKGROUND_MAX_WAIT,
+        )
+        self._geocode_flight = single_flight_group(
+            "map.geocode",
+            enabled=Config.single_flight_enabled("map.geocode"),
+            wait_timeout=Config.SINGLE_FLIGHT_MAP_WAIT_TIMEOUT,
+        )
+        self._weather_flight = single_flight_group(
+            "map.weather",
+            enabled=Config.single_flight_enabled("map.weather"),
+            wait_timeout=Config.SINGLE_FLIGHT_MAP_WAIT_TIMEOUT,
+        )
+        self._forecast_flight = single_flight_group(
+            "map.forecast",
+            enabled=Config.single_flight_enabled("map.forecast"),
+            wait_timeout=Config.SINGLE_FLIGHT_MAP_WAIT_TIMEOUT,
+        )
+        self._route_flight = single_flight_group(
+            "map.route",
+            enabled=Config.single_flight_enabled("map.route"),
+            wait_timeout=Config.SINGLE_FLIGHT_MAP_WAIT_TIMEOUT,
+        )
+        self._route_cache = ttl_cache("map.route", maxsize=Config.ROUTE_CACHE_SIZE)
+        self._breaker = circuit_breaker(
+            "amap",
+            failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+            slow_call_seconds=Config.AMAP_SLOW_CALL_SECONDS,
+            reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+            failure_exceptions=(requests.RequestException,),
+        )
+        self.latency = LatencyTracker()
+        # Shared pool bounds concurrent Amap calls from multi-leg fan-outs
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.MAP_FANOUT_CONCURRENCY, thread_name_prefix="map"
+        )
+        # Background fan-outs wait for rate-limit tokens on their own threads,
+        # so they never queue ahead of interactive work in the shared pool
+        self._background_executor = ThreadPoolExecutor(
+            max_workers=Config.MAP_BACKGROUND_CONCURRENCY,
+            thread_name_prefix="map-background",
+        )
+        self._forecast_cache = ttl_cache(
+            "map.forecast", maxsize=Config.WEATHER_FORECAST_CACHE_SIZE
+        )
         logger.info("Map Service initialized with Amap API")
 
+    def _request(
+        self, url: str, params: Dict[str, Any], hedge: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Call an Amap endpoint through the rate limiter and circuit breaker
+
+        Waits for a token according to the caller's priority, and backs off
+        and retries when Amap still reports a QPS limit error. While the
+        circuit is open, calls fail fast instead of waiting out timeouts.
+
+        Args:
+            url: Endpoint URL
+            params: Query parameters (including the key)
+            hedge: Idempotent read that may be hedged after the p95 latency
+
+        Returns:
+            dict: Decoded Amap response; a status "0" response if no token
+            became available in time or the circuit is open
+
+        Raises:
+            requests.RequestException: On network or HTTP errors
+        """
+        data = {}
+        for attempt in range(Config.AMAP_QPS_RETRIES + 1):
+            if not self._limiter.acquire():
+                return {
+                    "status": "0",
+                    "info": "Rate limit exceeded, please retry later",
+                }
+
+            try:
+                data = self._breaker.call(self._send, url, params, hedge)
+            except CircuitOpenError as e:
+                logger.warning(f"{e}, retry after {e.retry_after:.0f}s")
+                return {
+                    "status": "0",
+                    "info": "Map service temporarily unavailable, please retry later",
+                }
+
+            if data.get("infocode") not in AMAP_QPS_INFOCODES:
+                return data
+
+            logger.warning(
+                f"Amap QPS limit hit ({data.get('info')}), "
+                f"backing off (attempt {attempt + 1})"
+            )
+            self._limiter.throttle(Config.AMAP_QPS_BACKOFF)
+
+        return data
+
+    def _send(self, url: str, params: Dict[str, Any], hedge: bool) -> Dict[str, Any]:
+        """Send one request, hedging idempotent reads after the p95 latency"""
+        delay = (
+            self.latency.percentile(0.95) if hedge and Config.HEDGE_ENABLED else None
+        )
+        if delay is None:
+            return self._http_get(url, params)
+
+        return hedged_call(
+            lambda: self._http_get(url, params),
+            max(delay, Config.HEDGE_MIN_DELAY),
+            # A hedge only goes out if a token is free right now
+            can_hedge=lambda: self._limiter.acquire(timeout=0),
+            max_workers=Config.HEDGE_MAX_WORKERS,
+        )
+
+    def _http_get(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET an Amap endpoint and record its latency"""
+        started = time.monotonic()
+        response = requests.get(url, params=params, timeout=Config.AMAP_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        self.latency.record(time.monotonic() - started)
+        return data
+
     def geocode(self, address: str, city: str = None) -> Dict[str, Any]:
         """
         Convert address to coordinates (geocoding)
@@ -30,6 +198,27 @@ class MapService:
         Returns:
             dict: Contains success status and location data
         """
+        # Plain city names resolve to the city center without an API call
+        match = None if city else city_index.lookup_exact(address, aliases=False)
+        if match:
+            return {
+                "success": True,
+                "location": f"{match.longitude},{match.latitude}",
+                "longitude": match.longitude,
+                "latitude": match.latitude,
+                "formatted_address": match.name,
+                "province": "",
+                "city": match.name,
+                "district": "",
+                "adcode": match.adcode,
+            }
+
+        return self._geocode_flight.do(
+            normalize_key(address, city), self._geocode, address, city
+        )
+
+    def _geocode(self, address: str, city: str = None) -> Dict[str, Any]:
+        """Call the Amap geocoding API"""
         try:
             url = f"{self.base_url}/geocode/geo"
             params = {
@@ -40,9 +229,7 @@ class MapService:
             if city:
                 params["city"] = city
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params, hedge=True)
 
             if data["status"] == "1" and data["geocodes"]:
                 location = data["geocodes"][0]["location"]
@@ -93,9 +280,7 @@ class MapService:
                 "extensions": "base",
             }
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params, hedge=True)
 
             if data["status"] == "1":
                 regeocode = data["regeocode"]
@@ -143,8 +328,35 @@ class MapService:
         Returns:
             dict: POI search results
         """
+        if Config.POI_INDEX_ENABLED:
+            local = poi_index.search(keywords, city, location, radius, page, limit)
+            if local is not None:
+                logger.info(
+                    f"Found {len(local['pois'])} POIs for '{keywords}' in local index"
+                )
+                return {"success": True, **local, "cached": True}
+
+        result = self._search_poi(keywords, city, location, radius, page, limit)
+        if Config.POI_INDEX_ENABLED and result["success"] and page == 1:
+            poi_index.store(
+                keywords, result["pois"], result["count"], city, location, radius
+            )
+        return result
+
+    def _search_poi(
+        self,
+        keywords: str,
+        city: Optional[str],
+        location: Optional[str],
+        radius: int,
+        page: int,
+        limit: int,
+    ) -> Dict[str, Any]:
+        """Call the Amap keyword or nearby (distance-sorted) search API"""
         try:
-            url = f"{self.base_url}/place/text"
+            # Nearby searches use place/around, which honors the radius
+            endpoint = "place/around" if location else "place/text"
+            url = f"{self.base_url}/{endpoint}"
             params = {
                 "key": self.api_key,
                 "keywords": keywords,
@@ -159,16 +371,16 @@ class MapService:
             if location:
                 params["location"] = location
                 params["radius"] = radius
+                params["sortrule"] = "distance"
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params)
 
             if data["status"] == "1":
                 pois = []
                 for poi in data.get("pois", []):
                     pois.append(
                         {
+                            "id": poi.get("id", ""),
                             "name": poi.get("name", ""),
                             "type": poi.get("type", ""),
                             "address": poi.get("address", ""),
@@ -199,7 +411,11 @@ class MapService:
             return {"success": False, "error": f"Network error: {str(e)}"}
 
     def get_route(
-        self, origin: str, destination: str, mode: str = "driving"
+        self,
+        origin: str,
+        destination: str,
+        mode: str = "driving",
+        city: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Get route planning between two points
@@ -208,10 +424,81 @@ class MapService:
             origin: Origin location (longitude,latitude)
             destination: Destination location (longitude,latitude)
             mode: Travel mode ('driving', 'walking', 'transit', 'bicycling')
+            city: Optional city for transit (defaults to the origin's city)
 
         Returns:
             dict: Route information
         """
+        key = self._route_key(origin, destination, mode, city)
+        if key is None:
+            return self._get_route(origin, destination, mode, city)
+
+        cached = self._route_cache.get(key)
+        if cached is not None:
+            return {**copy.deepcopy(cached), "cached": True}
+
+        # Walking and cycling legs take the same path in both directions
+        if mode in REVERSIBLE_ROUTE_MODES:
+            reverse_key = self._route_key(destination, origin, mode, city)
+            cached = self._route_cache.get(reverse_key)
+            if cached is not None:
+                return {**copy.deepcopy(cached), "cached": True, "reversed": True}
+
+        result = self._route_flight.do(
+            normalize_key(*key),
+            self._get_route_cached,
+            key,
+            origin,
+            destination,
+            mode,
+            city,
+        )
+        if not result["success"] and self._breaker.is_open:
+            # Serve the last known route while Amap is failing
+            stale = self._route_cache.get_stale(key)
+            if stale is not None:
+                return {**copy.deepcopy(stale), "cached": True, "stale": True}
+        return result
+
+    def _route_key(
+        self, origin: str, destination: str, mode: str, city: Optional[str]
+    ) -> Optional[tuple]:
+        """Cache key with both endpoints snapped to geohash cells"""
+        origin_point = parse_location(origin)
+        destination_point = parse_location(destination)
+        if not origin_point or not destination_point:
+            return None
+        precision = Config.ROUTE_CACHE_GEOHASH_PRECISION
+        return (
+            mode,
+            city or "",
+            geohash.encode(origin_point[1], origin_point[0], precision),
+            geohash.encode(destination_point[1], destination_point[0], precision),
+        )
+
+    def _get_route_cached(
+        self,
+        key: tuple,
+        origin: str,
+        destination: str,
+        mode: str,
+        city: Optional[str],
+    ) -> Dict[str, Any]:
+        """Plan a route and cache successful results for the snapped leg"""
+        result = self._get_route(origin, destination, mode, city)
+        if result["success"]:
+            ttl = Config.ROUTE_CACHE_TTLS.get(mode, Config.ROUTE_CACHE_TTLS["driving"])
+            self._route_cache.set(key, result, ttl)
+        return result
+
+    def _get_route(
+        self,
+        origin: str,
+        destination: str,
+        mode: str = "driving",
+        city: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Call the Amap direction API"""
         try:
             # Map mode to API endpoint
             mode_map = {
@@ -231,13 +518,17 @@ class MapService:
                 "extensions": "base",
             }
 
-            # Add city for transit mode
+            # Transit needs the origin city (and destination city if different)
             if mode == "transit":
-                params["city"] = "北京"  # Default city, should be dynamic
+                origin_city = self.resolve_city(city or origin)
+                if not origin_city:
+                    return {"success": False, "error": "Unable to determine city"}
+                params["city"] = origin_city
+                destination_city = self.resolve_city(destination)
+                if destination_city and destination_city != origin_city:
+                    params["cityd"] = destination_city
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params)
 
             if data["status"] == "1" and data.get("route"):
                 route_data = data["route"]
@@ -286,6 +577,91 @@ class MapService:
             logger.error(f"Network error in route planning: {e}")
             return {"success": False, "error": f"Network error: {str(e)}"}
 
+    def get_day_route(
+        self,
+        stops: List[Any],
+        mode: str = "driving",
+        city: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Plan every consecutive leg of a day's stops in parallel
+
+        Args:
+            stops: Ordered stops; each is a "longitude,latitude" string, an
+                address, or an itinerary item with `location` / `title`
+            mode: Travel mode for all legs
+            city: City used to geocode addresses and for transit
+
+        Returns:
+            dict: Geocoded stops, per-leg distance and duration, and totals
+        """
+        if len(stops) < 2:
+            return {"success": False, "error": "At least two stops are required"}
+
+        resolved = self._fan_out(lambda stop: self._resolve_stop(stop, city), stops)
+
+        def plan(index: int) -> Dict[str, Any]:
+            start, end = resolved[index], resolved[index + 1]
+            leg = {"from": index, "to": index + 1}
+            if not start.get("location") or not end.get("location"):
+                return {**leg, "success": False, "error": "Stop could not be located"}
+            route = self.get_route(start["location"], end["location"], mode, city)
+            return {**leg, **route}
+
+        legs = self._fan_out(plan, range(len(resolved) - 1))
+        planned = [leg for leg in legs if leg["success"]]
+
+        logger.info(
+            f"Planned {len(planned)}/{len(legs)} legs for {len(stops)} stops ({mode})"
+        )
+        return {
+            "success": True,
+            "data": {
+                "mode": mode,
+                "stops": resolved,
+                "legs": legs,
+                "total_distance": sum(leg["distance"] for leg in planned),
+                "total_duration": sum(leg["duration"] for leg in planned),
+                "failed_legs": len(legs) - len(planned),
+            },
+        }
+
+    def _fan_out(
+        self,
+        fn: Callable[[Any], Any],
+        items: Iterable[Any],
+        background: bool = False,
+    ) -> List[Any]:
+        """
+        Run `fn` over items on a worker pool, preserving order
+
+        Each task runs in a copy of the caller's context, so context-scoped
+        settings such as the upstream priority carry over to pool threads.
+        Background fan-outs use their own pool: their tasks may block on the
+        rate limiter for a long time and must not hold interactive workers.
+        """
+        executor = self._background_executor if background else self._executor
+        tasks = [(contextvars.copy_context(), item) for item in items]
+        return list(executor.map(lambda task: task[0].run(fn, task[1]), tasks))
+
+    def _resolve_stop(self, stop: Any, city: Optional[str]) -> Dict[str, Any]:
+        """Geocode a stop unless it already carries coordinates"""
+        if isinstance(stop, dict):
+            name = stop.get("title") or stop.get("name") or ""
+            candidates = [stop.get("location"), stop.get("address"), name]
+        else:
+            name = str(stop)
+            candidates = [name]
+
+        for candidate in filter(None, candidates):
+            if parse_location(candidate):
+                return {"name": name, "location": candidate}
+            result = self.geocode(candidate, city)
+            if result["success"]:
+                return {"name": name or candidate, "location": result["location"]}
+
+        return {"name": name, "location": None, "error": "Geocoding failed"}
+
     def _parse_transit_segments(self, segments: List) -> List[Dict]:
         """Parse transit segments for readable format"""
         parsed = []
@@ -313,6 +689,42 @@ class MapService:
                 )
         return parsed
 
+    def resolve_city(self, query: str) -> Optional[str]:
+        """
+        Resolve a city name, adcode or "longitude,latitude" to an Amap citycode
+
+        The offline city index is tried first; coordinates it cannot place
+        fall back to reverse geocoding, and names it does not know are
+        passed through for Amap to resolve.
+
+        Args:
+            query: City name, adcode or coordinate string
+
+        Returns:
+            str: Citycode (or city name), or None
+        """
+        coordinates = parse_location(query)
+        match = (
+            city_index.nearest(*coordinates)
+            if coordinates
+            else city_index.resolve(query)
+        )
+        if match:
+            return match.citycode or match.adcode
+        if not coordinates:
+            return query.strip() or None
+
+        result = self.reverse_geocode(*coordinates)
+        if result["success"]:
+            # Municipalities report an empty city; use the province instead
+            return result.get("city") or result.get("province") or None
+        return None
+
+    def _weather_city(self, city: str) -> str:
+        """Map a free-text city to its adcode for the weather API"""
+        match = city_index.resolve(city)
+        return match.adcode if match else city
+
     def get_weather(self, city: str) -> Dict[str, Any]:
         """
         Get weather information for a city
@@ -323,13 +735,16 @@ class MapService:
         Returns:
             dict: Weather information
         """
+        city = self._weather_city(city)
+        return self._weather_flight.do(normalize_key(city), self._get_weather, city)
+
+    def _get_weather(self, city: str) -> Dict[str, Any]:
+        """Call the Amap live weather API"""
         try:
             url = f"{self.base_url}/weather/weatherInfo"
             params = {"key": self.api_key, "city": city, "extensions": "base"}
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request(url, params, hedge=True)
 
             if data["status"] == "1" and data.get("lives"):
                 weather = data["lives"][0]
@@ -357,6 +772,253 @@ class MapService:
             logger.error(f"Network error in weather query: {e}")
             return {"success": False, "error": f"Network error: {str(e)}"}
 
+    def get_weather_forecast(self, city: str) -> Dict[str, Any]:
+        """
+        Get the multi-day weather forecast for a city
+
+        Forecasts are cached per city and adcode until Amap's next scheduled
+        refresh after the forecast's `reporttime`.
+
+        Args:
+            city: City name or adcode
+
+        Returns:
+            dict: Forecast with one entry per day (`forecasts`)
+        """
+        city = self._weather_city(city)
+        cached = self._forecast_cache.get(normalize_key(city))
+        if cached is not None:
+            return copy.deepcopy(cached)
+        result = self._forecast_flight.do(
+            normalize_key(city), self._get_weather_forecast, city
+        )
+        if not result["success"] and self._breaker.is_open:
+            # An outdated forecast beats none while Amap is failing
+            stale = self._forecast_cache.get_stale(normalize_key(city))
+            if stale is not None:
+                return {**copy.deepcopy(stale), "stale": True}
+        return result
+
+    def _get_weather_forecast(self, city: str) -> Dict[str, Any]:
+        """Call the Amap forecast weather API and cache the result"""
+        try:
+            url = f"{self.base_url}/weather/weatherInfo"
+            params = {"key": self.api_key, "city": city, "extensions": "all"}
+
+            data = self._request(url, params, hedge=True)
+
+            if data["status"] == "1" and data.get("forecasts"):
+                forecast = data["forecasts"][0]
+                result = {
+                    "success": True,
+                    "province": forecast.get("province", ""),
+                    "city": forecast.get("city", ""),
+                    "adcode": forecast.get("adcode", ""),
+                    "reporttime": forecast.get("reporttime", ""),
+                    "forecasts": [
+                        {
+                            "date": cast.get("date", ""),
+                            "week": cast.get("week", ""),
+                            "dayweather": cast.get("dayweather", ""),
+                            "nightweather": cast.get("nightweather", ""),
+                            "daytemp": cast.get("daytemp", ""),
+                            "nighttemp": cast.get("nighttemp", ""),
+                            "daywind": cast.get("daywind", ""),
+                            "nightwind": cast.get("nightwind", ""),
+                            "daypower": cast.get("daypower", ""),
+                            "nightpower": cast.get("nightpower", ""),
+                        }
+                        for cast in forecast.get("casts", [])
+                    ],
+                }
+
+                ttl = self._forecast_ttl(result["reporttime"])
+                self._forecast_cache.set(normalize_key(city), result, ttl)
+                if result["adcode"]:
+                    self._forecast_cache.set(
+                        normalize_key(result["adcode"]), result, ttl
+                    )
+
+                logger.info(f"Got weather forecast for {city} (cached {ttl:.0f}s)")
+                return copy.deepcopy(result)
+            else:
+                return {
+                    "success": False,
+                    "error": data.get("info", "Weather forecast query failed"),
+                }
+
+        except requests.RequestException as e:
+            logger.error(f"Network error in weather forecast query: {e}")
+            return {"success": False, "error": f"Network error: {str(e)}"}
+
+    def _forecast_ttl(self, reporttime: str, now: Optional[datetime] = None) -> float:
+        """
+        Seconds until a forecast is superseded by Amap's next refresh
+
+        Args:
+            reporttime: Forecast report time ("YYYY-MM-DD HH:MM:SS", CST)
+            now: Current time (defaults to now)
+
+        Returns:
+            float: Cache TTL clamped to the configured bounds
+        """
+        now = now or datetime.now(CHINA_TZ)
+        try:
+            reported = datetime.strptime(reporttime, "%Y-%m-%d %H:%M:%S").replace(
+                tzinfo=CHINA_TZ
+            )
+        except (TypeError, ValueError):
+            return Config.WEATHER_FORECAST_MIN_TTL
+
+        day = reported.replace(hour=0, minute=0, second=0)
+        next_refresh = min(
+            day + timedelta(days=offset, hours=hour)
+            for offset in (0, 1)
+            for hour in Config.WEATHER_FORECAST_REFRESH_HOURS
+            if day + timedelta(days=offset, hours=hour) > reported
+        )
+        expires_at = next_refresh + timedelta(
+            seconds=Config.WEATHER_FORECAST_PUBLISH_DELAY
+        )
+        ttl = (expires_at - now).total_seconds()
+        return min(
+            max(ttl, Config.WEATHER_FORECAST_MIN_TTL), Config.WEATHER_FORECAST_MAX_TTL
+        )
+
+    def annotate_itinerary_weather(
+        self, itinerary_data: Dict[str, Any], city: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Attach the forecast to each day of an itinerary
+
+        Args:
+            itinerary_data: Itinerary with dated `daily_itinerary` days
+            city: City name or adcode (defaults to the itinerary destination)
+
+        Returns:
+            dict: Copy of the itinerary with `weather` on each forecast day
+        """
+        city = city or (itinerary_data.get("metadata") or {}).get("destination")
+        if not city:
+            return {"success": False, "error": "City is required"}
+
+        forecast = self.get_weather_forecast(city)
+        if not forecast["success"]:
+            return forecast
+
+        casts = {cast["date"]: cast for cast in forecast["forecasts"]}
+        itinerary = copy.deepcopy(itinerary_data)
+        annotated = 0
+        for day in itinerary.get("daily_itinerary") or []:
+            cast = casts.get(day.get("date"))
+            if cast:
+                day["weather"] = cast
+                annotated += 1
+
+        return {
+            "success": True,
+            "data": {
+                "itinerary": itinerary,
+                "annotated_days": annotated,
+                "city": forecast["city"],
+                "adcode": forecast["adcode"],
+                "reporttime": forecast["reporttime"],
+            },
+        }
+
+    def enrich_itinerary(
+        self,
+        itinerary_data: Dict[str, Any],
+        city: Optional[str] = None,
+        top_k: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Attach nearby restaurants and hotels to each itinerary item
+
+        Items are geocoded and the nearby searches for every item run on the
+        background pool at background priority, so interactive map requests
+        are served first. Searches are answered from the local POI index when
+        its coverage allows.
+
+        Args:
+            itinerary_data: Itinerary with `daily_itinerary` days of items
+            city: City name or adcode (defaults to the itinerary destination)
+            top_k: Nearest POIs kept per search (defaults to
+                Config.POI_ENRICH_TOP_K)
+
+        Returns:
+            dict: Copy of the itinerary with `coordinates` and `nearby` on
+            each located item
+        """
+        city = city or (itinerary_data.get("metadata") or {}).get("destination")
+        top_k = Config.POI_ENRICH_TOP_K if top_k is None else top_k
+
+        itinerary = copy.deepcopy(itinerary_data)
+        items = [
+            item
+            for day in itinerary.get("daily_itinerary") or []
+            for item in day.get("items") or []
+            if isinstance(item, dict) and item.get("type") in ENRICHMENT_QUERIES
+        ]
+
+        with upstream_priority(Priority.BACKGROUND):
+            stops = self._fan_out(
+                lambda item: self._resolve_stop(item, city), items, background=True
+            )
+
+            # Items at the same place share their searches
+            searches = sorted(
+                {
+                    (stop["location"], keyword)
+                    for item, stop in zip(items, stops)
+                    if stop.get("location")
+                    for keyword in ENRICHMENT_QUERIES[item["type"]].values()
+                }
+            )
+            results = dict(
+                zip(
+                    searches,
+                    self._fan_out(
+                        lambda search: self.search_poi(
+                            search[1],
+                            city,
+                            search[0],
+                            Config.POI_ENRICH_RADIUS,
+                            limit=ENRICHMENT_SEARCH_LIMIT,
+                        ),
+                        searches,
+                        background=True,
+                    ),
+                )
+            )
+
+        enriched = 0
+        for item, stop in zip(items, stops):
+            if not stop.get("location"):
+                continue
+            item["coordinates"] = stop["location"]
+            item["nearby"] = {}
+            for category, keyword in ENRICHMENT_QUERIES[item["type"]].items():
+                result = results[(stop["location"], keyword)]
+                item["nearby"][category] = [
+                    {field: poi.get(field, "") for field in ENRICHMENT_POI_FIELDS}
+                    for poi in (result["pois"] if result["success"] else [])[:top_k]
+                ]
+            enriched += 1
+
+        logger.info(
+            f"Enriched {enriched}/{len(items)} itinerary items with "
+            f"{len(searches)} nearby searches"
+        )
+        return {
+            "success": True,
+            "data": {
+                "itinerary": itinerary,
+                "enriched_items": enriched,
+                "failed_items": len(items) - enriched,
+            },
+        }
+
 
 # Create a singleton instance
 map_service = MapService()
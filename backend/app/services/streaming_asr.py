@@ -0,0 +1,662 @@
+"""
+Streaming speech recognition over WebSocket
+
+Audio chunks are recognized while the user is still speaking: an endpoint
+detector tracks speech start and end on the incoming stream, interim
+transcripts are produced periodically during speech, and final recognition
+starts speculatively at the first short pause. When the pause turns into
+end-of-speech the final transcript is usually already available.
+
+Protocol (JSON text frames, audio as binary frames):
+    client -> {"type": "start", "format": "pcm", "sample_rate": 16000,
+               "language": "zh-CN"}
+    server <- {"type": "ready", ...}
+    client -> <binary audio chunks>
+    server <- {"type": "speech_start"} / {"type": "interim", ...} /
+              {"type": "final", ...}
+    client -> {"type": "end"}   (flushes the last utterance and closes)
+
+"pcm" is 16-bit little-endian mono at `sample_rate`; "webm" and "ogg" carry
+Opus as produced by the browser MediaRecorder and are decoded incrementally
+by one ffmpeg process per session.
+
+Sessions are limited per caller (user, or client IP when anonymous) in
+concurrency and per minute, and each session in bytes and duration.
+"""
+
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from pydub import AudioSegment
+
+from ..config import Config
+from ..utils.quota import caller_identity, quota_store
+from ..utils.vad import PAUSE, SPEECH_END, SPEECH_START, EndpointDetector, detect_speech
+from .voice_service import voice_service
+
+# Sample rate everything is converted to before detection and recognition
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Formats accepted in the start message ("opus" is Ogg Opus)
+CONTAINER_FORMATS = {"webm": "webm", "ogg": "ogg", "opus": "ogg"}
+
+
+class StubEngine:
+    """
+    Offline engine for tests and local development
+
+    Returns a prefix of a fixed text that grows with the amount of audio
+    (one character per 200 ms), so interim results visibly extend.
+    """
+
+    name = "stub"
+    MS_PER_CHAR = 200
+
+    def __init__(self, text: Optional[str] = None):
+        self.text = text or Config.STREAMING_ASR_STUB_TEXT
+
+    def transcribe(self, segment: AudioSegment, language: str) -> Dict[str, Any]:
+        """Transcribe audio (see VoiceService.transcribe)"""
+        chars = max(1, min(len(self.text), len(segment) // self.MS_PER_CHAR))
+        return {"success": True, "error": None, "transcription": self.text[:chars]}
+
+
+class GoogleEngine:
+    """Google Speech Recognition through the voice service's circuit breaker"""
+
+    name = "google"
+
+    def transcribe(self, segment: AudioSegment, language: str) -> Dict[str, Any]:
+        """Transcribe audio (see VoiceService.transcribe)"""
+        return voice_service.transcribe(segment, language)
+
+
+ENGINES = {"stub": StubEngine, "google": GoogleEngine}
+
+
+class ContainerDecoder:
+    """
+    Incremental WebM/Ogg Opus decoding through one ffmpeg process
+
+    Chunks are written to ffmpeg's stdin as they arrive and PCM is collected
+    from its stdout by a reader thread, so every byte is decoded only once.
+    """
+
+    def __init__(self, container: str):
+        """
+        Start the decoder
+
+        Args:
+            container: ffmpeg input format ("webm" or "ogg")
+
+        Raises:
+            ValueError: If ffmpeg cannot be started
+        """
+        try:
+            self._process = subprocess.Popen(
+                [
+                    AudioSegment.converter,
+                    "-loglevel",
+                    "error",
+                    "-probesize",
+                    "32768",
+                    "-f",
+                    container,
+                    "-i",
+                    "pipe:0",
+                    "-f",
+                    "s16le",
+                    "-ac",
+                    "1",
+                    "-ar",
+                    str(SAMPLE_RATE),
+                    "pipe:1",
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise ValueError(
+                f"{container} audio is not supported on this server"
+            ) from e
+        self._lock = threading.Lock()
+        self._output = bytearray()
+        self._reader = threading.Thread(
+            target=self._read, name="stream-asr-decoder", daemon=True
+        )
+        self._reader.start()
+
+    def _read(self) -> None:
+        """Collect decoded PCM until ffmpeg closes its output"""
+        while data := self._process.stdout.read1(64 * 1024):
+            with self._lock:
+                self._output.extend(data)
+
+    def _drain(self, final: bool = False) -> bytes:
+        """Take the decoded PCM collected so far (whole samples only)"""
+        with self._lock:
+            size = len(self._output)
+            if not final:
+                size -= size % SAMPLE_WIDTH
+            data = bytes(self._output[:size])
+            del self._output[:size]
+        return data
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        Decode a chunk
+
+        Args:
+            chunk: Next bytes of the container stream
+
+        Returns:
+            bytes: PCM decoded so far (may lag the input slightly)
+
+        Raises:
+            ValueError: If ffmpeg rejected the stream
+        """
+        try:
+            self._process.stdin.write(chunk)
+            self._process.stdin.flush()
+        except OSError as e:
+            raise ValueError("Audio stream could not be decoded") from e
+        return self._drain()
+
+    def close(self, timeout: Optional[float] = None) -> bytes:
+        """
+        Flush and stop the decoder
+
+        Args:
+            timeout: Seconds to wait for the remaining output
+
+        Returns:
+            bytes: PCM decoded since the last `feed`
+        """
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._reader.join(timeout)
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        data = self._drain(final=True)
+        return data[: len(data) - len(data) % SAMPLE_WIDTH]
+
+
+class StreamingSession:
+    """Recognition state for one WebSocket connection"""
+
+    def __init__(
+        self,
+        engine,
+        executor: ThreadPoolExecutor,
+        audio_format: str = "pcm",
+        sample_rate: int = SAMPLE_RATE,
+        language: str = "zh-CN",
+    ):
+        """
+        Initialize the session
+
+        Args:
+            engine: Recognition engine (StubEngine or GoogleEngine)
+            executor: Pool recognition calls run on
+            audio_format: "pcm", "webm", "ogg" or "opus"
+            sample_rate: Sample rate of "pcm" input
+            language: Language code for recognition
+
+        Raises:
+            ValueError: If the format or sample rate is not supported
+        """
+        if audio_format != "pcm" and audio_format not in CONTAINER_FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        if not 8000 <= sample_rate <= 48000:
+            raise ValueError(f"Unsupported sample rate: {sample_rate}")
+
+        self.engine = engine
+        self.language = language
+        self._executor = executor
+        self._format = audio_format
+        self._sample_rate = sample_rate
+        self._decoder = (
+            ContainerDecoder(CONTAINER_FORMATS[audio_format])
+            if audio_format != "pcm"
+            else None
+        )
+        self._detector = EndpointDetector(
+            sample_rate=SAMPLE_RATE,
+            frame_ms=Config.VAD_FRAME_MS,
+            margin_db=Config.VAD_MARGIN_DB,
+            pause_ms=Config.STREAMING_PAUSE_MS,
+            end_silence_ms=Config.STREAMING_END_SILENCE_MS,
+        )
+        # Audio received while the previous utterance is being finalized
+        self._pending_pcm = b""
+        self.utterance = 0
+        self.stats = {"utterances": 0, "speculative_hits": 0, "speculative_misses": 0}
+        self._start_utterance()
+
+    def _start_utterance(self) -> None:
+        """Reset per-utterance state after a final transcript"""
+        self._audio = bytearray()
+        self._offset_ms = self._detector.position_ms
+        self._detector.reset()
+        self._interim: Optional[Future] = None
+        self._interim_ms = 0
+        self._speculative: Optional[Future] = None
+        self._speculative_ms: Optional[int] = None
+        self._final: Optional[Future] = None
+        self._ended_at: Optional[float] = None
+
+    def _decode(self, chunk: bytes) -> bytes:
+        """Convert an incoming chunk to 16 kHz mono PCM"""
+        if self._format == "pcm":
+            if self._sample_rate == SAMPLE_RATE:
+                return chunk
+            segment = AudioSegment(
+                data=chunk[: len(chunk) - len(chunk) % SAMPLE_WIDTH],
+                sample_width=SAMPLE_WIDTH,
+                frame_rate=self._sample_rate,
+                channels=1,
+            )
+            return segment.set_frame_rate(SAMPLE_RATE).raw_data
+
+        return self._decoder.feed(chunk)
+
+    def _segment(self, end_ms: Optional[int] = None) -> AudioSegment:
+        """Audio of the current utterance, up to `end_ms` stream time"""
+        data = self._audio
+        if end_ms is not None:
+            end = (end_ms - self._offset_ms) * SAMPLE_RATE // 1000 * SAMPLE_WIDTH
+            data = data[: max(0, end)]
+        return AudioSegment(
+            data=bytes(data),
+            sample_width=SAMPLE_WIDTH,
+            frame_rate=SAMPLE_RATE,
+            channels=1,
+        )
+
+    def _recognize_final(self, segment: AudioSegment) -> Optional[Dict[str, Any]]:
+        """Trim the utterance and recognize it (None if it has no speech)"""
+        region = detect_speech(
+            segment,
+            frame_ms=Config.VAD_FRAME_MS,
+            margin_db=Config.VAD_MARGIN_DB,
+            padding_ms=Config.VAD_PADDING_MS,
+        )
+        if region.speech_ms < Config.VAD_MIN_SPEECH_MS:
+            return None
+        result = self.engine.transcribe(
+            segment[region.start_ms : region.end_ms], self.language
+        )
+        result["speech_duration"] = round(region.speech_ms / 1000, 2)
+        return result
+
+    def _end_utterance(self) -> None:
+        """Finalize the current utterance, reusing speculative recognition"""
+        if self._final is not None:
+            return
+        self._ended_at = time.monotonic()
+        if (
+            self._speculative is not None
+            and self._speculative_ms == self._detector.last_speech_ms
+        ):
+            self._final = self._speculative
+            self.stats["speculative_hits"] += 1
+        else:
+            if self._speculative is not None:
+                self.stats["speculative_misses"] += 1
+            self._final = self._executor.submit(self._recognize_final, self._segment())
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """
+        Process an audio chunk
+
+        Args:
+            chunk: Audio bytes in the session's format
+
+        Returns:
+            list: Messages to send to the client
+
+        Raises:
+            ValueError: If the audio cannot be decoded
+        """
+        return self._process(self._decode(chunk))
+
+    def _process(self, pcm: bytes) -> List[Dict[str, Any]]:
+        """Run endpoint detection and recognition on decoded PCM"""
+        if self._final is not None:
+            # Audio after end-of-speech waits for the next utterance
+            self._pending_pcm += pcm
+            return []
+        if not pcm:
+            return []
+
+        self._audio.extend(pcm)
+        messages = []
+        for event in self._detector.push(pcm):
+            if event == SPEECH_START:
+                messages.append({"type": "speech_start", "utterance": self.utterance})
+            elif event == PAUSE:
+                # Likely the end: start final recognition before it is certain
+                if self._speculative is not None:
+                    self.stats["speculative_misses"] += 1
+                self._speculative_ms = self._detector.last_speech_ms
+                self._speculative = self._executor.submit(
+                    self._recognize_final,
+                    self._segment(self._speculative_ms + Config.VAD_PADDING_MS),
+                )
+            elif event == SPEECH_END:
+                self._end_utterance()
+                return messages
+
+        elapsed_ms = self._detector.position_ms - self._offset_ms
+        if not self._detector.in_speech:
+            # Keep leading silence bounded while waiting for speech
+            keep = Config.VAD_PADDING_MS * SAMPLE_RATE // 1000 * SAMPLE_WIDTH
+            if len(self._audio) > keep:
+                dropped = len(self._audio) - keep
+                dropped -= dropped % SAMPLE_WIDTH
+                del self._audio[:dropped]
+                self._offset_ms += dropped * 1000 // (SAMPLE_RATE * SAMPLE_WIDTH)
+            return messages
+
+        if elapsed_ms >= Config.STREAMING_MAX_UTTERANCE_SECONDS * 1000:
+            self._end_utterance()
+        elif (
+            Config.STREAMING_INTERIM_INTERVAL_MS > 0
+            and self._interim is None
+            and elapsed_ms - self._interim_ms >= Config.STREAMING_INTERIM_INTERVAL_MS
+        ):
+            self._interim_ms = elapsed_ms
+            self._interim = self._executor.submit(
+                self.engine.transcribe, self._segment(), self.language
+            )
+        return messages
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """
+        Collect finished recognition results
+
+        Returns:
+            list: Interim and final messages to send to the client
+        """
+        messages = []
+        if self._interim is not None and self._interim.done():
+            result = self._interim.result()
+            self._interim = None
+            if result.get("success") and self._final is None:
+                messages.append(
+                    {
+                        "type": "interim",
+                        "utterance": self.utterance,
+                        "transcript": result["transcription"],
+                    }
+                )
+
+        if self._final is not None and self._final.done():
+            result = self._final.result()
+            finalize_ms = round((time.monotonic() - self._ended_at) * 1000)
+            if result is not None:
+                messages.append(
+                    {
+                        "type": "final",
+                        "utterance": self.utterance,
+                        "success": result["success"],
+                        "transcript": result["transcription"],
+                        "error": result["error"],
+                        "speech_duration": result["speech_duration"],
+                        "finalize_ms": finalize_ms,
+                    }
+                )
+                self.utterance += 1
+                self.stats["utterances"] += 1
+            pending, self._pending_pcm = self._pending_pcm, b""
+            self._start_utterance()
+            if pending:
+                messages.extend(self._process(pending))
+        return messages
+
+    def finish(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        End the stream, waiting for the last utterance's final transcript
+
+        Args:
+            timeout: Seconds to wait for recognition
+
+        Returns:
+            list: Remaining messages to send to the client
+        """
+        messages = []
+        if self._decoder is not None:
+            messages.extend(self._process(self._decoder.close(timeout)))
+        if self._detector.in_speech or self._final is not None:
+            self._end_utterance()
+            self._final.result(timeout=timeout)
+        return messages + self.poll()
+
+    def close(self) -> None:
+        """Release the decoder"""
+        if self._decoder is not None:
+            self._decoder.close(timeout=0)
+
+
+class StreamingTranscriber:
+    """Serves streaming recognition sessions over WebSocket connections"""
+
+    def __init__(self):
+        """Initialize the transcriber (the worker pool is shared by sessions)"""
+        engine_class = ENGINES.get(Config.STREAMING_ASR_ENGINE)
+        if engine_class is None:
+            raise ValueError(
+                f"Unknown streaming ASR engine: {Config.STREAMING_ASR_ENGINE}"
+            )
+        self.engine = engine_class()
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.STREAMING_ASR_WORKERS, thread_name_prefix="stream-asr"
+        )
+        self._lock = threading.Lock()
+        # Open sessions per caller identity
+        self._active: Dict[str, int] = {}
+        self._stats = {
+            "sessions": 0,
+            "rejected": 0,
+            "active_sessions": 0,
+            "utterances": 0,
+            "speculative_hits": 0,
+            "speculative_misses": 0,
+        }
+
+    def _send(self, ws, message: Dict[str, Any]) -> None:
+        """Send a JSON message"""
+        ws.send(json.dumps(message, ensure_ascii=False))
+
+    def _open(self, ws) -> Optional[StreamingSession]:
+        """Wait for the start message and create the session"""
+        message = ws.receive(timeout=Config.STREAMING_IDLE_TIMEOUT)
+        try:
+            if not isinstance(message, str):
+                raise ValueError("Expected a start message")
+            start = json.loads(message)
+            if not isinstance(start, dict) or start.get("type") != "start":
+                raise ValueError("Expected a start message")
+            session = StreamingSession(
+                self.engine,
+                self._executor,
+                audio_format=str(start.get("format", "pcm")).lower(),
+                sample_rate=int(start.get("sample_rate", SAMPLE_RATE)),
+                language=start.get("language", "zh-CN"),
+            )
+        except (ValueError, TypeError) as e:
+            self._send(ws, {"type": "error", "error": str(e)})
+            return None
+
+        self._send(
+            ws,
+            {
+                "type": "ready",
+                "engine": self.engine.name,
+                "interim_interval_ms": Config.STREAMING_INTERIM_INTERVAL_MS,
+                "end_silence_ms": Config.STREAMING_END_SILENCE_MS,
+            },
+        )
+        return session
+
+    def _admit(self, ws, current_user: Optional[dict]) -> Optional[str]:
+        """Apply the per-caller session limits; returns the caller identity"""
+        identity = caller_identity(current_user)
+        error = None
+        with self._lock:
+            if (
+                self._active.get(identity, 0)
+                >= Config.STREAMING_MAX_CONCURRENT_SESSIONS
+            ):
+                error = {"type": "error", "error": "Too many concurrent voice streams"}
+            else:
+                self._active[identity] = self._active.get(identity, 0) + 1
+
+        if error is None:
+            per_minute = (
+                Config.STREAMING_USER_SESSIONS_PER_MINUTE
+                if current_user
+                else Config.STREAMING_IP_SESSIONS_PER_MINUTE
+            )
+            rate = quota_store.hit(f"asr_stream:{identity}", per_minute, 60)
+            if rate.allowed:
+                return identity
+            self._release(identity)
+            error = {
+                "type": "error",
+                "error": "Too many voice streams, please retry later",
+                "retry_after": rate.reset_after,
+            }
+
+        logger.warning(f"Voice stream rejected for {identity}: {error['error']}")
+        with self._lock:
+            self._stats["rejected"] += 1
+        self._send(ws, error)
+        return None
+
+    def _release(self, identity: str) -> None:
+        """Drop one open session from a caller's count"""
+        with self._lock:
+            remaining = self._active.get(identity, 1) - 1
+            if remaining > 0:
+                self._active[identity] = remaining
+            else:
+                self._active.pop(identity, None)
+
+    def serve(self, ws, current_user: Optional[dict] = None) -> None:
+        """
+        Run one streaming session until the client ends it or disconnects
+
+        Args:
+            ws: WebSocket connection (flask-sock / simple-websocket)
+            current_user: Authenticated user, or None for anonymous callers
+                (limited by client IP)
+        """
+        identity = self._admit(ws, current_user)
+        if identity is None:
+            self._close(ws)
+            return
+
+        try:
+            session = self._open(ws)
+        except Exception:
+            self._release(identity)
+            raise
+        if session is None:
+            self._release(identity)
+            self._close(ws)
+            return
+
+        with self._lock:
+            self._stats["sessions"] += 1
+            self._stats["active_sessions"] += 1
+        started = last_audio = time.monotonic()
+        received = 0
+        try:
+            while True:
+                message = ws.receive(timeout=0.05)
+                for reply in session.poll():
+                    self._send(ws, reply)
+
+                now = time.monotonic()
+                if (
+                    received > Config.STREAMING_MAX_SESSION_BYTES
+                    or now - started > Config.STREAMING_MAX_SESSION_SECONDS
+                ):
+                    # Deliver what was said so far, then end the session
+                    for reply in session.finish(timeout=Config.ASR_TIMEOUT):
+                        self._send(ws, reply)
+                    self._send(ws, {"type": "error", "error": "Session limit reached"})
+                    break
+
+                if message is None:
+                    if now - last_audio > Config.STREAMING_IDLE_TIMEOUT:
+                        self._send(ws, {"type": "error", "error": "Idle timeout"})
+                        break
+                    continue
+
+                if isinstance(message, (bytes, bytearray)):
+                    last_audio = now
+                    received += len(message)
+                    try:
+                        replies = session.feed(bytes(message))
+                    except ValueError as e:
+                        self._send(ws, {"type": "error", "error": str(e)})
+                        break
+                    for reply in replies:
+                        self._send(ws, reply)
+                    continue
+
+                try:
+                    control = json.loads(message)
+                except ValueError:
+                    control = None
+                if isinstance(control, dict) and control.get("type") == "end":
+                    for reply in session.finish(timeout=Config.ASR_TIMEOUT):
+                        self._send(ws, reply)
+                    self._send(ws, {"type": "end"})
+                    break
+                self._send(ws, {"type": "error", "error": "Unknown message"})
+        except Exception as e:
+            # Includes the client disconnecting mid-stream
+            logger.info(f"Voice stream closed: {e}")
+        finally:
+            session.close()
+            self._release(identity)
+            with self._lock:
+                self._stats["active_sessions"] -= 1
+                for key, value in session.stats.items():
+                    self._stats[key] += value
+        self._close(ws)
+
+    def _close(self, ws) -> None:
+        """Close the connection, ignoring clients that already left"""
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get session metrics
+
+        Returns:
+            dict: Session and utterance counters, including how often the
+            speculative final result could be reused
+        """
+        with self._lock:
+            return {"engine": self.engine.name, **self._stats}
+
+
+# Singleton instance
+streaming_transcriber = StreamingTranscriber()
@@ -0,0 +1,191 @@
+"""
+One-shot voice-to-expense pipeline
+
+Runs speech recognition, AI parsing and expense insertion server-side for a
+single upload, replacing three client round trips. Itinerary ownership is
+checked before any recognition is spent, and parsing starts as soon as the
+transcript is ready. Low-confidence parses can be returned as a draft for the
+user to confirm instead of being recorded.
+
+A retried upload returns the expense its first attempt created: concurrent
+retries wait for the attempt in progress, later ones find it in a store.
+"""
+
+import time
+from typing import Any, Dict
+
+from loguru import logger
+
+from ..config import Config
+from ..utils.persistent_cache import persistent_cache
+from ..utils.single_flight import single_flight_group
+from .ai_expense_analyzer import ai_expense_analyzer
+from .expense_service import expense_service
+from .voice_service import voice_service
+
+
+class VoiceExpensePipeline:
+    """Recognize, parse and record an expense from one voice upload"""
+
+    def __init__(self):
+        """Initialize the pipeline"""
+        # Expense created per upload, so a retried request is not recorded twice
+        self._created = persistent_cache(
+            "voice.expenses", default_ttl=Config.VOICE_EXPENSE_DEDUP_TTL
+        )
+        # A retry arriving mid-request waits for the first attempt's expense
+        # (no wait timeout: giving up would insert a second one)
+        self._create_flight = single_flight_group(
+            "voice.expense_create",
+            enabled=Config.single_flight_enabled("voice.expense_create"),
+        )
+
+    def run(
+        self,
+        user_id: str,
+        itinerary_id: str,
+        audio_path: str,
+        content_hash: str,
+        language: str = "zh-CN",
+        require_confirmation: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Turn a voice recording into an expense record
+
+        Args:
+            user_id: Authenticated user ID
+            itinerary_id: Itinerary the expense belongs to
+            audio_path: Saved upload (see VoiceService.save_uploaded_file)
+            content_hash: SHA-256 of the upload
+            language: Language code for recognition
+            require_confirmation: Return a draft instead of recording it when
+                the parse confidence is below
+                Config.VOICE_EXPENSE_MIN_CONFIDENCE
+
+        Returns:
+            dict: 'success', 'error' and 'data' with the created 'expense'
+            (None if not recorded), 'needs_confirmation', 'transcription',
+            'parsed', 'duplicate', 'stage' reached and per-stage 'timings' (ms)
+
+        Raises:
+            LookupError: If the itinerary does not exist or is not the user's
+        """
+        created_key = f"{user_id}:{itinerary_id}:{content_hash}"
+        expense_id = self._created.get(created_key)
+        if expense_id is not None:
+            expense = expense_service.get_expense_by_id(expense_id, user_id)
+            if expense is not None:
+                logger.info(f"Voice expense retry matched {expense_id}")
+                return {
+                    "success": True,
+                    "error": None,
+                    "data": {
+                        "expense": expense,
+                        "needs_confirmation": False,
+                        "transcription": None,
+                        "parsed": None,
+                        "duplicate": True,
+                        "stage": "done",
+                        "timings": {},
+                    },
+                }
+
+        led = False
+
+        def create() -> Dict[str, Any]:
+            nonlocal led
+            led = True
+            return self._run(
+                created_key,
+                user_id,
+                itinerary_id,
+                audio_path,
+                content_hash,
+                language,
+                require_confirmation,
+            )
+
+        result = self._create_flight.do(created_key, create)
+        if not led and result["data"]["expense"] is not None:
+            logger.info(f"Voice expense retry joined {result['data']['expense']['id']}")
+            result["data"]["duplicate"] = True
+        return result
+
+    def _run(
+        self,
+        created_key: str,
+        user_id: str,
+        itinerary_id: str,
+        audio_path: str,
+        content_hash: str,
+        language: str,
+        require_confirmation: bool,
+    ) -> Dict[str, Any]:
+        """Run the pipeline for one upload (see `run`)"""
+        timings: Dict[str, int] = {}
+        data: Dict[str, Any] = {
+            "expense": None,
+            "needs_confirmation": False,
+            "transcription": None,
+            "parsed": None,
+            "duplicate": False,
+            "stage": "recognition",
+            "timings": timings,
+        }
+
+        if not expense_service.owns_itinerary(user_id, itinerary_id):
+            raise LookupError("Itinerary not found")
+
+        started = time.monotonic()
+        recognition = voice_service.recognize_from_file(
+            audio_path, language, content_hash
+        )
+        timings["recognition_ms"] = round((time.monotonic() - started) * 1000)
+        if not recognition["success"]:
+            return {"success": False, "error": recognition["error"], "data": data}
+        data["transcription"] = recognition["transcription"]
+
+        data["stage"] = "parse"
+        started = time.monotonic()
+        parsed = ai_expense_analyzer.parse_voice_expense(data["transcription"])
+        timings["parse_ms"] = round((time.monotonic() - started) * 1000)
+        data["parsed"] = parsed["data"]
+        if not parsed["success"]:
+            # The transcript is still useful for manual entry
+            data["needs_confirmation"] = True
+            return {"success": False, "error": parsed["error"], "data": data}
+
+        expense_data = parsed["data"]
+        if expense_data["amount"] <= 0 or (
+            require_confirmation
+            and expense_data["confidence"] < Config.VOICE_EXPENSE_MIN_CONFIDENCE
+        ):
+            logger.info(
+                f"Voice expense needs confirmation "
+                f"(confidence {expense_data['confidence']:.2f}): {expense_data}"
+            )
+            data.update(needs_confirmation=True, stage="confirmation")
+            return {"success": True, "error": None, "data": data}
+
+        data["stage"] = "insert"
+        started = time.monotonic()
+        expense = expense_service.create_expense(
+            user_id=user_id,
+            itinerary_id=itinerary_id,
+            category=expense_data["category"],
+            amount=float(expense_data["amount"]),
+            description=expense_data.get("description") or data["transcription"],
+            location=expense_data.get("location"),
+            payment_method=expense_data.get("payment_method"),
+            voice_input=True,
+        )
+        timings["insert_ms"] = round((time.monotonic() - started) * 1000)
+        self._created.set(created_key, expense["id"])
+
+        logger.info(f"Voice expense created: {expense['id']} ({timings})")
+        data.update(expense=expense, stage="done")
+        return {"success": True, "error": None, "data": data}
+
+
+# Singleton instance
+voice_expense_pipeline = VoiceExpensePipeline()
@@ -4,15 +4,35 @@ Voice recognition service for AI Travel Planner
 Based on prepare/语音识别.py
 """
 
+import hashlib
 import os
 import uuid
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import speech_recognition as sr
 from loguru import logger
 from pydub import AudioSegment
 
+from ..config import Config
+from ..utils.circuit_breaker import CircuitOpenError, circuit_breaker
+from ..utils.persistent_cache import persistent_cache
+from ..utils.single_flight import single_flight_group
+from ..utils.vad import VAD_VERSION, detect_speech
+
+ASR_UNAVAILABLE_ERROR = "语音识别服务暂时不可用，请稍后再试"
+NO_SPEECH_ERROR = "未检测到语音，请靠近麦克风再说一次"
+UNRECOGNIZED_ERROR = "无法识别语音内容，请说得更清楚一些"
+
+# Recognition engine, part of the transcription cache key
+ASR_ENGINE = "google"
+
+# Failures that depend only on the audio, so retrying the same bytes is futile
+CACHEABLE_ERRORS = (NO_SPEECH_ERROR, UNRECOGNIZED_ERROR)
+
+# Bytes read per step while saving and hashing an upload
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 
 class VoiceService:
     """Service for handling voice recognition"""
@@ -25,6 +45,26 @@ class VoiceService:
         self.recognizer.energy_threshold = 300
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 2.5  # Silence duration to end recording
+        self.recognizer.operation_timeout = Config.ASR_TIMEOUT
+
+        # Fail fast while Google ASR is down instead of holding the request
+        self._breaker = circuit_breaker(
+            "google_asr",
+            failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+            slow_call_seconds=Config.ASR_SLOW_CALL_SECONDS,
+            reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+            failure_exceptions=(sr.RequestError,),
+        )
+
+        # Retried and duplicate uploads are answered from the content hash
+        self._transcription_cache = persistent_cache(
+            "voice.transcriptions", default_ttl=Config.ASR_CACHE_TTL
+        )
+        self._recognize_flight = single_flight_group(
+            "voice.recognize",
+            enabled=Config.single_flight_enabled("voice.recognize"),
+            wait_timeout=Config.ASR_TIMEOUT * 2,
+        )
 
         # Create temp directory for audio files
         self.temp_dir = Path("/tmp/ai_travel_planner")
@@ -46,20 +86,8 @@ class VoiceService:
 
             logger.info(f"Converting {input_path} to WAV format...")
 
-            # Detect input format
-            input_ext = Path(input_path).suffix.lower().lstrip(".")
-            if input_ext == "webm":
-                # Load webm file
-                audio = AudioSegment.from_file(input_path, format="webm")
-            else:
-                # Try to auto-detect format
-                audio = AudioSegment.from_file(input_path)
-
-            # Convert to WAV with proper settings for speech recognition
-            # - 16000 Hz sample rate (good for speech)
-            # - Mono channel
-            # - 16-bit PCM
-            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+            # 16000 Hz mono 16-bit PCM, good for speech recognition
+            audio = self.load_audio(input_path)
 
             # Export as WAV
             audio.export(output_path, format="wav", codec="pcm_s16le")
@@ -75,97 +103,180 @@ class VoiceService:
             logger.error(f"Error converting audio: {e}")
             return None
 
+    def load_audio(self, input_path: str) -> AudioSegment:
+        """
+        Decode an audio file into recognizer format in memory
+
+        Args:
+            input_path: Path to a WAV file, or any format ffmpeg can decode
+
+        Returns:
+            AudioSegment: 16 kHz mono 16-bit PCM audio
+        """
+        input_ext = Path(input_path).suffix.lower().lstrip(".")
+        if input_ext in ("wav", "webm"):
+            audio = AudioSegment.from_file(input_path, format=input_ext)
+        else:
+            audio = AudioSegment.from_file(input_path)
+        return audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+
     def recognize_from_file(
-        self, audio_file_path: str, language: str = "zh-CN"
+        self,
+        audio_file_path: str,
+        language: str = "zh-CN",
+        content_hash: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Recognize speech from an audio file
 
+        Leading and trailing silence is trimmed before the audio is sent, and
+        recordings without speech are rejected without calling the
+        recognizer. With a content hash, results are cached per audio,
+        language and engine, so a retried upload of the same bytes is
+        answered without decoding or an ASR call.
+
         Args:
             audio_file_path: Path to the audio file
             language: Language code for recognition (default: zh-CN for Chinese)
+            content_hash: SHA-256 of the file (see `save_uploaded_file`)
 
         Returns:
-            dict: Contains 'success' (bool), 'error' (str), 'transcription' (str)
+            dict: Contains 'success' (bool), 'error' (str), 'transcription' (str),
+            'audio_duration' and 'speech_duration' (seconds); 'cached' is set
+            when the result came from the cache
         """
-        wav_path = audio_file_path
-        converted = False
+        if not content_hash:
+            return self._recognize_from_file(audio_file_path, language)
+
+        key = f"{content_hash}:{language}:{ASR_ENGINE}:vad{VAD_VERSION}"
+        cached = self._transcription_cache.get(key)
+        if cached is not None:
+            logger.info(f"Transcription cache hit for {content_hash[:12]}")
+            return {**cached, "cached": True}
+        return self._recognize_flight.do(
+            key, self._recognize_and_cache, key, audio_file_path, language
+        )
+
+    def _recognize_and_cache(
+        self, key: str, audio_file_path: str, language: str
+    ) -> Dict[str, Any]:
+        """Recognize a file and cache results that retrying would not change"""
+        result = self._recognize_from_file(audio_file_path, language)
+        if result["success"] or result["error"] in CACHEABLE_ERRORS:
+            self._transcription_cache.set(key, result)
+        return result
+
+    def _recognize_from_file(
+        self, audio_file_path: str, language: str
+    ) -> Dict[str, Any]:
+        """Decode, trim and recognize a file (uncached)"""
+        if self._breaker.is_open:
+            # Skip the decoding work, the upstream call would be rejected
+            return {
+                "success": False,
+                "error": ASR_UNAVAILABLE_ERROR,
+                "transcription": None,
+            }
 
-        try:
-            # Check if file needs conversion
-            if not audio_file_path.lower().endswith(".wav"):
-                logger.info(f"Converting {audio_file_path} to WAV format...")
-                wav_path = self.convert_to_wav(audio_file_path)
-                if not wav_path:
-                    return {
-                        "success": False,
-                        "error": "无法转换音频格式，请确保已安装ffmpeg",
-                        "transcription": None,
-                    }
-                converted = True
-
-            # Read and recognize audio
-            with sr.AudioFile(wav_path) as source:
-                logger.info(f"Reading audio file: {wav_path}")
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = self.recognizer.record(source)
-                logger.info("Starting recognition...")
-
-        except FileNotFoundError:
+        if not os.path.exists(audio_file_path):
             logger.error(f"File not found: {audio_file_path}")
             return {
                 "success": False,
                 "error": f"文件未找到: {audio_file_path}",
                 "transcription": None,
             }
+
+        try:
+            segment = self.load_audio(audio_file_path)
         except Exception as e:
             logger.error(f"Error reading file: {e}")
-            return {
-                "success": False,
-                "error": f"读取文件出错: {str(e)}",
-                "transcription": None,
-            }
+            error = (
+                "无法转换音频格式，请确保已安装ffmpeg"
+                if not audio_file_path.lower().endswith(".wav")
+                else f"读取文件出错: {str(e)}"
+            )
+            return {"success": False, "error": error, "transcription": None}
+
+        response = {
+            "success": True,
+            "error": None,
+            "transcription": None,
+            "audio_duration": round(len(segment) / 1000, 2),
+            "speech_duration": None,
+        }
+
+        if Config.VAD_ENABLED:
+            region = detect_speech(
+                segment,
+                frame_ms=Config.VAD_FRAME_MS,
+                margin_db=Config.VAD_MARGIN_DB,
+                padding_ms=Config.VAD_PADDING_MS,
+            )
+            response["speech_duration"] = round(region.speech_ms / 1000, 2)
+            logger.info(
+                f"VAD: {region.speech_ms} ms speech in {region.duration_ms} ms "
+                f"(noise floor {region.noise_floor_dbfs:.1f} dBFS)"
+            )
+            # Nothing to recognize: answer without an ASR call
+            if region.speech_ms < Config.VAD_MIN_SPEECH_MS:
+                response["success"] = False
+                response["error"] = NO_SPEECH_ERROR
+                return response
+            segment = segment[region.start_ms : region.end_ms]
+
+        response.update(self.transcribe(segment, language))
+        return response
 
-        response = {"success": True, "error": None, "transcription": None}
+    def transcribe(
+        self, segment: AudioSegment, language: str = "zh-CN"
+    ) -> Dict[str, Any]:
+        """
+        Recognize speech in decoded audio
+
+        Args:
+            segment: Audio in recognizer format (see `load_audio`)
+            language: Language code for recognition
+
+        Returns:
+            dict: Contains 'success' (bool), 'error' (str), 'transcription' (str)
+        """
+        audio = sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
 
         try:
             # Use Google Speech Recognition (free)
             logger.info("Calling Google Speech Recognition API...")
-            response["transcription"] = self.recognizer.recognize_google(
-                audio, language=language
+            transcription = self._breaker.call(
+                self.recognizer.recognize_google, audio, language=language
             )
-            logger.info(f"Recognition successful: {response['transcription']}")
+            logger.info(f"Recognition successful: {transcription}")
+            return {"success": True, "error": None, "transcription": transcription}
         except sr.RequestError as e:
             # API request failed
             logger.error(f"API request failed: {e}")
-            response["success"] = False
-            response["error"] = "API请求失败，请检查网络连接"
+            error = "API请求失败，请检查网络连接"
+        except CircuitOpenError as e:
+            logger.warning(f"{e}, retry after {e.retry_after:.0f}s")
+            error = ASR_UNAVAILABLE_ERROR
         except sr.UnknownValueError:
             # Cannot recognize speech
             logger.warning("Could not recognize speech content")
-            response["success"] = False
-            response["error"] = "无法识别语音内容，请说得更清楚一些"
-        finally:
-            # Clean up converted file
-            if converted and wav_path and os.path.exists(wav_path):
-                try:
-                    os.remove(wav_path)
-                    logger.debug(f"Cleaned up converted file: {wav_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to clean up {wav_path}: {e}")
+            error = UNRECOGNIZED_ERROR
 
-        return response
+        return {"success": False, "error": error, "transcription": None}
 
-    def save_uploaded_file(self, file_storage) -> Optional[str]:
+    def save_uploaded_file(self, file_storage) -> Optional[Tuple[str, str]]:
         """
         Save an uploaded file to temporary directory
 
+        The upload is hashed while it is written, so the content hash costs
+        no extra pass over the data.
+
         Args:
             file_storage: Flask FileStorage object
 
         Returns:
-            str: Path to the saved file, or None if failed
+            tuple: Path to the saved file and its SHA-256 hex digest, or None
+            if failed
         """
         try:
             # Generate unique filename
@@ -174,10 +285,14 @@ class VoiceService:
             temp_path = self.temp_dir / temp_filename
 
             # Save the file
-            file_storage.save(str(temp_path))
+            digest = hashlib.sha256()
+            with open(temp_path, "wb") as output:
+                while chunk := file_storage.stream.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    output.write(chunk)
             logger.info(f"Saved uploaded file to: {temp_path}")
 
-            return str(temp_path)
+            return str(temp_path), digest.hexdigest()
         except Exception as e:
             logger.error(f"Failed to save uploaded file: {e}")
             return None
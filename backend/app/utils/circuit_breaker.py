@@ -0,0 +1,210 @@
+"""
+Circuit breakers for upstream APIs
+
+A breaker opens after a run of failed or slow calls and then fails fast
+instead of letting every request wait out the upstream timeout. After a
+cool-down it lets a limited number of probe calls through (half-open) and
+closes again once a probe succeeds.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from loguru import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Upstream '{name}' is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: Optional[float] = None,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        """
+        Initialize a breaker
+
+        Args:
+            name: Upstream name used in errors, logs and metrics
+            failure_threshold: Consecutive failed or slow calls that open
+                the circuit
+            slow_call_seconds: Calls slower than this count as failures
+                (None disables slow-call detection)
+            reset_timeout: Seconds the circuit stays open before probing
+            half_open_max_calls: Concurrent probe calls while half-open
+            failure_exceptions: Exception types that count as upstream
+                failures; others (e.g. "no speech found") count as success
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.failure_exceptions = failure_exceptions
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0}
+        self._times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the cool-down ends"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected"""
+        return self.state == OPEN
+
+    def _current_state(self, now: float) -> str:
+        """State transition on read (lock must be held)"""
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing upstream")
+        return self._state
+
+    def _before_call(self) -> None:
+        """Admit or reject a call"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == OPEN or (
+                state == HALF_OPEN and self._probes >= self.half_open_max_calls
+            ):
+                self._stats["rejected"] += 1
+                retry_after = max(0.0, self.reset_timeout - (now - self._opened_at))
+                raise CircuitOpenError(self.name, retry_after)
+            if state == HALF_OPEN:
+                self._probes += 1
+            self._stats["calls"] += 1
+
+    def _after_call(self, failed: bool, slow: bool) -> None:
+        """Record a call outcome and open or close the circuit"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+            if slow:
+                self._stats["slow_calls"] += 1
+            if failed:
+                self._stats["failures"] += 1
+
+            if failed or slow:
+                self._failures += 1
+                if self._state == HALF_OPEN or (
+                    self._state == CLOSED and self._failures >= self.failure_threshold
+                ):
+                    self._open()
+            else:
+                if self._state == HALF_OPEN:
+                    logger.info(f"Circuit '{self.name}' closed, upstream recovered")
+                self._state = CLOSED
+                self._failures = 0
+
+    def _open(self) -> None:
+        """Open the circuit (lock must be held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+        logger.warning(
+            f"Circuit '{self.name}' opened after {self._failures} failed or slow "
+            f"calls, failing fast for {self.reset_timeout}s"
+        )
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run an upstream call through the breaker
+
+        Args:
+            fn: Upstream call
+            *args: Positional arguments for `fn`
+            **kwargs: Keyword arguments for `fn`
+
+        Returns:
+            The result of `fn`
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self._before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except self.failure_exceptions:
+            self._after_call(failed=True, slow=False)
+            raise
+        except BaseException:
+            self._after_call(failed=False, slow=False)
+            raise
+
+        elapsed = time.monotonic() - started
+        slow = self.slow_call_seconds is not None and elapsed > self.slow_call_seconds
+        self._after_call(failed=False, slow=slow)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get breaker metrics
+
+        Returns:
+            dict: State, counters and configuration
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["state"] = self._current_state(time.monotonic())
+            stats["consecutive_failures"] = self._failures
+            stats["times_opened"] = self._times_opened
+        return stats
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str, **options: Any) -> CircuitBreaker:
+    """
+    Get or create the shared breaker for an upstream
+
+    Args:
+        name: Upstream name (e.g. "amap", "google_asr")
+        **options: CircuitBreaker options, used when it is first created
+
+    Returns:
+        CircuitBreaker: Shared breaker
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **options)
+            _breakers[name] = breaker
+        return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every registered breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,278 @@
+"""
+Offline index of Chinese administrative divisions
+
+Resolves free-text city names, aliases, adcodes and coordinates to an
+adcode and Amap citycode locally, so weather and transit lookups do not
+need a geocoding round trip. The bundled TSV is loaded once, on first use,
+into flat lists and a coarse coordinate grid.
+"""
+
+import math
+import threading
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from ..config import Config
+
+# Lower values win when several divisions share a name
+LEVEL_PRIORITY = {"city": 0, "province": 1, "district": 2}
+
+# Stripped to derive short names (e.g. 杭州市 -> 杭州)
+NAME_SUFFIXES = (
+    "特别行政区",
+    "自治州",
+    "自治区",
+    "自治县",
+    "地区",
+    "新区",
+    "市",
+    "省",
+    "盟",
+    "区",
+    "县",
+)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class City(NamedTuple):
+    """A resolved administrative division"""
+
+    adcode: str
+    name: str
+    level: str
+    citycode: str
+    longitude: float
+    latitude: float
+
+
+def haversine_km(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    """Great-circle distance between two coordinates in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_location(location: str) -> Optional[Tuple[float, float]]:
+    """
+    Parse an Amap "longitude,latitude" string
+
+    Returns:
+        tuple: (longitude, latitude), or None if malformed
+    """
+    try:
+        lng, lat = (float(part) for part in str(location).split(","))
+    except (TypeError, ValueError):
+        return None
+    return lng, lat
+
+
+class CityIndex:
+    """Name, adcode and nearest-centroid lookup over a bundled TSV"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index (data is loaded lazily)
+
+        Args:
+            path: TSV file to load (defaults to Config.CITY_INDEX_PATH)
+        """
+        self.path = path or Config.CITY_INDEX_PATH
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._adcodes: List[str] = []
+        self._names: List[str] = []
+        self._levels: List[str] = []
+        self._citycodes: List[str] = []
+        self._lngs = array("d")
+        self._lats = array("d")
+        self._by_adcode: Dict[str, int] = {}
+        self._by_name: Dict[str, int] = {}
+        # Keys that are official names rather than aliases (e.g. 泰山 -> 泰安)
+        self._official_names: set = set()
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+
+    def _ensure_loaded(self) -> None:
+        """Load the TSV once"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                self._load()
+            except OSError as e:
+                logger.error(f"Failed to load city index from {self.path}: {e}")
+            self._loaded = True
+
+    def _load(self) -> None:
+        """Parse the TSV into flat lists and lookup tables"""
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 6:
+                    continue
+                adcode, name, level, citycode, lng, lat = fields[:6]
+                aliases = fields[6].split(",") if len(fields) > 6 else []
+                try:
+                    lng_value, lat_value = float(lng), float(lat)
+                except ValueError:
+                    continue
+
+                index = len(self._adcodes)
+                self._adcodes.append(adcode)
+                self._names.append(name)
+                self._levels.append(level)
+                self._citycodes.append(citycode)
+                self._lngs.append(lng_value)
+                self._lats.append(lat_value)
+                self._by_adcode[adcode] = index
+                self._grid.setdefault(
+                    (math.floor(lng_value), math.floor(lat_value)), []
+                ).append(index)
+
+                for key in {name, self._short_name(name)}:
+                    self._add_name(key, index)
+                    self._official_names.add(self._normalize(key))
+                for key in aliases:
+                    self._add_name(key, index)
+
+        logger.info(f"City index loaded: {len(self._adcodes)} divisions")
+
+    def _add_name(self, name: str, index: int) -> None:
+        """Register a lookup name, keeping the higher-priority division"""
+        key = self._normalize(name)
+        if not key:
+            return
+        existing = self._by_name.get(key)
+        if existing is not None and LEVEL_PRIORITY.get(
+            self._levels[existing], 9
+        ) <= LEVEL_PRIORITY.get(self._levels[index], 9):
+            return
+        self._by_name[key] = index
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        """Normalize a name for lookup"""
+        return "".join(str(name).split()).lower()
+
+    @staticmethod
+    def _short_name(name: str) -> str:
+        """Strip an administrative suffix if a usable name remains"""
+        for suffix in NAME_SUFFIXES:
+            if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+                return name[: -len(suffix)]
+        return name
+
+    def _city(self, index: int) -> City:
+        """Build the record for an index"""
+        return City(
+            adcode=self._adcodes[index],
+            name=self._names[index],
+            level=self._levels[index],
+            citycode=self._citycodes[index],
+            longitude=self._lngs[index],
+            latitude=self._lats[index],
+        )
+
+    def resolve(self, query: str) -> Optional[City]:
+        """
+        Resolve a city name, alias or adcode
+
+        Only whole names match: a prefix match would send free-text
+        addresses such as "南京路" to the wrong city.
+
+        Args:
+            query: Name (e.g. "杭州", "杭州市", "xian") or a 6-digit adcode
+
+        Returns:
+            City: Matching division, or None if unknown
+        """
+        self._ensure_loaded()
+        key = self._normalize(query or "")
+        if not key:
+            return None
+
+        if key.isdigit() and len(key) == 6:
+            # Fall back from a district adcode to its city or province
+            for code in (key, f"{key[:4]}00", f"{key[:2]}0000"):
+                index = self._by_adcode.get(code)
+                if index is not None:
+                    return self._city(index)
+            return None
+
+        index = self._by_name.get(key)
+        return self._city(index) if index is not None else None
+
+    def lookup_exact(self, query: str, aliases: bool = True) -> Optional[City]:
+        """
+        Resolve a full-name match, optionally without aliases
+
+        Args:
+            query: Name to look up
+            aliases: Also accept aliases (some aliases name scenic spots
+                inside the city rather than the city itself)
+
+        Returns:
+            City: Matching division, or None
+        """
+        self._ensure_loaded()
+        key = self._normalize(query or "")
+        if not aliases and key not in self._official_names:
+            return None
+        index = self._by_name.get(key)
+        return self._city(index) if index is not None else None
+
+    def nearest(
+        self, longitude: float, latitude: float, max_km: Optional[float] = None
+    ) -> Optional[City]:
+        """
+        Find the division whose centroid is closest to a coordinate
+
+        The index may not list every division, so only centroids within a
+        tight radius are trusted; farther coordinates could belong to an
+        unlisted neighbour and should be reverse geocoded instead.
+
+        Args:
+            longitude: Longitude (GCJ-02, as used by Amap)
+            latitude: Latitude
+            max_km: Maximum centroid distance (defaults to
+                Config.CITY_INDEX_MAX_DISTANCE_KM)
+
+        Returns:
+            City: Nearest division within range, or None
+        """
+        self._ensure_loaded()
+        max_km = Config.CITY_INDEX_MAX_DISTANCE_KM if max_km is None else max_km
+
+        # One degree of longitude is ~70 km or more south of 50°N
+        reach = max(1, math.ceil(max_km / 70))
+        cell_lng, cell_lat = math.floor(longitude), math.floor(latitude)
+        best, best_km = None, max_km
+        for d_lng in range(-reach, reach + 1):
+            for d_lat in range(-reach, reach + 1):
+                for index in self._grid.get((cell_lng + d_lng, cell_lat + d_lat), ()):
+                    distance = haversine_km(
+                        longitude, latitude, self._lngs[index], self._lats[index]
+                    )
+                    if distance <= best_km:
+                        best, best_km = index, distance
+        return self._city(best) if best is not None else None
+
+    def resolve_location(self, location: str) -> Optional[City]:
+        """Resolve an Amap "longitude,latitude" string to its division"""
+        coordinates = parse_location(location)
+        return self.nearest(*coordinates) if coordinates else None
+
+
+# Singleton instance
+city_index = CityIndex()
@@ -0,0 +1,164 @@
+"""
+Negotiated response compression
+
+Buffered JSON responses above a size threshold are compressed with brotli
+(when installed) or gzip in an `after_request` hook. Large list responses
+can instead be serialized and compressed incrementally with
+`json_list_response`, so the full document is never held twice in memory.
+"""
+
+import gzip
+import zlib
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+
+from ..config import Config
+from .http_cache import encoded_etag
+from .json_provider import dumps_bytes
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+# Raw bytes collected before each streamed compression step
+STREAM_BATCH_BYTES = 64 * 1024
+
+
+def negotiate_encoding() -> Optional[str]:
+    """
+    Pick the best content coding the client accepts
+
+    Returns:
+        str: "br" or "gzip", or None for an identity response
+    """
+    if not Config.COMPRESSION_ENABLED:
+        return None
+
+    accepted = request.accept_encodings
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in offers:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """
+    Compress a complete body
+
+    Args:
+        data: Uncompressed body
+        encoding: "br" or "gzip"
+
+    Returns:
+        bytes: Compressed body
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=Config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _stream_compressor(
+    encoding: Optional[str],
+) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """Get (compress, finish) functions for an incremental encoder"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    if encoding == "gzip":
+        compressor = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+    return (lambda data: data), (lambda: b"")
+
+
+def json_list_response(items: List[Any], **fields: Any) -> Response:
+    """
+    Build a `{**fields, "data": items}` JSON response
+
+    Lists with at least `STREAM_LIST_MIN_ITEMS` items are serialized item
+    by item and compressed as they are sent; smaller lists use `jsonify`
+    and the regular compression hook.
+
+    Args:
+        items: List to return under "data"
+        **fields: Other top-level fields (e.g. success=True)
+
+    Returns:
+        Response: Buffered or streamed JSON response
+    """
+    if len(items) < Config.STREAM_LIST_MIN_ITEMS:
+        return jsonify({**fields, "data": items})
+
+    encoding = negotiate_encoding()
+    head = dumps_bytes(fields)[:-1] + (b',"data":[' if fields else b'"data":[')
+
+    def generate() -> Iterator[bytes]:
+        compress, finish = _stream_compressor(encoding)
+        batch = bytearray(head)
+        for index, item in enumerate(items):
+            if index:
+                batch += b","
+            batch += dumps_bytes(item)
+            if len(batch) >= STREAM_BATCH_BYTES:
+                chunk = compress(bytes(batch))
+                batch.clear()
+                if chunk:
+                    yield chunk
+        batch += b"]}\n"
+        yield compress(bytes(batch)) + finish()
+
+    response = Response(generate(), mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _compress_response(response: Response) -> Response:
+    """after_request hook: compress buffered responses above the threshold"""
+    if (
+        not Config.COMPRESSION_ENABLED
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    compressed = compress_bytes(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag = response.headers.get("ETag")
+    if etag:
+        response.headers["ETag"] = encoded_etag(etag, encoding)
+    return response
+
+
+def init_compression(app: Flask) -> None:
+    """
+    Register the response compression hook on an app
+
+    Args:
+        app: Flask application
+    """
+    app.after_request(_compress_response)
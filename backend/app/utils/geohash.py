@@ -0,0 +1,106 @@
+"""
+Geohash encoding for snapping coordinates to a grid
+
+A geohash of precision 7 names a cell of roughly 150 m x 150 m, so nearby
+points (GPS jitter, the same hotel entrance) share a key.
+"""
+
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+
+def encode(latitude: float, longitude: float, precision: int = 7) -> str:
+    """
+    Encode a coordinate as a geohash
+
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        precision: Number of characters (cell size shrinks ~8x per 2 chars)
+
+    Returns:
+        str: Geohash of the cell containing the coordinate
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude (even) and latitude (odd)
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            bounds[0] = middle
+        else:
+            bits <<= 1
+            bounds[1] = middle
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(chars)
+
+
+def decode_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Decode a geohash to its cell bounds
+
+    Returns:
+        tuple: (min_latitude, min_longitude, max_latitude, max_longitude)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bounds = lng_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if (bits >> shift) & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """
+    Decode a geohash to the center of its cell
+
+    Returns:
+        tuple: (latitude, longitude)
+    """
+    min_lat, min_lng, max_lat, max_lng = decode_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def neighbors(geohash: str) -> List[str]:
+    """
+    Get the eight cells surrounding a geohash cell
+
+    Returns:
+        list: Geohashes of the neighboring cells (same precision)
+    """
+    min_lat, min_lng, max_lat, max_lng = decode_bounds(geohash)
+    center_lat, center_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    height, width = max_lat - min_lat, max_lng - min_lng
+
+    cells = []
+    for d_lat in (-1, 0, 1):
+        for d_lng in (-1, 0, 1):
+            if d_lat == 0 and d_lng == 0:
+                continue
+            latitude = max(-90.0, min(90.0, center_lat + d_lat * height))
+            longitude = (center_lng + d_lng * width + 180.0) % 360.0 - 180.0
+            cell = encode(latitude, longitude, len(geohash))
+            if cell != geohash and cell not in cells:
+                cells.append(cell)
+    return cells
@@ -0,0 +1,114 @@
+"""
+Hedged requests for idempotent upstream reads
+
+If a call has not finished after the upstream's recent p95 latency, a
+duplicate is sent and whichever finishes first wins. This cuts tail latency
+for only ~5% extra upstream calls.
+"""
+
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int = 200):
+        """
+        Initialize the tracker
+
+        Args:
+            window: Number of most recent samples kept
+        """
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = 20) -> Optional[float]:
+        """
+        Get a latency percentile over the window
+
+        Args:
+            fraction: Percentile as a fraction (e.g. 0.95)
+            min_samples: Samples required before a value is reported
+
+        Returns:
+            float: Latency in seconds, or None with too few samples
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+        return samples[index]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get sample count and common percentiles"""
+        with self._lock:
+            count = len(self._samples)
+        return {
+            "samples": count,
+            "p50": self.percentile(0.5, min_samples=1),
+            "p95": self.percentile(0.95, min_samples=1),
+        }
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _hedge_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Shared pool for hedged calls (separate from fan-out pools)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="hedge"
+            )
+        return _executor
+
+
+def hedged_call(
+    fn: Callable[[], Any],
+    delay: float,
+    can_hedge: Optional[Callable[[], bool]] = None,
+    max_workers: int = 16,
+) -> Any:
+    """
+    Run `fn`, sending one duplicate if it is still pending after `delay`
+
+    Args:
+        fn: Idempotent upstream call
+        delay: Seconds to wait before hedging (e.g. the recent p95)
+        can_hedge: Optional check run before hedging (e.g. a non-blocking
+            rate-limit token); the duplicate is skipped if it returns False
+        max_workers: Size of the shared hedge pool
+
+    Returns:
+        The result of the first call to succeed
+
+    Raises:
+        Exception: The last error if every attempt failed
+    """
+    executor = _hedge_executor(max_workers)
+    primary = executor.submit(contextvars.copy_context().run, fn)
+    done, _ = wait([primary], timeout=delay)
+    if done or (can_hedge is not None and not can_hedge()):
+        return primary.result()
+
+    pending = {primary, executor.submit(contextvars.copy_context().run, fn)}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
@@ -0,0 +1,163 @@
+"""
+HTTP conditional GET helpers (ETag / If-None-Match)
+
+Handlers compute a strong ETag from cheap version data (row ids, counts and
+`updated_at`) before loading or serializing the full body, and answer 304
+when the client already holds the current representation.
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Iterable, Optional
+
+from flask import Response, jsonify, request
+
+# Content codings appended to the ETag of compressed representations
+ETAG_ENCODING_SUFFIXES = ("gzip", "br")
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Compute a strong ETag from version data
+
+    Args:
+        *parts: JSON-serializable values identifying the representation
+            (e.g. resource id, row count, `updated_at` values)
+
+    Returns:
+        str: Quoted strong ETag
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def rows_etag(kind: str, rows: Iterable[dict]) -> str:
+    """
+    Compute an ETag for a list of rows from their ids and `updated_at`
+
+    Args:
+        kind: Resource kind, so different lists never share a tag
+        rows: Rows with at least `id` and `updated_at`
+
+    Returns:
+        str: Quoted strong ETag covering the row count and versions
+    """
+    versions = [(row.get("id"), row.get("updated_at")) for row in rows]
+    return compute_etag(kind, len(versions), versions)
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Derive the ETag of a content-coded representation
+
+    Compressed and identity bodies are different representations, so they
+    must not share a strong ETag (e.g. `"abc"` -> `"abc-gzip"`).
+
+    Args:
+        etag: Quoted ETag of the identity representation
+        encoding: Content-Encoding applied, or None
+
+    Returns:
+        str: ETag for the encoded representation
+    """
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _strip_encoding(tag: str) -> str:
+    """Remove the W/ prefix and any content-coding suffix from an ETag"""
+    tag = tag.removeprefix("W/")
+    for encoding in ETAG_ENCODING_SUFFIXES:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return f'{tag[: -len(suffix)]}"'
+    return tag
+
+
+def matching_etag(etag: str, if_none_match: Optional[str] = None) -> Optional[str]:
+    """
+    Find the client's cached tag that matches the current ETag
+
+    Args:
+        etag: Current quoted ETag of the identity representation
+        if_none_match: Header value (defaults to the current request's)
+
+    Returns:
+        str: The matching tag as sent by the client, or None if the client's
+        copy is stale
+    """
+    if if_none_match is None:
+        if_none_match = request.headers.get("If-None-Match", "")
+    if not if_none_match:
+        return None
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return etag
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored, and
+    # any content coding of the same version counts as a match
+    for tag in candidates:
+        if _strip_encoding(tag) == etag:
+            return tag.removeprefix("W/")
+    return None
+
+
+def etag_matches(etag: str, if_none_match: Optional[str] = None) -> bool:
+    """
+    Check an ETag against the request's If-None-Match header
+
+    Args:
+        etag: Current quoted ETag
+        if_none_match: Header value (defaults to the current request's)
+
+    Returns:
+        bool: True if the client's cached copy is current
+    """
+    return matching_etag(etag, if_none_match) is not None
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Build an empty 304 response carrying the validators"""
+    response = Response(status=304)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def conditional_json(
+    etag: str,
+    build_body: Callable[[], Any],
+    cache_control: str,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Answer 304 if the client's copy is current, otherwise build the JSON body
+
+    Args:
+        etag: ETag computed from version data
+        build_body: Callable returning the JSON-serializable body or a
+            ready Response; only invoked when the representation has to be
+            sent
+        cache_control: Cache-Control header value for this endpoint
+        vary: Optional Vary header value (e.g. "Authorization")
+
+    Returns:
+        Response: 304 Not Modified or 200 with the JSON body
+    """
+    client_etag = matching_etag(etag)
+    if client_etag is not None:
+        # Echo the tag of the representation the client holds
+        response = not_modified(client_etag, cache_control)
+    else:
+        body = build_body()
+        response = body if isinstance(body, Response) else jsonify(body)
+        response.headers["ETag"] = encoded_etag(
+            etag, response.headers.get("Content-Encoding")
+        )
+        response.headers["Cache-Control"] = cache_control
+
+    if vary:
+        response.vary.add(vary)
+    return response
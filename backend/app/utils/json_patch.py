@@ -0,0 +1,247 @@
+"""
+JSON Patch (RFC 6902) application with JSON Pointer (RFC 6901) paths
+
+Patches are applied to a copy of the document, so a failing operation
+leaves the original untouched. The applied changes are reported with
+resolved paths (e.g. `/items/-` becomes `/items/3`) so callers can return
+just the parts of the document that changed.
+"""
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+PATCH_OPS = {"add", "remove", "replace", "move", "copy", "test"}
+
+
+class JsonPatchError(ValueError):
+    """Raised for malformed patches or operations that cannot be applied"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """Raised when a `test` operation does not match the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """
+    Split a JSON Pointer into unescaped reference tokens
+
+    Args:
+        pointer: JSON Pointer (e.g. "/daily_itinerary/0/items/1/time")
+
+    Returns:
+        list: Reference tokens ("" is the whole document)
+
+    Raises:
+        JsonPatchError: If the pointer is malformed
+    """
+    if not isinstance(pointer, str):
+        raise JsonPatchError("JSON Pointer must be a string")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON Pointer: {pointer}")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def format_pointer(tokens: List[str]) -> str:
+    """Join reference tokens into an escaped JSON Pointer"""
+    return "".join(
+        "/" + str(token).replace("~", "~0").replace("/", "~1") for token in tokens
+    )
+
+
+def _array_index(token: str, array: list, allow_end: bool) -> int:
+    """Convert a reference token to a list index"""
+    if token == "-" and allow_end:
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token}")
+    index = int(token)
+    limit = len(array) if allow_end else len(array) - 1
+    if index > limit:
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _resolve(document: Any, tokens: List[str]) -> Any:
+    """Get the value a list of tokens refers to"""
+    target = document
+    for token in tokens:
+        if isinstance(target, dict):
+            if token not in target:
+                raise JsonPatchError(f"Path not found: {format_pointer(tokens)}")
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_array_index(token, target, allow_end=False)]
+        else:
+            raise JsonPatchError(f"Path not found: {format_pointer(tokens)}")
+    return target
+
+
+def resolve_pointer(document: Any, pointer: str) -> Any:
+    """
+    Get the value at a JSON Pointer
+
+    Args:
+        document: JSON document
+        pointer: JSON Pointer
+
+    Returns:
+        The referenced value
+
+    Raises:
+        JsonPatchError: If the path does not exist
+    """
+    return _resolve(document, parse_pointer(pointer))
+
+
+def _json_equal(left: Any, right: Any) -> bool:
+    """Compare JSON values without Python's bool/number conflation"""
+    if isinstance(left, bool) or isinstance(right, bool):
+        return isinstance(left, bool) and isinstance(right, bool) and left == right
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+        return left == right
+    if type(left) is not type(right):
+        return False
+    if isinstance(left, dict):
+        return left.keys() == right.keys() and all(
+            _json_equal(left[key], right[key]) for key in left
+        )
+    if isinstance(left, list):
+        return len(left) == len(right) and all(
+            _json_equal(a, b) for a, b in zip(left, right)
+        )
+    return left == right
+
+
+class _Patcher:
+    """Applies operations to a working copy and records the changes"""
+
+    def __init__(self, document: Any):
+        self.document = document
+        self.changes: List[Dict[str, Any]] = []
+
+    def apply(self, operation: Dict[str, Any]) -> None:
+        """Apply a single operation"""
+        if not isinstance(operation, dict):
+            raise JsonPatchError("Each patch operation must be an object")
+        op = operation.get("op")
+        if op not in PATCH_OPS:
+            raise JsonPatchError(f"Unsupported patch operation: {op}")
+        if "path" not in operation:
+            raise JsonPatchError(f"Missing 'path' in '{op}' operation")
+        path = parse_pointer(operation["path"])
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Missing 'value' in '{op}' operation")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JsonPatchError(f"Missing 'from' in '{op}' operation")
+
+        if op == "add":
+            self._add(path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            self._remove(path)
+        elif op == "replace":
+            self._replace(path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = parse_pointer(operation["from"])
+            if path[: len(source)] == source and path != source:
+                raise JsonPatchError("Cannot move a value into one of its children")
+            value = self._remove(source)
+            self._add(path, value)
+        elif op == "copy":
+            source = parse_pointer(operation["from"])
+            self._add(path, copy.deepcopy(_resolve(self.document, source)))
+        elif not _json_equal(_resolve(self.document, path), operation["value"]):
+            raise JsonPatchTestFailed(f"Test failed at {operation['path']}")
+
+    def _parent(self, path: List[str]) -> Any:
+        """Resolve the container holding the last token of a path"""
+        parent = _resolve(self.document, path[:-1])
+        if not isinstance(parent, (dict, list)):
+            raise JsonPatchError(f"Path not found: {format_pointer(path)}")
+        return parent
+
+    def _add(self, path: List[str], value: Any) -> None:
+        """Add or insert a value (replacing an existing object member)"""
+        if not path:
+            self.document = value
+            self._record("replace", path, value)
+            return
+        parent = self._parent(path)
+        token = path[-1]
+        if isinstance(parent, list):
+            index = _array_index(token, parent, allow_end=True)
+            parent.insert(index, value)
+            self._record("add", path[:-1] + [str(index)], value)
+        else:
+            existed = token in parent
+            parent[token] = value
+            self._record("replace" if existed else "add", path, value)
+
+    def _remove(self, path: List[str]) -> Any:
+        """Remove and return a value"""
+        if not path:
+            raise JsonPatchError("Cannot remove the whole document")
+        parent = self._parent(path)
+        token = path[-1]
+        if isinstance(parent, list):
+            value = parent.pop(_array_index(token, parent, allow_end=False))
+        else:
+            if token not in parent:
+                raise JsonPatchError(f"Path not found: {format_pointer(path)}")
+            value = parent.pop(token)
+        self._record("remove", path)
+        return value
+
+    def _replace(self, path: List[str], value: Any) -> None:
+        """Replace an existing value"""
+        if not path:
+            self.document = value
+        else:
+            parent = self._parent(path)
+            token = path[-1]
+            if isinstance(parent, list):
+                parent[_array_index(token, parent, allow_end=False)] = value
+            else:
+                if token not in parent:
+                    raise JsonPatchError(f"Path not found: {format_pointer(path)}")
+                parent[token] = value
+        self._record("replace", path, value)
+
+    def _record(self, op: str, path: List[str], value: Any = None) -> None:
+        """Record an applied change"""
+        change = {"op": op, "path": format_pointer(path)}
+        if op != "remove":
+            # Later operations may mutate the value in place
+            change["value"] = copy.deepcopy(value)
+        self.changes.append(change)
+
+
+def apply_patch(
+    document: Any, operations: List[Dict[str, Any]]
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Apply an RFC 6902 patch atomically
+
+    Args:
+        document: JSON document (not modified)
+        operations: Patch operations
+
+    Returns:
+        tuple: (patched copy of the document, applied changes with resolved
+        paths and new values; `test` operations are not listed)
+
+    Raises:
+        JsonPatchError: If the patch is malformed or an operation fails
+        JsonPatchTestFailed: If a `test` operation does not match
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("Patch must be a list of operations")
+
+    patcher = _Patcher(copy.deepcopy(document))
+    for operation in operations:
+        patcher.apply(operation)
+    return patcher.document, patcher.changes
@@ -0,0 +1,87 @@
+"""
+Fast JSON serialization for Flask responses
+
+Uses orjson when it is installed and falls back to Flask's stdlib-based
+provider otherwise. orjson also writes non-ASCII text as UTF-8 instead of
+`\\uXXXX` escapes, which roughly halves the size of Chinese itinerary text.
+"""
+
+import decimal
+from typing import Any
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+from loguru import logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Serialize types orjson does not handle natively"""
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 JSON bytes
+
+    Args:
+        obj: JSON-serializable object
+        indent: Pretty-print with two-space indentation
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    import json
+
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        default=_default,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize to a string, deferring to the stdlib for custom options"""
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Build a JSON response without an intermediate str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app: Flask) -> None:
+    """
+    Install the fast JSON provider on an app if orjson is available
+
+    Args:
+        app: Flask application
+    """
+    if orjson is None:
+        logger.warning("orjson not installed, using the standard JSON encoder")
+        return
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,436 @@
+"""
+Tolerant incremental JSON parser for LLM output
+
+Recovers JSON that models commonly get slightly wrong: markdown code fences
+and surrounding prose, comments, unquoted keys, single or full-width quotes,
+full-width punctuation, trailing or missing commas, Python literals and
+output truncated at the token limit. Every fix is reported so callers can
+log or surface what was repaired.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Full-width punctuation that models emit in structural positions
+FULLWIDTH_PUNCTUATION = {
+    "｛": "{",
+    "｝": "}",
+    "［": "[",
+    "］": "]",
+    "：": ":",
+    "，": ",",
+}
+
+# Opening quote -> closing quote
+QUOTES = {'"': '"', "'": "'", "“": "”"}
+
+LITERALS = {
+    "true": True,
+    "false": False,
+    "null": None,
+    "True": True,
+    "False": False,
+    "None": None,
+}
+
+NUMBER_PATTERN = re.compile(r"^-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$")
+
+# Characters that end a bare (unquoted) token
+BARE_TOKEN_END = set(' \t\r\n,:[]{}"/') | set(FULLWIDTH_PUNCTUATION) | {"“", "”"}
+
+
+@dataclass
+class RepairResult:
+    """Outcome of a tolerant parse"""
+
+    data: Any
+    repairs: List[str] = field(default_factory=list)
+    truncated: bool = False
+
+
+class _Frame:
+    """An open object or array on the parser stack"""
+
+    __slots__ = ("container", "state", "key", "path", "discard", "after_comma")
+
+    def __init__(self, container, path: str, discard: bool = False):
+        self.container = container
+        # Objects: key -> colon -> value -> comma; arrays: value -> comma
+        self.state = "key" if isinstance(container, dict) else "value"
+        self.key: Optional[str] = None
+        self.path = path
+        self.discard = discard
+        self.after_comma = False
+
+
+class TolerantJSONParser:
+    """Incremental JSON parser that repairs common LLM output errors"""
+
+    def __init__(self):
+        """Initialize an empty parser"""
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._done = False
+        self._root: Any = None
+        self._truncated = False
+        self._repairs: Dict[str, int] = {}
+
+    def feed(self, chunk: str) -> None:
+        """
+        Consume the next chunk of model output
+
+        Complete tokens are parsed immediately; a token split across chunks
+        is kept until the rest of it arrives.
+
+        Args:
+            chunk: Next piece of text (e.g. a streamed completion delta)
+        """
+        self._buffer += chunk
+        self._scan(final=False)
+
+    def finish(self) -> RepairResult:
+        """
+        Finish parsing, closing any structures left open by truncation
+
+        Returns:
+            RepairResult: Parsed value, repairs applied and truncation flag
+
+        Raises:
+            ValueError: If the input contains no JSON object or array
+        """
+        self._scan(final=True)
+        if not self._started:
+            raise ValueError("No JSON object or array found in response")
+
+        if self._stack:
+            self._truncated = True
+            self._repair("output was truncated")
+            self._unwind()
+
+        repairs = [
+            f"{message} (x{count})" if count > 1 else message
+            for message, count in self._repairs.items()
+        ]
+        return RepairResult(data=self._root, repairs=repairs, truncated=self._truncated)
+
+    def _repair(self, message: str) -> None:
+        """Record a repair, counting repeats"""
+        self._repairs[message] = self._repairs.get(message, 0) + 1
+
+    # Scanning
+
+    def _scan(self, final: bool) -> None:
+        """Tokenize as much of the buffer as possible"""
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            if self._done:
+                if buffer[self._pos :].strip(" \t\r\n`"):
+                    self._repair("ignored text after the JSON value")
+                self._pos = len(buffer)
+                break
+
+            char = buffer[self._pos]
+            if not self._started:
+                if char in "{[｛［":
+                    if buffer[: self._pos].strip():
+                        self._repair("skipped text before the JSON value")
+                    self._started = True
+                else:
+                    self._pos += 1
+                continue
+
+            if char in FULLWIDTH_PUNCTUATION:
+                self._repair("replaced full-width punctuation")
+                char = FULLWIDTH_PUNCTUATION[char]
+
+            if char in " \t\r\n":
+                self._pos += 1
+            elif char == "/":
+                if not self._skip_comment(final):
+                    break
+            elif char in "{[":
+                self._pos += 1
+                self._open({} if char == "{" else [])
+            elif char in "}]":
+                self._pos += 1
+                self._close(char)
+            elif char == ":":
+                self._pos += 1
+                self._colon()
+            elif char == ",":
+                self._pos += 1
+                self._comma()
+            elif char in QUOTES:
+                if not self._read_string(char, final):
+                    break
+            elif char in "`”":
+                self._repair("skipped stray characters")
+                self._pos += 1
+            else:
+                if not self._read_bare(final):
+                    break
+
+        # Drop consumed text so long streams do not grow the buffer
+        if self._pos > 4096:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+
+    def _skip_comment(self, final: bool) -> bool:
+        """Skip a // or /* */ comment; False if more input is needed"""
+        buffer = self._buffer
+        if self._pos + 1 >= len(buffer):
+            if final:
+                self._pos = len(buffer)
+                return True
+            return False
+
+        marker = buffer[self._pos + 1]
+        if marker == "/":
+            end = buffer.find("\n", self._pos + 2)
+            skip_to = end + 1 if end >= 0 else None
+        elif marker == "*":
+            end = buffer.find("*/", self._pos + 2)
+            skip_to = end + 2 if end >= 0 else None
+        else:
+            self._repair("skipped stray characters")
+            self._pos += 1
+            return True
+
+        if skip_to is None:
+            if not final:
+                return False
+            skip_to = len(buffer)
+        self._repair("removed comments")
+        self._pos = skip_to
+        return True
+
+    def _read_string(self, quote: str, final: bool) -> bool:
+        """Read a quoted string token; False if more input is needed"""
+        buffer = self._buffer
+        closing = QUOTES[quote]
+        index = self._pos + 1
+        while index < len(buffer):
+            char = buffer[index]
+            if char == "\\" and quote != "“":
+                index += 2
+                continue
+            if char == closing:
+                break
+            index += 1
+        else:
+            if final:
+                # Unterminated string at the end of input: truncated value
+                self._pos = len(buffer)
+            return False
+
+        raw = buffer[self._pos + 1 : index]
+        self._pos = index + 1
+        if quote != '"':
+            self._repair("normalized non-standard string quotes")
+        self._value(self._decode_string(raw, quote))
+        return True
+
+    def _decode_string(self, raw: str, quote: str) -> str:
+        """Decode the body of a quoted string"""
+        if quote == "“":
+            return raw
+        if quote == "'":
+            raw = raw.replace("\\'", "'").replace('"', '\\"')
+        try:
+            return json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            self._repair("kept invalid escape sequences literally")
+            return raw.replace('\\"', '"')
+
+    def _read_bare(self, final: bool) -> bool:
+        """Read an unquoted token (number, literal or bare word)"""
+        buffer = self._buffer
+        index = self._pos
+        while index < len(buffer) and buffer[index] not in BARE_TOKEN_END:
+            index += 1
+
+        if index == len(buffer):
+            # The token may continue in the next chunk; at the end of input a
+            # token inside an open structure is treated as truncated
+            if final:
+                self._pos = len(buffer)
+            return False
+
+        token = buffer[self._pos : index]
+        self._pos = index
+        self._value(self._convert_bare(token))
+        return True
+
+    def _convert_bare(self, token: str) -> Any:
+        """Convert an unquoted token to a JSON value"""
+        if token in LITERALS:
+            if token not in ("true", "false", "null"):
+                self._repair("converted Python literals")
+            return LITERALS[token]
+        if NUMBER_PATTERN.match(token):
+            number = float(token)
+            if number.is_integer() and not re.search(r"[.eE]", token):
+                return int(token)
+            return number
+
+        top = self._stack[-1] if self._stack else None
+        if (
+            top is not None
+            and isinstance(top.container, dict)
+            and top.state
+            in (
+                "key",
+                "comma",
+            )
+        ):
+            self._repair("quoted unquoted keys")
+        else:
+            self._repair("quoted unquoted values")
+        return token
+
+    # Structure building
+
+    def _child_path(self, frame: _Frame) -> str:
+        """Path of the next value inside a frame"""
+        if isinstance(frame.container, list):
+            return f"{frame.path}[{len(frame.container)}]"
+        return f"{frame.path}.{frame.key}"
+
+    def _accept_value_slot(self) -> bool:
+        """Move the top frame to a state that accepts a value"""
+        if not self._stack:
+            return True
+        top = self._stack[-1]
+        if isinstance(top.container, list):
+            if top.state == "comma":
+                self._repair("inserted missing commas")
+                top.state = "value"
+            return True
+        if top.state == "colon":
+            self._repair("inserted missing colons")
+            top.state = "value"
+        return top.state == "value"
+
+    def _value(self, value: Any) -> None:
+        """Handle a completed scalar or container value"""
+        if not self._stack:
+            self._root = value
+            self._done = True
+            return
+
+        top = self._stack[-1]
+        if isinstance(top.container, dict) and top.state in ("key", "comma"):
+            if top.state == "comma":
+                self._repair("inserted missing commas")
+            top.key = value if isinstance(value, str) else json.dumps(value)
+            top.state = "colon"
+            top.after_comma = False
+            return
+
+        if not self._accept_value_slot():
+            self._repair("dropped values without a key")
+            return
+
+        top.after_comma = False
+        if isinstance(top.container, list):
+            top.container.append(value)
+        else:
+            top.container[top.key] = value
+            top.key = None
+        top.state = "comma"
+
+    def _open(self, container) -> None:
+        """Push a new object or array"""
+        if not self._stack:
+            self._stack.append(_Frame(container, "$"))
+            return
+
+        top = self._stack[-1]
+        discard = top.discard
+        if not discard and not self._accept_value_slot():
+            self._repair("dropped values without a key")
+            discard = True
+        path = self._child_path(top) if not discard else top.path
+        self._stack.append(_Frame(container, path, discard=discard))
+
+    def _close(self, bracket: str) -> None:
+        """Pop the top object or array"""
+        if not self._stack:
+            self._repair("ignored unmatched closing brackets")
+            return
+
+        frame = self._stack[-1]
+        expected = "}" if isinstance(frame.container, dict) else "]"
+        if bracket != expected:
+            self._repair("fixed mismatched brackets")
+        if frame.after_comma:
+            self._repair("removed trailing commas")
+        if isinstance(frame.container, dict) and frame.key is not None:
+            self._repair("dropped keys without a value")
+
+        self._stack.pop()
+        if self._stack and self._stack[-1].discard:
+            return
+        if frame.discard:
+            return
+        self._value(frame.container)
+
+    def _colon(self) -> None:
+        """Handle a ':' separator"""
+        top = self._stack[-1] if self._stack else None
+        if top is not None and isinstance(top.container, dict) and top.state == "colon":
+            top.state = "value"
+        else:
+            self._repair("ignored misplaced colons")
+
+    def _comma(self) -> None:
+        """Handle a ',' separator"""
+        top = self._stack[-1] if self._stack else None
+        if top is None or top.state != "comma":
+            self._repair("ignored extra commas")
+            return
+        top.state = "key" if isinstance(top.container, dict) else "value"
+        top.after_comma = True
+
+    def _unwind(self) -> None:
+        """Close structures left open by truncated output"""
+        innermost = self._stack.pop()
+        parent = self._stack[-1] if self._stack else None
+
+        if parent is not None and isinstance(parent.container, list):
+            # An incomplete element of a list (e.g. a half-written itinerary
+            # item) is dropped rather than returned with missing fields
+            self._repair(f"dropped incomplete trailing item at {innermost.path}")
+        else:
+            self._stack.append(innermost)
+
+        while self._stack:
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict) and frame.key is not None:
+                self._repair(f"dropped incomplete key at {frame.path}.{frame.key}")
+                frame.key = None
+            frame.after_comma = False
+            self._repair("closed unterminated structures")
+            self._close("}" if isinstance(frame.container, dict) else "]")
+
+
+def parse_tolerant_json(text: str) -> RepairResult:
+    """
+    Parse possibly malformed or truncated JSON from model output
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        RepairResult: Parsed value, repairs applied and truncation flag
+
+    Raises:
+        ValueError: If the text contains no JSON object or array
+    """
+    parser = TolerantJSONParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,202 @@
+"""
+SQLite-backed key-value cache that survives restarts
+
+For expensive, slow-changing results (e.g. LLM-generated destination
+insights) that should outlive the process. Values are stored as JSON with a
+per-entry expiry; each named cache is a namespace in one shared database.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from ..config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+class PersistentCache:
+    """Namespaced JSON cache in SQLite with per-entry expiry"""
+
+    def __init__(
+        self, name: str, path: Optional[str] = None, default_ttl: float = 86400
+    ):
+        """
+        Initialize the cache (the database is opened lazily)
+
+        Args:
+            name: Namespace used for keys, logs and metrics
+            path: SQLite file (defaults to Config.PERSISTENT_CACHE_PATH)
+            default_ttl: Seconds an entry lives when `set` gets no TTL
+        """
+        self.name = name
+        self.path = path or Config.PERSISTENT_CACHE_PATH
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema (lock must be held)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a live entry
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or `default` if missing, expired or unreadable
+        """
+        try:
+            with self._lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        """
+                        SELECT value FROM cache_entries
+                        WHERE namespace = ? AND key = ? AND expires_at > ?
+                        """,
+                        (self.name, key, time.time()),
+                    )
+                    .fetchone()
+                )
+                self._stats["hits" if row is not None else "misses"] += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache '{self.name}' read failed: {e}")
+            self._stats["errors"] += 1
+            return default
+        return json.loads(row[0]) if row is not None else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store an entry
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            ttl: Seconds until the entry expires (defaults to `default_ttl`)
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)",
+                        (
+                            self.name,
+                            key,
+                            json.dumps(value, ensure_ascii=False),
+                            now,
+                            now + ttl,
+                        ),
+                    )
+                    # Expired rows are dropped as the namespace is written
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                        (self.name, now),
+                    )
+                self._stats["sets"] += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache '{self.name}' write failed: {e}")
+            self._stats["errors"] += 1
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.name, key),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent cache '{self.name}' delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics
+
+        Returns:
+            dict: Hit/miss counters, live entry count and hit rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                stats["size"] = (
+                    self._connect()
+                    .execute(
+                        """
+                        SELECT COUNT(*) FROM cache_entries
+                        WHERE namespace = ? AND expires_at > ?
+                        """,
+                        (self.name, time.time()),
+                    )
+                    .fetchone()[0]
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Persistent cache '{self.name}' stats failed: {e}")
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_caches: Dict[str, PersistentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def persistent_cache(name: str, default_ttl: float = 86400) -> PersistentCache:
+    """
+    Get or create the named persistent cache
+
+    Args:
+        name: Cache name (e.g. "ai.destination_insights")
+        default_ttl: Default entry lifetime in seconds
+
+    Returns:
+        PersistentCache: Shared cache registered under `name`
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = PersistentCache(name, default_ttl=default_ttl)
+            _caches[name] = cache
+        return cache
+
+
+def persistent_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every registered persistent cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
@@ -0,0 +1,405 @@
+"""
+Local spatial index of POIs returned by Amap
+
+POIs from Amap searches are persisted in SQLite along with a record of which
+query they answered ("coverage") and when, with coverage centers bucketed by
+geohash. Nearby
+searches are distance-sorted upstream, so a coverage record proves that all
+matching POIs within its covered radius are known; later searches that fall
+inside a fresh coverage disk are answered locally.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from ..config import Config
+from . import geohash
+from .city_index import haversine_km, parse_location
+
+# Coverage centers are bucketed in ~4.9 km geohash cells
+COVERAGE_GEOHASH_PRECISION = 5
+
+# Bumped when the schema changes; the index is a cache and is rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pois (
+    id TEXT PRIMARY KEY,
+    longitude REAL NOT NULL,
+    latitude REAL NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    id INTEGER PRIMARY KEY,
+    query_key TEXT NOT NULL UNIQUE,
+    keywords TEXT NOT NULL,
+    city TEXT NOT NULL,
+    geohash TEXT,
+    longitude REAL,
+    latitude REAL,
+    covered_radius REAL,
+    total INTEGER NOT NULL,
+    fetched INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_keywords ON coverage (keywords, geohash);
+CREATE TABLE IF NOT EXISTS coverage_pois (
+    coverage_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    poi_id TEXT NOT NULL,
+    PRIMARY KEY (coverage_id, rank)
+);
+"""
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Normalize keywords or a city for use in keys"""
+    return "".join(str(text or "").split()).lower()
+
+
+class PoiIndex:
+    """SQLite-backed POI store with query coverage"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the index (the database is opened lazily)
+
+        Args:
+            path: SQLite file (defaults to Config.POI_INDEX_PATH)
+        """
+        self.path = path or Config.POI_INDEX_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_prune = 0.0
+        self._stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema (lock must be held)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(
+                    """
+                    DROP TABLE IF EXISTS pois;
+                    DROP TABLE IF EXISTS coverage;
+                    DROP TABLE IF EXISTS coverage_pois;
+                    """
+                )
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            logger.info(f"POI index opened at {self.path}")
+        return self._conn
+
+    def search(
+        self,
+        keywords: str,
+        city: Optional[str] = None,
+        location: Optional[str] = None,
+        radius: int = 3000,
+        page: int = 1,
+        limit: int = 20,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Answer a POI search locally if fresh coverage allows it
+
+        Args:
+            keywords: Search keywords
+            city: City the search is limited to (keyword searches)
+            location: Center point (longitude,latitude) for nearby searches
+            radius: Search radius in meters
+            page: Page number
+            limit: Number of results per page
+
+        Returns:
+            dict: `count` and `pois` like an Amap search, or None if the
+            index cannot answer the query
+        """
+        since = time.time() - Config.POI_INDEX_MAX_AGE
+        offset = (max(page, 1) - 1) * limit
+        try:
+            with self._lock:
+                conn = self._connect()
+                if location:
+                    result = self._search_nearby(
+                        conn, keywords, location, radius, offset, limit, since
+                    )
+                else:
+                    result = self._search_ranked(
+                        conn, keywords, city, offset, limit, since
+                    )
+                self._stats["hits" if result is not None else "misses"] += 1
+                return result
+        except sqlite3.Error as e:
+            logger.warning(f"POI index lookup failed: {e}")
+            return None
+
+    def _search_nearby(
+        self,
+        conn: sqlite3.Connection,
+        keywords: str,
+        location: str,
+        radius: float,
+        offset: int,
+        limit: int,
+        since: float,
+    ) -> Optional[Dict[str, Any]]:
+        """Answer a radius search from a coverage disk that contains it"""
+        center = parse_location(location)
+        if center is None:
+            return None
+        lng, lat = center
+        cell = geohash.encode(lat, lng, COVERAGE_GEOHASH_PRECISION)
+        cells = [cell] + geohash.neighbors(cell)
+        rows = conn.execute(
+            f"""
+            SELECT id, longitude, latitude, covered_radius FROM coverage
+            WHERE keywords = ? AND fetched_at >= ?
+              AND geohash IN ({",".join("?" * len(cells))})
+            ORDER BY fetched_at DESC
+            """,
+            [_normalize(keywords), since, *cells],
+        ).fetchall()
+
+        for coverage_id, cov_lng, cov_lat, covered_radius in rows:
+            # Meters between the two centers. Only a query disk that lies
+            # inside the covered disk has a known total count; partial
+            # coverage would undercount and stop clients paginating early
+            offset_m = haversine_km(lng, lat, cov_lng, cov_lat) * 1000
+            if offset_m + radius > covered_radius:
+                continue
+
+            matches = []
+            for data, poi_lng, poi_lat in conn.execute(
+                """
+                SELECT p.data, p.longitude, p.latitude FROM coverage_pois c
+                JOIN pois p ON p.id = c.poi_id WHERE c.coverage_id = ?
+                """,
+                (coverage_id,),
+            ):
+                distance = haversine_km(lng, lat, poi_lng, poi_lat) * 1000
+                if distance <= radius:
+                    matches.append((distance, data))
+            matches.sort(key=lambda match: match[0])
+
+            pois = []
+            for distance, data in matches[offset : offset + limit]:
+                poi = json.loads(data)
+                poi["distance"] = str(int(round(distance)))
+                pois.append(poi)
+            return {"count": len(matches), "pois": pois}
+        return None
+
+    def _search_ranked(
+        self,
+        conn: sqlite3.Connection,
+        keywords: str,
+        city: Optional[str],
+        offset: int,
+        limit: int,
+        since: float,
+    ) -> Optional[Dict[str, Any]]:
+        """Answer a keyword search from the ranked results of the same query"""
+        row = conn.execute(
+            """
+            SELECT id, total, fetched FROM coverage
+            WHERE query_key = ? AND fetched_at >= ?
+            """,
+            (self._query_key(keywords, city), since),
+        ).fetchone()
+        if row is None:
+            return None
+        coverage_id, total, fetched = row
+        if offset + limit > fetched and fetched < total:
+            return None
+
+        rows = conn.execute(
+            """
+            SELECT p.data FROM coverage_pois c JOIN pois p ON p.id = c.poi_id
+            WHERE c.coverage_id = ? AND c.rank >= ? ORDER BY c.rank LIMIT ?
+            """,
+            (coverage_id, offset, limit),
+        ).fetchall()
+        return {"count": total, "pois": [json.loads(data) for (data,) in rows]}
+
+    def store(
+        self,
+        keywords: str,
+        pois: List[Dict[str, Any]],
+        total: int,
+        city: Optional[str] = None,
+        location: Optional[str] = None,
+        radius: int = 3000,
+    ) -> None:
+        """
+        Backfill POIs and coverage from a first-page Amap search
+
+        Args:
+            keywords: Search keywords
+            pois: POIs in upstream order (nearest first for nearby searches)
+            total: Total matches reported upstream
+            city: City the search was limited to
+            location: Center point of a nearby search
+            radius: Radius of a nearby search in meters
+        """
+        now = time.time()
+        center = parse_location(location) if location else None
+        if location and center is None:
+            return
+
+        rows: List[Tuple[str, float, float, str, float]] = []
+        ranked_ids = []
+        for poi in pois:
+            point = parse_location(poi.get("location", ""))
+            if not poi.get("id") or point is None:
+                continue
+            poi_lng, poi_lat = point
+            data = {key: value for key, value in poi.items() if key != "distance"}
+            rows.append(
+                (
+                    poi["id"],
+                    poi_lng,
+                    poi_lat,
+                    json.dumps(data, ensure_ascii=False),
+                    now,
+                )
+            )
+            ranked_ids.append(poi["id"])
+
+        if center is not None:
+            lng, lat = center
+            cell = geohash.encode(lat, lng, COVERAGE_GEOHASH_PRECISION)
+            # A full page proves completeness only up to the farthest result
+            if total <= len(pois) or not rows:
+                covered_radius = float(radius)
+            else:
+                covered_radius = max(
+                    haversine_km(lng, lat, row[1], row[2]) * 1000 for row in rows
+                )
+            query_key = self._query_key(keywords, None, location, radius)
+        else:
+            lng = lat = cell = covered_radius = None
+            query_key = self._query_key(keywords, city)
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT OR REPLACE INTO pois
+                            (id, longitude, latitude, data, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        rows,
+                    )
+                    old = conn.execute(
+                        "SELECT id FROM coverage WHERE query_key = ?", (query_key,)
+                    ).fetchone()
+                    if old is not None:
+                        conn.execute("DELETE FROM coverage WHERE id = ?", old)
+                        conn.execute(
+                            "DELETE FROM coverage_pois WHERE coverage_id = ?", old
+                        )
+                    coverage_id = conn.execute(
+                        """
+                        INSERT INTO coverage (query_key, keywords, city, geohash,
+                            longitude, latitude, covered_radius, total, fetched,
+                            fetched_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            query_key,
+                            _normalize(keywords),
+                            _normalize(city),
+                            cell,
+                            lng,
+                            lat,
+                            covered_radius,
+                            total,
+                            len(pois),
+                            now,
+                        ),
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT INTO coverage_pois VALUES (?, ?, ?)",
+                        [
+                            (coverage_id, rank, poi_id)
+                            for rank, poi_id in enumerate(ranked_ids)
+                        ],
+                    )
+                self._stats["stored"] += len(rows)
+                if now - self._last_prune >= Config.POI_INDEX_PRUNE_INTERVAL:
+                    self._prune(conn, now - Config.POI_INDEX_MAX_AGE)
+                    self._last_prune = now
+        except sqlite3.Error as e:
+            logger.warning(f"POI index backfill failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection, before: float) -> None:
+        """Drop expired coverage and POIs no coverage refers to (lock held)"""
+        with conn:
+            conn.execute(
+                """
+                DELETE FROM coverage_pois WHERE coverage_id IN
+                    (SELECT id FROM coverage WHERE fetched_at < ?)
+                """,
+                (before,),
+            )
+            conn.execute("DELETE FROM coverage WHERE fetched_at < ?", (before,))
+            deleted = conn.execute(
+                """
+                DELETE FROM pois WHERE updated_at < ?
+                  AND id NOT IN (SELECT poi_id FROM coverage_pois)
+                """,
+                (before,),
+            ).rowcount
+        if deleted:
+            logger.info(f"POI index pruned {deleted} stale POIs")
+
+    @staticmethod
+    def _query_key(
+        keywords: str,
+        city: Optional[str],
+        location: Optional[str] = None,
+        radius: Optional[int] = None,
+    ) -> str:
+        """Identity of a search for replacing its coverage"""
+        if location:
+            return f"near|{_normalize(keywords)}|{location}|{radius}"
+        return f"text|{_normalize(keywords)}|{_normalize(city)}"
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get index metrics
+
+        Returns:
+            dict: Lookup counters, hit rate and row counts
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                conn = self._connect()
+                stats["pois"] = conn.execute("SELECT COUNT(*) FROM pois").fetchone()[0]
+                stats["coverage"] = conn.execute(
+                    "SELECT COUNT(*) FROM coverage"
+                ).fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning(f"POI index stats failed: {e}")
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# Singleton instance
+poi_index = PoiIndex()
@@ -0,0 +1,260 @@
+"""
+Per-user and per-IP limits on LLM-backed endpoints
+
+Each caller (the authenticated user, or the client IP for anonymous
+requests) gets a request rate limit and a daily LLM token quota. Counters
+live in SQLite, so every worker process on the host shares them; daily
+token usage comes from the usage meter's rollups. Rejected requests get a
+429 with `Retry-After`, and every response carries the remaining quota.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import NamedTuple, Optional, Tuple
+
+from flask import jsonify, make_response, request
+from loguru import logger
+
+from ..config import Config
+from .usage_meter import usage_meter, usage_scope
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_counters (
+    key TEXT NOT NULL,
+    window_start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, window_start)
+);
+"""
+
+
+class RateLimitStatus(NamedTuple):
+    """Outcome of counting one request against a fixed window"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int
+
+
+class QuotaStore:
+    """Fixed-window request counters in SQLite, shared across workers"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the store (the database is opened lazily)
+
+        Args:
+            path: SQLite file (defaults to Config.QUOTA_DB_PATH)
+        """
+        self.path = path or Config.QUOTA_DB_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pruned_window = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema (lock must be held)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def hit(self, key: str, limit: int, window: int) -> RateLimitStatus:
+        """
+        Count a request and check it against the limit
+
+        Args:
+            key: Counter key (e.g. "llm:<user id>" or "llm:ip:<address>")
+            limit: Requests allowed per window (0 disables the limit)
+            window: Window length in seconds
+
+        Returns:
+            RateLimitStatus: Whether the request is allowed and what remains
+        """
+        now = time.time()
+        window_start = int(now // window) * window
+        reset_after = max(1, int(window_start + window - now + 0.999))
+        if limit <= 0:
+            return RateLimitStatus(True, 0, 0, reset_after)
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                # The write lock makes increment-and-read atomic across workers
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        """
+                        INSERT INTO rate_counters VALUES (?, ?, 1)
+                        ON CONFLICT (key, window_start) DO UPDATE SET count = count + 1
+                        """,
+                        (key, window_start),
+                    )
+                    count = conn.execute(
+                        """
+                        SELECT count FROM rate_counters
+                        WHERE key = ? AND window_start = ?
+                        """,
+                        (key, window_start),
+                    ).fetchone()[0]
+                    if window_start != self._pruned_window:
+                        conn.execute(
+                            "DELETE FROM rate_counters WHERE window_start < ?",
+                            (window_start - window,),
+                        )
+                        self._pruned_window = window_start
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            # Fail open: a broken counter store must not take the API down
+            logger.warning(f"Quota counter update failed: {e}")
+            return RateLimitStatus(True, limit, limit, reset_after)
+
+        return RateLimitStatus(
+            count <= limit, limit, max(0, limit - count), reset_after
+        )
+
+
+def client_ip() -> str:
+    """
+    Get the client IP
+
+    Behind Config.QUOTA_TRUSTED_PROXIES proxies, this is the
+    X-Forwarded-For entry appended by the outermost trusted proxy. Entries
+    to its left are supplied by the client and can be forged.
+    """
+    hops = Config.QUOTA_TRUSTED_PROXIES
+    if hops > 0:
+        forwarded = [
+            entry.strip()
+            for entry in request.headers.get("X-Forwarded-For", "").split(",")
+            if entry.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or "unknown"
+
+
+def check_quota_config() -> None:
+    """Warn about quota settings that cannot be enforced"""
+    daily_tokens = Config.LLM_USER_DAILY_TOKENS or Config.LLM_IP_DAILY_TOKENS
+    if Config.LLM_QUOTA_ENABLED and daily_tokens and not Config.USAGE_METERING_ENABLED:
+        logger.warning(
+            "Daily LLM token quotas are configured but usage metering is "
+            "disabled (USAGE_METERING_ENABLED=0); token quotas will not be enforced"
+        )
+
+
+def caller_identity(current_user: Optional[dict]) -> str:
+    """
+    Identity that quotas are counted against
+
+    Args:
+        current_user: Authenticated user, or None
+
+    Returns:
+        str: User ID, or "ip:<client address>" for anonymous callers
+    """
+    if current_user:
+        return current_user["id"]
+    return f"ip:{client_ip()}"
+
+
+def _caller(current_user: Optional[dict]) -> Tuple[str, int, int]:
+    """Billing identity, per-minute request limit and daily token quota"""
+    if current_user:
+        return (
+            caller_identity(current_user),
+            Config.LLM_USER_REQUESTS_PER_MINUTE,
+            Config.LLM_USER_DAILY_TOKENS,
+        )
+    return (
+        caller_identity(current_user),
+        Config.LLM_IP_REQUESTS_PER_MINUTE,
+        Config.LLM_IP_DAILY_TOKENS,
+    )
+
+
+def _day_start() -> Tuple[float, int]:
+    """Start of the current quota day and seconds until the next one"""
+    now = datetime.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds_left = int((start + timedelta(days=1) - now).total_seconds()) + 1
+    return start.timestamp(), seconds_left
+
+
+def llm_quota(f):
+    """
+    Decorator enforcing per-caller rate limits and daily LLM token quotas
+
+    Wrap it with `require_auth` or `optional_auth`, which supply
+    `current_user`; anonymous callers are limited by client IP. LLM usage
+    inside the view is billed to the same identity.
+
+    Usage:
+        expense_api.route("/voice-parse", methods=["POST"])(
+            optional_auth(llm_quota(parse_voice_expense))
+        )
+    """
+
+    @wraps(f)
+    def decorated_function(*args, current_user=None, **kwargs):
+        if not Config.LLM_QUOTA_ENABLED:
+            return f(*args, current_user=current_user, **kwargs)
+
+        identity, requests_per_minute, daily_tokens = _caller(current_user)
+        rate = quota_store.hit(f"llm:{identity}", requests_per_minute, 60)
+        day_start, day_left = _day_start()
+
+        def used_tokens() -> int:
+            return usage_meter.tokens_since(identity, day_start) if daily_tokens else 0
+
+        def quota_headers(response, tokens_used: int):
+            if rate.limit:
+                response.headers["X-RateLimit-Limit"] = str(rate.limit)
+                response.headers["X-RateLimit-Remaining"] = str(rate.remaining)
+                response.headers["X-RateLimit-Reset"] = str(rate.reset_after)
+            if daily_tokens:
+                response.headers["X-Token-Quota-Limit"] = str(daily_tokens)
+                response.headers["X-Token-Quota-Remaining"] = str(
+                    max(0, daily_tokens - tokens_used)
+                )
+                response.headers["X-Token-Quota-Reset"] = str(day_left)
+            return response
+
+        def rejected(error: str, retry_after: int, tokens_used: int):
+            logger.warning(f"LLM quota exceeded for {identity}: {error}")
+            response = make_response(jsonify({"success": False, "error": error}), 429)
+            response.headers["Retry-After"] = str(retry_after)
+            return quota_headers(response, tokens_used)
+
+        tokens_used = used_tokens()
+        if not rate.allowed:
+            return rejected(
+                "Too many requests, please retry later", rate.reset_after, tokens_used
+            )
+        if daily_tokens and tokens_used >= daily_tokens:
+            return rejected("Daily AI usage quota exceeded", day_left, tokens_used)
+
+        with usage_scope(user_id=identity):
+            response = make_response(f(*args, current_user=current_user, **kwargs))
+        return quota_headers(response, used_tokens())
+
+    return decorated_function
+
+
+# Singleton instance
+quota_store = QuotaStore()
@@ -0,0 +1,246 @@
+"""
+Client-side token-bucket rate limiting for upstream APIs
+
+Each upstream (and API key) gets a bucket refilled at its configured QPS.
+Callers wait for a token instead of bursting into upstream QPS errors;
+waiting callers are served by priority class, so interactive requests go
+ahead of background work such as enrichment and prefetch.
+"""
+
+import contextvars
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+
+class Priority(IntEnum):
+    """Upstream call priority classes (lower is served first)"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no upstream token became available in time"""
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "upstream_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    """Get the priority of upstream calls made in the current context"""
+    return _current_priority.get()
+
+
+@contextmanager
+def upstream_priority(priority: Priority) -> Iterator[None]:
+    """
+    Run upstream calls in this block with the given priority
+
+    Usage:
+        with upstream_priority(Priority.BACKGROUND):
+            map_service.search_poi(...)
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class TokenBucket:
+    """Token bucket with a priority-ordered wait queue"""
+
+    def __init__(
+        self,
+        name: str,
+        qps: float,
+        burst: Optional[float] = None,
+        max_wait: float = 2.0,
+        background_wait: float = 10.0,
+    ):
+        """
+        Initialize a bucket
+
+        Args:
+            name: Bucket name used in logs and metrics
+            qps: Sustained requests per second
+            burst: Bucket capacity (defaults to `qps`, at least 1)
+            max_wait: Default seconds an interactive caller waits for a token
+            background_wait: Default seconds a background caller waits
+        """
+        self.name = name
+        self.rate = float(qps)
+        self.capacity = max(1.0, float(burst if burst is not None else qps))
+        self.max_wait = max_wait
+        self.background_wait = background_wait
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # No tokens are handed out before this time (after upstream throttling)
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._stats = {"acquired": 0, "waited": 0, "rejected": 0, "throttled": 0}
+
+    def _refill(self, now: float) -> None:
+        """Add tokens for the time elapsed since the last refill"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(
+        self, priority: Optional[Priority] = None, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Take a token, waiting behind higher-priority callers if needed
+
+        Args:
+            priority: Caller priority (defaults to the context priority)
+            timeout: Max seconds to wait (defaults to `max_wait`, or
+                `background_wait` for background callers)
+
+        Returns:
+            bool: True if a token was taken, False on timeout
+        """
+        if self.rate <= 0:
+            return True
+
+        priority = current_priority() if priority is None else priority
+        if timeout is None:
+            timeout = (
+                self.background_wait
+                if priority >= Priority.BACKGROUND
+                else self.max_wait
+            )
+        deadline = time.monotonic() + timeout
+        ticket = (int(priority), next(self._sequence))
+        waited = False
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_head = self._waiters[0] == ticket
+                    if is_head and self._tokens >= 1 and now >= self._paused_until:
+                        self._tokens -= 1
+                        self._stats["acquired"] += 1
+                        self._stats["waited"] += waited
+                        return True
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats["rejected"] += 1
+                        logger.warning(
+                            f"Rate limiter '{self.name}' gave up after {timeout}s "
+                            f"(priority {priority.name})"
+                        )
+                        return False
+
+                    waited = True
+                    if is_head:
+                        # Sleep until the next token is due
+                        next_token = max(
+                            (1 - self._tokens) / self.rate, self._paused_until - now
+                        )
+                        self._cond.wait(min(remaining, max(next_token, 0.001)))
+                    else:
+                        self._cond.wait(remaining)
+            finally:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def throttle(self, seconds: float) -> None:
+        """
+        Back off after the upstream reported a QPS error
+
+        Drains the bucket and pauses token issue for `seconds`.
+
+        Args:
+            seconds: Pause length
+        """
+        with self._cond:
+            self._tokens = 0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stats["throttled"] += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get limiter metrics
+
+        Returns:
+            dict: Acquire counters, queue length and configuration
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._waiters)
+        stats["qps"] = self.rate
+        stats["burst"] = self.capacity
+        return stats
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def rate_limiter(
+    upstream: str,
+    api_key: Optional[str] = None,
+    qps: float = 0,
+    burst: Optional[float] = None,
+    max_wait: float = 2.0,
+    background_wait: float = 10.0,
+) -> TokenBucket:
+    """
+    Get or create the shared bucket for an upstream and API key
+
+    Args:
+        upstream: Upstream name (e.g. "amap", "deepseek")
+        api_key: API key; each key has its own quota upstream
+        qps: Requests per second (0 disables limiting)
+        burst: Bucket capacity
+        max_wait: Default seconds an interactive caller waits for a token
+        background_wait: Default seconds a background caller waits
+
+    Returns:
+        TokenBucket: Shared bucket
+    """
+    name = upstream
+    if api_key:
+        # Keys are fingerprinted so they never appear in logs or metrics
+        name += ":" + hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:8]
+
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = TokenBucket(
+                name,
+                qps,
+                burst=burst,
+                max_wait=max_wait,
+                background_wait=background_wait,
+            )
+            _buckets[name] = bucket
+        return bucket
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every registered bucket"""
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    return {bucket.name: bucket.stats() for bucket in buckets}
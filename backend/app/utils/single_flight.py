@@ -0,0 +1,197 @@
+"""
+Single-flight coalescing of identical concurrent upstream calls
+
+Concurrent callers that share the same normalized key wait on one in-flight
+call and receive its result. Nothing is cached once the call finishes.
+"""
+
+import copy
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from loguru import logger
+
+
+def normalize_key(*parts: Any) -> str:
+    """
+    Build a normalized coalescing key from call arguments
+
+    Strings are stripped, lower-cased and whitespace-collapsed, floats are
+    rounded so that `3000` and `3000.0` map to the same key.
+
+    Args:
+        *parts: Call arguments that identify the upstream request
+
+    Returns:
+        str: Stable key for the call
+    """
+
+    def _normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return " ".join(value.split()).lower()
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return round(float(value), 6)
+        if isinstance(value, dict):
+            return {str(k): _normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [_normalize(v) for v in value]
+        return str(value)
+
+    return json.dumps(
+        [_normalize(part) for part in parts], ensure_ascii=False, sort_keys=True
+    )
+
+
+class _Call:
+    """An in-flight call shared by a leader and its followers"""
+
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(
+        self, name: str, enabled: bool = True, wait_timeout: Optional[float] = None
+    ):
+        """
+        Initialize a single-flight group for one call site
+
+        Args:
+            name: Call site name used in logs and metrics
+            enabled: Whether coalescing is active for this call site
+            wait_timeout: Max seconds a follower waits before calling upstream
+                itself (None waits for the leader indefinitely)
+        """
+        self.name = name
+        self.enabled = enabled
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "timeouts": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn` once for all concurrent callers sharing `key`
+
+        Args:
+            key: Normalized call key (see `normalize_key`)
+            fn: Upstream call to execute
+            *args: Positional arguments for `fn`
+            **kwargs: Keyword arguments for `fn`
+
+        Returns:
+            The result of `fn`; followers receive a deep copy so callers can
+            mutate their result independently
+        """
+        if not self.enabled:
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["executions"] += 1
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+
+        if leader:
+            return self._lead(key, call, fn, *args, **kwargs)
+
+        logger.debug(f"Single-flight '{self.name}' coalesced call for key {key}")
+        if not call.event.wait(self.wait_timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            logger.warning(
+                f"Single-flight '{self.name}' leader exceeded {self.wait_timeout}s, "
+                "calling upstream directly"
+            )
+            return fn(*args, **kwargs)
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def _lead(
+        self, key: Hashable, call: _Call, fn: Callable[..., Any], *args, **kwargs
+    ):
+        """Execute the upstream call on behalf of all waiters"""
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                shared = call.waiters > 0
+            call.event.set()
+
+        # Followers copy the stored result, so the leader must not hand out
+        # the same object if anyone else is reading it
+        return copy.deepcopy(call.result) if shared else call.result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing metrics for this call site
+
+        Returns:
+            dict: Call counters, in-flight keys and coalescing rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["enabled"] = self.enabled
+        stats["coalescing_rate"] = (
+            stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        )
+        return stats
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def single_flight_group(
+    name: str, enabled: bool = True, wait_timeout: Optional[float] = None
+) -> SingleFlight:
+    """
+    Get or create the single-flight group for a call site
+
+    Args:
+        name: Call site name (e.g. "map.geocode")
+        enabled: Whether coalescing is active for this call site
+        wait_timeout: Max seconds a follower waits for the leader
+
+    Returns:
+        SingleFlight: Shared group registered under `name`
+    """
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = SingleFlight(name, enabled=enabled, wait_timeout=wait_timeout)
+            _groups[name] = group
+        return group
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Get coalescing metrics for every registered call site"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,161 @@
+"""
+Thread-safe in-process cache with per-entry expiry
+
+Entries expire after a TTL chosen per `set` call (e.g. until an upstream's
+next refresh time) and the least recently used entry is evicted when the
+cache is full. Expired entries remain readable as stale fallbacks until
+they are evicted.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries expire individually"""
+
+    def __init__(self, name: str, maxsize: int = 1024, default_ttl: float = 300):
+        """
+        Initialize the cache
+
+        Args:
+            name: Cache name used in logs and metrics
+            maxsize: Maximum number of entries before LRU eviction
+            default_ttl: Seconds an entry lives when `set` gets no TTL
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a live entry
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or `default` if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+            return default
+
+    def get_stale(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get an entry even if it has expired
+
+        Expired entries stay until they are replaced or evicted, so callers
+        can fall back to the last known value while an upstream is down.
+
+        Args:
+            key: Cache key
+            default: Value returned if the key was never cached or evicted
+
+        Returns:
+            The cached value, or `default`
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store an entry
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Seconds until the entry expires (defaults to `default_ttl`)
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            self._stats["sets"] += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def ttl(self, key: Hashable) -> Optional[float]:
+        """Get the remaining lifetime of an entry in seconds, if live"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry[0] - time.monotonic()
+        return remaining if remaining > 0 else None
+
+    def delete(self, key: Hashable) -> None:
+        """Remove an entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics
+
+        Returns:
+            dict: Hit/miss counters, size and hit rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["maxsize"] = self.maxsize
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def ttl_cache(name: str, maxsize: int = 1024, default_ttl: float = 300) -> TTLCache:
+    """
+    Get or create the named cache
+
+    Args:
+        name: Cache name (e.g. "map.forecast")
+        maxsize: Maximum number of entries
+        default_ttl: Default entry lifetime in seconds
+
+    Returns:
+        TTLCache: Shared cache registered under `name`
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = TTLCache(name, maxsize=maxsize, default_ttl=default_ttl)
+            _caches[name] = cache
+        return cache
+
+
+def ttl_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get metrics for every registered cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
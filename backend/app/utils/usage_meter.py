@@ -0,0 +1,333 @@
+"""
+LLM token usage and cost metering
+
+Every LLM call is attributed to the user and endpoint of the request that
+made it (carried in a context variable, so pool threads inherit it when
+run with `contextvars.copy_context()`). Calls are aggregated into hourly
+rollups in SQLite instead of one row per call, which keeps the store small
+while still answering per-user, per-endpoint and per-task questions.
+"""
+
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from flask import Flask, g, request
+from loguru import logger
+
+from ..config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    hour INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    task TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms INTEGER NOT NULL DEFAULT 0,
+    max_latency_ms INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, user_id, endpoint, task, model)
+);
+CREATE INDEX IF NOT EXISTS llm_usage_user ON llm_usage (user_id, hour);
+"""
+
+# Grouping columns accepted by UsageMeter.summary
+GROUP_COLUMNS = ("user_id", "endpoint", "task", "model")
+
+# Recorded when a call has no authenticated user or request endpoint
+ANONYMOUS = "anonymous"
+NO_ENDPOINT = "background"
+
+
+class UsageContext(NamedTuple):
+    """Who and what an LLM call is billed to"""
+
+    user_id: Optional[str] = None
+    endpoint: Optional[str] = None
+
+
+_usage_context: contextvars.ContextVar[UsageContext] = contextvars.ContextVar(
+    "usage_context", default=UsageContext()
+)
+
+
+def usage_context() -> UsageContext:
+    """Get the billing context of the current request or task"""
+    return _usage_context.get()
+
+
+def set_usage_user(user_id: Optional[str]) -> None:
+    """Attribute LLM calls in the current context to a user"""
+    _usage_context.set(usage_context()._replace(user_id=user_id))
+
+
+@contextmanager
+def usage_scope(
+    user_id: Optional[str] = None, endpoint: Optional[str] = None
+) -> Iterator[None]:
+    """
+    Attribute LLM calls in this block to a user and/or endpoint
+
+    Usage:
+        with usage_scope(endpoint="insights_warmup"):
+            ai_service.get_destination_insights("杭州")
+    """
+    current = usage_context()
+    token = _usage_context.set(
+        UsageContext(
+            user_id=user_id if user_id is not None else current.user_id,
+            endpoint=endpoint if endpoint is not None else current.endpoint,
+        )
+    )
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the cost of a call in CNY
+
+    Args:
+        model: Model name
+        prompt_tokens: Input tokens
+        completion_tokens: Output tokens
+
+    Returns:
+        float: Cost from Config.LLM_PRICES (0 for unpriced models)
+    """
+    prompt_price, completion_price = Config.LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+class UsageMeter:
+    """Hourly LLM usage rollups in SQLite"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the meter (the database is opened lazily)
+
+        Args:
+            path: SQLite file (defaults to Config.USAGE_DB_PATH)
+        """
+        self.path = path or Config.USAGE_DB_PATH
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pruned_hour = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema (lock must be held)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several workers may write: wait on their locks instead of failing
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(
+        self,
+        task: str,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float = 0.0,
+        success: bool = True,
+    ) -> None:
+        """
+        Add one LLM call to its hourly rollup
+
+        Args:
+            task: LLM task profile (e.g. "itinerary")
+            model: Model that served the call
+            prompt_tokens: Input tokens
+            completion_tokens: Output tokens
+            latency: Call duration in seconds
+            success: False if the call raised
+        """
+        if not Config.USAGE_METERING_ENABLED:
+            return
+
+        context = usage_context()
+        hour = int(time.time() // 3600)
+        latency_ms = int(latency * 1000)
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        """
+                        INSERT INTO llm_usage VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?)
+                        ON CONFLICT (hour, user_id, endpoint, task, model) DO UPDATE SET
+                            calls = calls + 1,
+                            errors = errors + excluded.errors,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            completion_tokens =
+                                completion_tokens + excluded.completion_tokens,
+                            latency_ms = latency_ms + excluded.latency_ms,
+                            max_latency_ms =
+                                MAX(max_latency_ms, excluded.max_latency_ms)
+                        """,
+                        (
+                            hour,
+                            context.user_id or ANONYMOUS,
+                            context.endpoint or NO_ENDPOINT,
+                            task,
+                            model,
+                            0 if success else 1,
+                            prompt_tokens,
+                            completion_tokens,
+                            latency_ms,
+                            latency_ms,
+                        ),
+                    )
+                if hour != self._pruned_hour:
+                    self._prune(conn, hour - Config.USAGE_RETENTION_DAYS * 24)
+                    self._pruned_hour = hour
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record LLM usage: {e}")
+
+    def _prune(self, conn: sqlite3.Connection, before_hour: int) -> None:
+        """Drop rollups past the retention period (lock must be held)"""
+        with conn:
+            conn.execute("DELETE FROM llm_usage WHERE hour < ?", (before_hour,))
+
+    def summary(
+        self, group_by: str, since: float, user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate usage and cost since a point in time
+
+        Args:
+            group_by: One of GROUP_COLUMNS
+            since: Unix timestamp (rounded down to the hour)
+            user_id: Only include this user's calls
+
+        Returns:
+            list: One entry per group, most expensive first
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group usage by {group_by}")
+
+        query = f"""
+            SELECT {group_by}, model, SUM(calls), SUM(errors), SUM(prompt_tokens),
+                SUM(completion_tokens), SUM(latency_ms), MAX(max_latency_ms)
+            FROM llm_usage WHERE hour >= ?
+        """
+        params: List[Any] = [int(since // 3600)]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        query += f" GROUP BY {group_by}, model"
+
+        try:
+            with self._lock:
+                rows = self._connect().execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM usage: {e}")
+            return []
+
+        # Costs are priced per model, then summed per group
+        groups: Dict[str, Dict[str, Any]] = {}
+        for key, model, calls, errors, prompt, completion, latency, peak in rows:
+            group = groups.setdefault(
+                key,
+                {
+                    group_by: key,
+                    "calls": 0,
+                    "errors": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost": 0.0,
+                    "latency_ms": 0,
+                    "max_latency_ms": 0,
+                },
+            )
+            group["calls"] += calls
+            group["errors"] += errors
+            group["prompt_tokens"] += prompt
+            group["completion_tokens"] += completion
+            group["cost"] += llm_cost(model, prompt, completion)
+            group["latency_ms"] += latency
+            group["max_latency_ms"] = max(group["max_latency_ms"], peak)
+
+        summary = []
+        for group in groups.values():
+            group["total_tokens"] = group["prompt_tokens"] + group["completion_tokens"]
+            group["avg_latency_ms"] = round(group.pop("latency_ms") / group["calls"])
+            group["cost"] = round(group["cost"], 4)
+            summary.append(group)
+        summary.sort(
+            key=lambda group: (group["cost"], group["total_tokens"]), reverse=True
+        )
+        return summary
+
+    def tokens_since(self, user_id: str, since: float) -> int:
+        """
+        Get a user's total tokens since a point in time
+
+        Args:
+            user_id: User ID (or another billing identity)
+            since: Unix timestamp (rounded down to the hour)
+
+        Returns:
+            int: Prompt plus completion tokens
+        """
+        try:
+            with self._lock:
+                row = (
+                    self._connect()
+                    .execute(
+                        """
+                        SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)
+                        FROM llm_usage WHERE user_id = ? AND hour >= ?
+                        """,
+                        (user_id, int(since // 3600)),
+                    )
+                    .fetchone()
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read LLM usage: {e}")
+            return 0
+        return row[0]
+
+
+def init_usage_metering(app: Flask) -> None:
+    """
+    Attribute LLM calls made while handling a request to its endpoint
+
+    The auth decorators add the user once the token is verified.
+
+    Args:
+        app: Flask application
+    """
+
+    @app.before_request
+    def _start_usage_context():
+        g.usage_token = _usage_context.set(UsageContext(endpoint=request.endpoint))
+
+    @app.teardown_request
+    def _end_usage_context(exc):
+        token = g.pop("usage_token", None)
+        if token is not None:
+            try:
+                _usage_context.reset(token)
+            except ValueError:
+                # Torn down in a different context than it was set in
+                pass
+
+
+# Singleton instance
+usage_meter = UsageMeter()
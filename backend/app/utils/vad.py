@@ -0,0 +1,297 @@
+"""
+Energy-based voice activity detection
+
+Splits audio into short frames, estimates the noise floor from the quietest
+frames (capped, so speech that fills a recording cannot raise it) and marks
+frames sufficiently louder than it as speech. Used to trim
+leading and trailing silence before speech recognition and to reject
+recordings that contain no speech at all, and incrementally on streamed
+audio to detect when the speaker has stopped.
+"""
+
+import math
+from typing import List, NamedTuple, Optional
+
+from pydub import AudioSegment
+
+# dBFS assigned to digitally silent frames (log of zero)
+SILENCE_DBFS = -100.0
+
+# Highest noise floor estimate accepted; louder "quiet" frames are speech
+MAX_NOISE_FLOOR_DBFS = -40.0
+
+# Part of cached recognition keys; bump when detection changes its verdicts
+VAD_VERSION = 2
+
+
+class SpeechRegion(NamedTuple):
+    """Result of voice activity detection"""
+
+    start_ms: int
+    end_ms: int
+    speech_ms: int
+    duration_ms: int
+    noise_floor_dbfs: float
+    threshold_dbfs: float
+
+    @property
+    def has_speech(self) -> bool:
+        """Whether any speech was found"""
+        return self.speech_ms > 0
+
+
+def frame_levels(audio: AudioSegment, frame_ms: int) -> List[float]:
+    """
+    Get the RMS level of each frame in dBFS
+
+    Args:
+        audio: Audio to analyze
+        frame_ms: Frame length in milliseconds
+
+    Returns:
+        list: One level per full or trailing partial frame
+    """
+    levels = []
+    for start in range(0, len(audio), frame_ms):
+        rms = audio[start : start + frame_ms].rms
+        levels.append(
+            20 * math.log10(rms / audio.max_possible_amplitude) if rms else SILENCE_DBFS
+        )
+    return levels
+
+
+def level_percentile(levels: List[float], fraction: float) -> float:
+    """
+    Get the frame level below which `fraction` of the frames lie
+
+    Args:
+        levels: Frame levels in dBFS (non-empty)
+        fraction: Fraction between 0 and 1
+
+    Returns:
+        float: Level in dBFS
+    """
+    ordered = sorted(levels)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def detect_speech(
+    audio: AudioSegment,
+    frame_ms: int = 30,
+    margin_db: float = 10.0,
+    min_threshold_dbfs: float = -55.0,
+    min_run_ms: int = 90,
+    padding_ms: int = 200,
+    noise_percentile: float = 0.1,
+    max_noise_floor_dbfs: float = MAX_NOISE_FLOOR_DBFS,
+) -> SpeechRegion:
+    """
+    Find the region of a recording that contains speech
+
+    The noise floor is a low percentile of frame levels, so it is estimated
+    from the pauses in the recording itself rather than from a lead-in that
+    may already contain speech. When the levels are too even to separate
+    speech from noise (speech throughout, or steady noise), audio above
+    `min_threshold_dbfs` is kept whole rather than rejected.
+
+    Args:
+        audio: Audio to analyze
+        frame_ms: Frame length in milliseconds
+        margin_db: How far above the noise floor a frame must be to count
+            as speech
+        min_threshold_dbfs: Lowest allowed speech threshold, so digital
+            silence never counts as speech
+        min_run_ms: Shortest run of loud frames kept (drops clicks and pops)
+        padding_ms: Audio kept before the first and after the last speech
+            frame, so word onsets and endings are not clipped
+        noise_percentile: Fraction of frames assumed to be background noise
+        max_noise_floor_dbfs: Cap on the noise floor estimate
+
+    Returns:
+        SpeechRegion: Speech bounds (zero-length if there is no speech)
+    """
+    duration_ms = len(audio)
+    levels = frame_levels(audio, frame_ms)
+    if not levels:
+        return SpeechRegion(0, 0, 0, duration_ms, SILENCE_DBFS, min_threshold_dbfs)
+
+    quiet = level_percentile(levels, noise_percentile)
+    floor = min(quiet, max_noise_floor_dbfs)
+    threshold = max(floor + margin_db, min_threshold_dbfs)
+
+    median = level_percentile(levels, 0.5)
+    if median - quiet < margin_db and median >= min_threshold_dbfs:
+        # No quiet frames to learn the noise from: keep the whole recording
+        return SpeechRegion(0, duration_ms, duration_ms, duration_ms, floor, threshold)
+
+    # Keep runs of loud frames that are long enough to be speech
+    min_run = max(1, math.ceil(min_run_ms / frame_ms))
+    first = last = None
+    speech_frames = 0
+    run_start = None
+    for index, level in enumerate(levels + [SILENCE_DBFS]):
+        if level >= threshold:
+            if run_start is None:
+                run_start = index
+            continue
+        if run_start is not None and index - run_start >= min_run:
+            first = run_start if first is None else first
+            last = index - 1
+            speech_frames += index - run_start
+        run_start = None
+
+    if first is None:
+        return SpeechRegion(0, 0, 0, duration_ms, floor, threshold)
+
+    return SpeechRegion(
+        start_ms=max(0, first * frame_ms - padding_ms),
+        end_ms=min(duration_ms, (last + 1) * frame_ms + padding_ms),
+        speech_ms=min(duration_ms, speech_frames * frame_ms),
+        duration_ms=duration_ms,
+        noise_floor_dbfs=floor,
+        threshold_dbfs=threshold,
+    )
+
+
+# Events reported by EndpointDetector.push
+SPEECH_START = "speech_start"
+PAUSE = "pause"
+SPEECH_END = "speech_end"
+
+
+class EndpointDetector:
+    """
+    Incremental speech start/end detection for streamed 16-bit mono PCM
+
+    Uses the same noise-floor threshold as `detect_speech`, estimated from
+    the frames seen so far; until `warmup_ms` of audio has been seen the
+    floor is `max_noise_floor_dbfs`, so speech right at the start of the
+    stream is detected. A short silence reports PAUSE (end of speech is
+    likely, recognition can start speculatively) and a longer one reports
+    SPEECH_END.
+    """
+
+    # Frames kept for the noise floor estimate (~15 s at 30 ms frames)
+    NOISE_WINDOW = 500
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        margin_db: float = 10.0,
+        min_threshold_dbfs: float = -55.0,
+        min_run_ms: int = 90,
+        pause_ms: int = 300,
+        end_silence_ms: int = 700,
+        noise_percentile: float = 0.1,
+        max_noise_floor_dbfs: float = MAX_NOISE_FLOOR_DBFS,
+        warmup_ms: int = 300,
+    ):
+        """
+        Initialize the detector
+
+        Args:
+            sample_rate: Sample rate of the pushed PCM
+            frame_ms: Frame length in milliseconds
+            margin_db: How far above the noise floor a frame must be to count
+                as speech
+            min_threshold_dbfs: Lowest allowed speech threshold
+            min_run_ms: Loud run needed before speech counts as started
+            pause_ms: Silence after speech that reports PAUSE
+            end_silence_ms: Silence after speech that reports SPEECH_END
+            noise_percentile: Fraction of frames assumed to be background noise
+            max_noise_floor_dbfs: Cap on the noise floor estimate, and the
+                floor used during warm-up
+            warmup_ms: Audio analyzed before the floor is estimated from it
+        """
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db
+        self.min_threshold_dbfs = min_threshold_dbfs
+        self.noise_percentile = noise_percentile
+        self.max_noise_floor_dbfs = max_noise_floor_dbfs
+        self.warmup_frames = math.ceil(warmup_ms / frame_ms)
+        self.min_run = max(1, math.ceil(min_run_ms / frame_ms))
+        self.pause_frames = max(1, math.ceil(pause_ms / frame_ms))
+        self.end_frames = max(self.pause_frames, math.ceil(end_silence_ms / frame_ms))
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self._levels: List[float] = []
+        self._pending = b""
+        self.frames = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new utterance, keeping the noise floor estimate"""
+        self.speech_start_ms: Optional[int] = None
+        self.last_speech_ms: Optional[int] = None
+        self._run = 0
+        self._silence = 0
+
+    @property
+    def in_speech(self) -> bool:
+        """Whether speech has started and not yet ended"""
+        return self.speech_start_ms is not None
+
+    @property
+    def position_ms(self) -> int:
+        """Stream time of the end of the last analyzed frame"""
+        return self.frames * self.frame_ms
+
+    def _threshold(self) -> float:
+        """Current speech threshold in dBFS"""
+        floor = self.max_noise_floor_dbfs
+        if len(self._levels) >= self.warmup_frames:
+            floor = min(floor, level_percentile(self._levels, self.noise_percentile))
+        return max(floor + self.margin_db, self.min_threshold_dbfs)
+
+    def push(self, pcm: bytes) -> List[str]:
+        """
+        Analyze more audio
+
+        Args:
+            pcm: 16-bit mono PCM at `sample_rate` (any length)
+
+        Returns:
+            list: Events (SPEECH_START, PAUSE, SPEECH_END) in stream order
+        """
+        events = []
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        for offset in range(0, usable, self.frame_bytes):
+            frame = AudioSegment(
+                data=data[offset : offset + self.frame_bytes],
+                sample_width=2,
+                frame_rate=self.sample_rate,
+                channels=1,
+            )
+            rms = frame.rms
+            level = (
+                20 * math.log10(rms / frame.max_possible_amplitude)
+                if rms
+                else SILENCE_DBFS
+            )
+            self._levels.append(level)
+            if len(self._levels) > self.NOISE_WINDOW:
+                del self._levels[0]
+            self.frames += 1
+
+            if level >= self._threshold():
+                self._run += 1
+                self._silence = 0
+                if self._run >= self.min_run:
+                    if self.speech_start_ms is None:
+                        self.speech_start_ms = (self.frames - self._run) * self.frame_ms
+                        events.append(SPEECH_START)
+                    self.last_speech_ms = self.position_ms
+                continue
+
+            self._run = 0
+            if self.last_speech_ms is None:
+                continue
+            self._silence += 1
+            if self._silence == self.pause_frames:
+                events.append(PAUSE)
+            if self._silence == self.end_frames:
+                events.append(SPEECH_END)
+        self._pending = data[usable:]
+        return events
@@ -0,0 +1,190 @@
+-- Migration: Incrementally maintained per-itinerary expense aggregates
+-- Created: 2026-10-19
+-- Description: Keep running totals (total, count, per-category and per-day sums)
+-- for each itinerary in expense_summaries, updated by a trigger in the same
+-- transaction as every expense insert, update and delete. Statistics and budget
+-- comparison then read a single row instead of refetching every expense.
+
+-- Create summary table
+CREATE TABLE IF NOT EXISTS public.expense_summaries (
+    itinerary_id UUID PRIMARY KEY REFERENCES public.itineraries(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    by_category JSONB NOT NULL DEFAULT '{}',
+    by_day JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW())
+);
+
+CREATE INDEX IF NOT EXISTS idx_expense_summaries_user_id ON public.expense_summaries(user_id);
+
+-- Enable Row Level Security (rows are written only by the trigger)
+ALTER TABLE public.expense_summaries ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own expense summaries"
+    ON public.expense_summaries FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- Add a signed delta to an itinerary's summary row
+CREATE OR REPLACE FUNCTION public.apply_expense_summary_delta(
+    p_itinerary_id UUID,
+    p_user_id UUID,
+    p_category TEXT,
+    p_expense_date DATE,
+    p_amount NUMERIC,
+    p_count INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    -- Skip itineraries that are being deleted (cascading expense deletes)
+    INSERT INTO public.expense_summaries (itinerary_id, user_id)
+    SELECT p_itinerary_id, p_user_id
+    WHERE EXISTS (SELECT 1 FROM public.itineraries WHERE id = p_itinerary_id)
+    ON CONFLICT (itinerary_id) DO NOTHING;
+
+    -- The row lock serializes concurrent writers for the same itinerary
+    UPDATE public.expense_summaries
+    SET
+        total_amount = total_amount + p_amount,
+        expense_count = expense_count + p_count,
+        -- Buckets that drop to zero are removed to match the rebuild output
+        by_category = CASE
+            WHEN COALESCE((by_category ->> p_category)::NUMERIC, 0) + p_amount = 0
+                THEN by_category - p_category
+            ELSE jsonb_set(
+                by_category,
+                ARRAY[p_category],
+                to_jsonb(COALESCE((by_category ->> p_category)::NUMERIC, 0) + p_amount)
+            )
+        END,
+        by_day = CASE
+            WHEN COALESCE((by_day ->> p_expense_date::TEXT)::NUMERIC, 0) + p_amount = 0
+                THEN by_day - p_expense_date::TEXT
+            ELSE jsonb_set(
+                by_day,
+                ARRAY[p_expense_date::TEXT],
+                to_jsonb(COALESCE((by_day ->> p_expense_date::TEXT)::NUMERIC, 0) + p_amount)
+            )
+        END,
+        updated_at = TIMEZONE('utc', NOW())
+    WHERE itinerary_id = p_itinerary_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Trigger function: remove the old row's contribution, add the new one
+CREATE OR REPLACE FUNCTION public.maintain_expense_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.apply_expense_summary_delta(
+            OLD.itinerary_id, OLD.user_id, OLD.category, OLD.expense_date, -OLD.amount, -1
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.apply_expense_summary_delta(
+            NEW.itinerary_id, NEW.user_id, NEW.category, NEW.expense_date, NEW.amount, 1
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS maintain_expense_summary ON public.expenses;
+CREATE TRIGGER maintain_expense_summary
+    AFTER INSERT
+    OR UPDATE OF itinerary_id, user_id, category, amount, expense_date
+    OR DELETE ON public.expenses
+    FOR EACH ROW
+    EXECUTE FUNCTION public.maintain_expense_summary();
+
+-- Consistency repair: recompute summaries from the expenses table
+-- Returns the number of summary rows that were missing or wrong
+CREATE OR REPLACE FUNCTION public.rebuild_expense_summaries(p_itinerary_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    repaired INTEGER;
+BEGIN
+    WITH expected AS (
+        SELECT
+            i.id AS itinerary_id,
+            i.user_id,
+            COALESCE(SUM(e.amount), 0) AS total_amount,
+            COUNT(e.id)::INTEGER AS expense_count,
+            COALESCE(
+                (
+                    SELECT jsonb_object_agg(c.category, c.amount)
+                    FROM (
+                        SELECT category, SUM(amount) AS amount
+                        FROM public.expenses
+                        WHERE itinerary_id = i.id
+                        GROUP BY category
+                        HAVING SUM(amount) <> 0
+                    ) c
+                ),
+                '{}'
+            ) AS by_category,
+            COALESCE(
+                (
+                    SELECT jsonb_object_agg(d.expense_date::TEXT, d.amount)
+                    FROM (
+                        SELECT expense_date, SUM(amount) AS amount
+                        FROM public.expenses
+                        WHERE itinerary_id = i.id
+                        GROUP BY expense_date
+                        HAVING SUM(amount) <> 0
+                    ) d
+                ),
+                '{}'
+            ) AS by_day
+        FROM public.itineraries i
+        LEFT JOIN public.expenses e ON e.itinerary_id = i.id
+        WHERE p_itinerary_id IS NULL OR i.id = p_itinerary_id
+        GROUP BY i.id, i.user_id
+    ),
+    upserted AS (
+        INSERT INTO public.expense_summaries AS s (
+            itinerary_id, user_id, total_amount, expense_count, by_category, by_day, updated_at
+        )
+        SELECT
+            itinerary_id, user_id, total_amount, expense_count, by_category, by_day,
+            TIMEZONE('utc', NOW())
+        FROM expected
+        ON CONFLICT (itinerary_id) DO UPDATE
+        SET
+            user_id = EXCLUDED.user_id,
+            total_amount = EXCLUDED.total_amount,
+            expense_count = EXCLUDED.expense_count,
+            by_category = EXCLUDED.by_category,
+            by_day = EXCLUDED.by_day,
+            updated_at = EXCLUDED.updated_at
+        WHERE s.total_amount IS DISTINCT FROM EXCLUDED.total_amount
+            OR s.expense_count IS DISTINCT FROM EXCLUDED.expense_count
+            OR s.by_category IS DISTINCT FROM EXCLUDED.by_category
+            OR s.by_day IS DISTINCT FROM EXCLUDED.by_day
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO repaired FROM upserted;
+
+    RETURN repaired;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- The functions run with the owner's rights: keep them off the PostgREST RPC
+-- surface. The trigger runs them as the owner, repairs use the service role.
+REVOKE EXECUTE ON FUNCTION public.apply_expense_summary_delta(UUID, UUID, TEXT, DATE, NUMERIC, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.maintain_expense_summary()
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rebuild_expense_summaries(UUID)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.apply_expense_summary_delta(UUID, UUID, TEXT, DATE, NUMERIC, INTEGER)
+    TO service_role;
+GRANT EXECUTE ON FUNCTION public.maintain_expense_summary() TO service_role;
+GRANT EXECUTE ON FUNCTION public.rebuild_expense_summaries(UUID) TO service_role;
+
+-- Backfill summaries for existing expenses
+SELECT public.rebuild_expense_summaries();
+
+COMMENT ON TABLE public.expense_summaries IS 'Trigger-maintained running expense totals per itinerary';
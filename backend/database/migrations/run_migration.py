@@ -51,4 +51,4 @@ def run_migration(sql_file: str):
 
 
 if __name__ == "__main__":
-    run_migration("add_expense_fields.sql")
+    run_migration(sys.argv[1] if len(sys.argv) > 1 else "add_expense_fields.sql")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Expense summary consistency repair job for AI Travel Planner
+
+Recomputes the trigger-maintained expense summaries from the expenses table
+and reports how many rows were missing or inconsistent. Run it periodically
+(e.g. from a nightly cron) or after restoring data.
+
+Usage:
+    python database/repair_expense_summaries.py [itinerary_id]
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.expense_service import expense_service
+
+
+def repair(itinerary_id: str = None):
+    """Rebuild expense summaries for one itinerary or all of them"""
+    scope = f"itinerary {itinerary_id}" if itinerary_id else "all itineraries"
+    print(f"Repairing expense summaries for {scope}...")
+
+    try:
+        repaired = expense_service.repair_expense_summaries(itinerary_id)
+    except Exception as e:
+        print(f"❌ Repair failed: {e}")
+        sys.exit(1)
+
+    print(f"✅ Repaired {repaired} summary row(s)")
+
+
+if __name__ == "__main__":
+    repair(sys.argv[1] if len(sys.argv) > 1 else None)
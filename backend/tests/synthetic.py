@@ -0,0 +1,40 @@
+"""Synthetic 16 kHz mono PCM for voice activity and streaming tests"""
+
+import math
+import random
+import struct
+
+from pydub import AudioSegment
+
+SAMPLE_RATE = 16000
+
+
+def tone(ms: int, amplitude: int = 8000, noise: float = 30.0) -> bytes:
+    """Amplitude-modulated tone over a noise bed, standing in for speech"""
+    rng = random.Random(ms)
+    samples = []
+    for i in range(SAMPLE_RATE * ms // 1000):
+        envelope = 0.85 + 0.15 * math.sin(i / 800)
+        value = amplitude * envelope * math.sin(i * 0.3) + rng.gauss(0, noise)
+        samples.append(max(-32768, min(32767, int(value))))
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+def noise(ms: int, amplitude: float = 30.0) -> bytes:
+    """Gaussian background noise (about -60 dBFS by default)"""
+    rng = random.Random(ms)
+    samples = [
+        max(-32768, min(32767, int(rng.gauss(0, amplitude))))
+        for _ in range(SAMPLE_RATE * ms // 1000)
+    ]
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+def silence(ms: int) -> bytes:
+    """Digital silence"""
+    return b"\x00\x00" * (SAMPLE_RATE * ms // 1000)
+
+
+def segment(pcm: bytes) -> AudioSegment:
+    """Wrap PCM in an AudioSegment"""
+    return AudioSegment(data=pcm, sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
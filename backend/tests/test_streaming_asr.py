@@ -0,0 +1,128 @@
+"""Tests for streaming recognition sessions with the stub engine"""
+
+from concurrent.futures import Future
+
+import pytest
+from app.config import Config
+from app.services.streaming_asr import StreamingSession, StubEngine
+from synthetic import SAMPLE_RATE, noise, tone
+
+TEXT = "今天午饭花了三十五元"
+
+
+class InlineExecutor:
+    """Runs submitted calls immediately, so results are ready when polled"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def streaming_config(monkeypatch):
+    """Pin the detection settings the expectations below depend on"""
+    settings = {
+        "STREAMING_INTERIM_INTERVAL_MS": 0,
+        "STREAMING_PAUSE_MS": 300,
+        "STREAMING_END_SILENCE_MS": 700,
+        "STREAMING_MAX_UTTERANCE_SECONDS": 30,
+        "VAD_FRAME_MS": 30,
+        "VAD_MARGIN_DB": 10,
+        "VAD_PADDING_MS": 200,
+        "VAD_MIN_SPEECH_MS": 250,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value)
+
+
+@pytest.fixture
+def session():
+    return StreamingSession(StubEngine(TEXT), InlineExecutor())
+
+
+def feed(session, pcm, chunk_ms=100, poll=True):
+    """Feed PCM in client-sized chunks and collect the replies"""
+    size = SAMPLE_RATE * chunk_ms // 1000 * 2
+    messages = []
+    for offset in range(0, len(pcm), size):
+        messages += session.feed(pcm[offset : offset + size])
+        if poll:
+            messages += session.poll()
+    return messages
+
+
+def types(messages):
+    return [message["type"] for message in messages]
+
+
+def test_speech_start_and_final(session):
+    messages = feed(session, noise(500) + tone(1000) + noise(1000))
+
+    assert types(messages) == ["speech_start", "final"]
+    final = messages[1]
+    assert final["utterance"] == 0
+    assert final["success"]
+    assert TEXT.startswith(final["transcript"])
+    assert 0.9 <= final["speech_duration"] <= 1.1
+
+
+def test_final_reuses_speculative_recognition(session):
+    feed(session, noise(500) + tone(1000) + noise(1000))
+
+    assert session.stats["speculative_hits"] == 1
+    assert session.stats["speculative_misses"] == 0
+
+
+def test_speech_resuming_after_pause_discards_speculation(session):
+    messages = feed(
+        session, noise(500) + tone(800) + noise(400) + tone(800) + noise(1000)
+    )
+
+    assert types(messages) == ["speech_start", "final"]
+    assert messages[1]["speech_duration"] >= 1.5
+    assert session.stats["speculative_misses"] == 1
+    assert session.stats["speculative_hits"] == 1
+
+
+def test_audio_after_end_waits_for_next_utterance(session):
+    feed(session, noise(500) + tone(1000) + noise(1000), poll=False)
+
+    # The first final has not been collected, so new speech is held back
+    assert feed(session, tone(1000), poll=False) == []
+
+    messages = session.poll()
+    assert types(messages) == ["final", "speech_start"]
+    assert messages[0]["utterance"] == 0
+    assert messages[1]["utterance"] == 1
+
+    messages = feed(session, noise(1000))
+    assert types(messages) == ["final"]
+    assert messages[0]["utterance"] == 1
+
+
+def test_speech_at_stream_start(session):
+    # Push-to-talk: no noise lead-in to estimate the floor from
+    messages = feed(session, tone(1500) + noise(1200))
+
+    assert types(messages) == ["speech_start", "final"]
+    assert messages[1]["success"]
+
+
+def test_finish_flushes_open_utterance(session):
+    messages = feed(session, noise(500) + tone(1000))
+    messages += session.finish(timeout=1)
+
+    assert types(messages) == ["speech_start", "final"]
+
+
+def test_noise_only_stream_has_no_utterance(session):
+    messages = feed(session, noise(3000))
+    messages += session.finish(timeout=1)
+
+    assert messages == []
+
+
+def test_unsupported_format_is_rejected():
+    with pytest.raises(ValueError):
+        StreamingSession(StubEngine(TEXT), InlineExecutor(), audio_format="mp3")
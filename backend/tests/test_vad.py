@@ -0,0 +1,46 @@
+"""Tests for batch voice activity detection"""
+
+from app.utils.vad import detect_speech
+from synthetic import noise, segment, silence, tone
+
+
+def test_trims_leading_and_trailing_noise():
+    region = detect_speech(segment(noise(800) + tone(1000) + noise(800)))
+
+    assert region.has_speech
+    assert 500 <= region.start_ms <= 800
+    assert 1800 <= region.end_ms <= 2100
+    assert 900 <= region.speech_ms <= 1100
+
+
+def test_speech_filling_the_recording_is_kept():
+    # Too few quiet frames for a percentile noise floor
+    region = detect_speech(segment(silence(60) + tone(2000) + silence(60)))
+
+    assert region.speech_ms >= 2000
+    assert region.start_ms == 0
+    assert region.end_ms == region.duration_ms
+
+
+def test_quiet_speech_without_pauses_is_kept():
+    region = detect_speech(segment(tone(2000, amplitude=250)))
+
+    assert region.speech_ms == region.duration_ms
+
+
+def test_digital_silence_has_no_speech():
+    region = detect_speech(segment(silence(2000)))
+
+    assert not region.has_speech
+
+
+def test_background_noise_has_no_speech():
+    region = detect_speech(segment(noise(2000)))
+
+    assert not region.has_speech
+
+
+def test_clicks_shorter_than_min_run_are_dropped():
+    region = detect_speech(segment(noise(1000) + tone(30) + noise(1000)))
+
+    assert not region.has_speech
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Destination insights warm-up job for AI Travel Planner
+
+Generates and caches insights for popular destinations, skipping those that
+are already cached. The cache is shared by all worker processes, so run it
+once per deployment (or from cron) rather than in every worker at startup.
+
+Usage:
+    python warm_insights_cache.py [destination ...]
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.ai_service import ai_service
+
+
+def warm_up(destinations=None):
+    """Generate insights for the given destinations or the configured list"""
+    print("Warming up destination insights...")
+
+    counts = ai_service.warm_up_insights(destinations or None)
+
+    print(
+        f"✅ {counts['generated']} generated, {counts['cached']} already cached, "
+        f"{counts['failed']} failed"
+    )
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    warm_up(sys.argv[1:])